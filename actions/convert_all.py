@@ -2,16 +2,139 @@ import os
 import time
 import traceback
 from collections import defaultdict
-from multiprocessing import Pool, cpu_count
+from multiprocessing import Pool, Queue, cpu_count
+from queue import Empty
 
 from tqdm import tqdm
 
 import settings
 from library import require_file
+from library.shared_cache import SharedResourceBroker, init_shared_cache, is_shared_file
 from library.utils import format_exception
+from library.utils.blender_worker import BlenderWorkerPool, init_blender_workers
+from library.utils.processes import (
+    become_process_group_leader,
+    kill_process_tree,
+    ExternalToolSlots,
+    init_external_tool_slots,
+)
 from serializers import get_serializer
 
 
+class TaskTimeoutError(Exception):
+    pass
+
+
+# worker process state, see _init_worker
+_task_events_queue = None
+
+
+def _report_slot_waiting(waiting: bool):
+    # time, spent waiting for blender/ffmpeg slot, is not counted in task timeout
+    _task_events_queue.put(('waiting' if waiting else 'resumed', os.getpid(), time.time()))
+
+
+def _init_worker(shared_cache_manifest, task_events_queue, external_tool_slots, blender_workers_ports):
+    global _task_events_queue
+    _task_events_queue = task_events_queue
+    init_shared_cache(shared_cache_manifest)
+    init_external_tool_slots(external_tool_slots, on_wait=_report_slot_waiting)
+    init_blender_workers(blender_workers_ports)
+    become_process_group_leader()
+
+
+def _export_task(index, base_input_path, path, out_path):
+    # let the main process know, which worker runs the task and since when, to be able to kill it on timeout
+    _task_events_queue.put(('started', index, os.getpid(), time.time()))
+    return export_file(base_input_path, path, out_path)
+
+
+class _RunningTask:
+    def __init__(self, pid, start_time):
+        self.pid = pid
+        self.start_time = start_time
+        self.waited = 0
+        self.waiting_since = None
+
+    def elapsed(self, now):
+        # time of running, without time of waiting for external tool slot
+        waiting = now - self.waiting_since if self.waiting_since is not None else 0
+        return now - self.start_time - self.waited - waiting
+
+
+class _TaskMonitor:
+    """
+     Keeps track of tasks, running in pool workers, by events, which workers send to the queue. Pids of workers, which
+     run tasks, are kept, so they can be killed on cancellation together with launched external tools. Pid is dropped
+     when its task is finished: worker can exit after that and OS can reuse its pid
+     """
+
+    def __init__(self, task_events_queue):
+        self.task_events_queue = task_events_queue
+        self.running = {}
+        # worker runs one task at a time, events of worker are in order
+        self.running_by_pid = {}
+        # event of task start can come after its result
+        self.finished = set()
+
+    def read_events(self, timeout=0.1):
+        try:
+            while True:
+                event = self.task_events_queue.get(timeout=timeout)
+                if event[0] == 'started':
+                    _, index, pid, start_time = event
+                    if index in self.finished:
+                        continue
+                    self.running[index] = self.running_by_pid[pid] = _RunningTask(pid, start_time)
+                    continue
+                kind, pid, event_time = event
+                task = self.running_by_pid.get(pid)
+                if task is None:
+                    continue
+                if kind == 'waiting':
+                    task.waiting_since = event_time
+                elif task.waiting_since is not None:
+                    task.waited += event_time - task.waiting_since
+                    task.waiting_since = None
+        except Empty:
+            pass
+
+    def finish(self, index):
+        self.finished.add(index)
+        task = self.running.pop(index, None)
+        # worker can already run the next task
+        if task is not None and self.running_by_pid.get(task.pid) is task:
+            del self.running_by_pid[task.pid]
+
+
+def _wait_for_results(async_results, monitor: _TaskMonitor, external_tool_slots, blender_workers, pbar):
+    results = [None] * len(async_results)
+    pending = set(range(len(async_results)))
+    timeout = settings.multiprocess_task_timeout
+    while pending:
+        blender_workers.update()
+        monitor.read_events()
+        now = time.time()
+        for index in list(pending):
+            task = monitor.running.get(index)
+            if async_results[index].ready():
+                results[index] = async_results[index].get()
+            elif timeout and task is not None and task.elapsed(now) > timeout:
+                # kills worker together with blender/ffmpeg it launched. Pool starts a new worker instead
+                kill_process_tree(task.pid)
+                for tool, slot in external_tool_slots.release_owned_by(task.pid):
+                    if tool == 'blender':
+                        # it can be still busy with the job of killed worker
+                        blender_workers.restart(slot)
+                results[index] = TaskTimeoutError(f'Timed out after {task.elapsed(now):.1f} seconds')
+            else:
+                continue
+            monitor.finish(index)
+            pending.remove(index)
+            pbar.update()
+    return results
+
+
 def export_file(base_input_path, path, out_path):
     try:
         data = require_file(path)
@@ -34,11 +157,47 @@ def convert_all(path, out_path):
         files_to_open = [str(path)]
 
     processes = cpu_count() if settings.multiprocess_processes_count == 0 else settings.multiprocess_processes_count
-    with Pool(processes=processes) as pool:
-        pbar = tqdm(total=len(files_to_open))
-        results = [pool.apply_async(export_file, (base_input_path, f, out_path), callback=lambda *a: pbar.update()) for f in files_to_open]
-        results = list(result.get() for result in results)
-    pbar.close()
+    with SharedResourceBroker() as broker:
+        for f in files_to_open:
+            if is_shared_file(f, settings.multiprocess_shared_files):
+                try:
+                    broker.publish(f)
+                except Exception:
+                    # will be reported when the file itself is exported
+                    if settings.print_errors:
+                        traceback.print_exc()
+        task_events_queue = Queue()
+        monitor = _TaskMonitor(task_events_queue)
+        blender_processes_count = settings.multiprocess_blender_processes_count
+        if settings.multiprocess_persistent_blender:
+            # every blender slot gets own long-living blender
+            blender_processes_count = blender_processes_count or processes
+        external_tool_slots = ExternalToolSlots({
+            'blender': blender_processes_count,
+            'ffmpeg': settings.multiprocess_ffmpeg_processes_count,
+        })
+        with BlenderWorkerPool(blender_processes_count if settings.multiprocess_persistent_blender else 0) \
+                as blender_workers, \
+                Pool(processes=processes, initializer=_init_worker,
+                     initargs=(broker.manifest, task_events_queue, external_tool_slots, blender_workers.ports),
+                     maxtasksperchild=settings.multiprocess_max_tasks_per_child or None) as pool:
+            pbar = tqdm(total=len(files_to_open))
+            try:
+                results = [pool.apply_async(_export_task, (i, base_input_path, f, out_path))
+                           for i, f in enumerate(files_to_open)]
+                results = _wait_for_results(results, monitor, external_tool_slots, blender_workers, pbar)
+            except KeyboardInterrupt:
+                # workers ignore Ctrl-C and live in own process groups: stop the pool first (killing idle worker
+                # can leave task queue locked), then kill remaining launched subprocesses
+                # workers, which do not run a task now, have no launched subprocesses
+                monitor.read_events(timeout=0)
+                pool.terminate()
+                for pid in monitor.running_by_pid:
+                    kill_process_tree(pid)
+                pbar.close()
+                print('Cancelled')
+                return
+        pbar.close()
 
     skipped_resources = [(files_to_open[i], exc) for i, exc in enumerate(results) if isinstance(exc, Exception)]
     if skipped_resources:
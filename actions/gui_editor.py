@@ -1,37 +1,54 @@
+import hashlib
+import json
 import os
 import tempfile
-from copy import deepcopy
 from distutils.dir_util import copy_tree
-from itertools import chain
-from logging import warning
-from pathlib import Path
-from typing import Dict
+from typing import Dict, List
 
+import bottle
 import eel
+import gevent
 
-from library import require_file, require_resource
-from library.loader import clear_file_cache
+from library import require_resource
+from library.helpers.edit_journal import EditJournal
+from library.helpers.exceptions import ReadCancelledException
+from library.helpers.read_data_overlay import ReadDataOverlay
+from library.helpers.read_progress import ReadProgress, report_read_progress
+from library.loader import clear_file_cache, files_cache, invalidate_resource_index, load_file
+from library.saver import write_file
 from library.utils.file_utils import remove_file_or_directory
 from library.utils.file_utils import start_file
 from serializers import get_serializer, DataTransferSerializer
 
+# rendered previews, kept in memory for browser. Bitmap preview takes up to a few megabytes
+PREVIEWS_MAX_COUNT = 64
 
-def __apply_delta_to_resource(resource_id, resource, changes: Dict):
-    suffix = '/' if '__' in resource_id else '__'
-    for delta in changes:
-        if not delta['id'].startswith(resource_id + suffix):
-            warning('Skipped change ' + delta['id'] + '. Wrong ID')
-        sub_id = delta['id'][len(resource_id) + len(suffix):]
-        field = resource
-        for subkey in sub_id.split('/'):
-            try:
-                field = getattr(field, subkey)
-            except AttributeError:
-                if isinstance(field.value, list):
-                    field = field[int(subkey)]
-                else:
-                    field = field[subkey]
-        field.value = delta['value']
+
+def __load_file_in_thread(path: str, progress: ReadProgress):
+    # runs in worker thread, exceptions are returned to not lose them in thread pool
+    with report_read_progress(progress):
+        try:
+            return load_file(path), None
+        except (Exception, ReadCancelledException) as ex:
+            return None, ex
+
+
+def __load_file_in_background(path: str, progress: ReadProgress):
+    """
+     Reads file in a thread of gevent pool, so eel keeps serving other calls. Progress is sent to GUI from here: eel
+     can not be used from another thread
+     """
+    task = gevent.get_hub().threadpool.spawn(__load_file_in_thread, path, progress)
+    position = None
+    while not task.ready():
+        task.wait(timeout=0.1)
+        if progress.position != position and not progress.cancelled:
+            position = progress.position
+            eel.on_read_progress(path, position, progress.total)
+    data, ex = task.get()
+    if ex is not None:
+        raise ex
+    return data
 
 
 def run_gui_editor(file_path):
@@ -43,6 +60,44 @@ def run_gui_editor(file_path):
     # app state
     current_file_id = None
     current_file = None
+    # progress of file, which is being read in background, see open_file
+    current_read = None
+    # undo/redo history of opened file
+    journal = EditJournal()
+    # encoded PNG previews by token. Token is a hash of resource id, settings patch and previews generation, which is
+    # increased on every resource change, so browser never shows outdated cached image. Only the most recently used
+    # previews are kept: dict keeps insertion order, the most recently used preview is the last
+    previews: Dict[str, bytes] = {}
+    previews_generation = 0
+
+    app = bottle.Bottle()
+
+    @app.route('/previews/<token>.png')
+    def get_preview(token):
+        png = use_preview(token)
+        if png is None:
+            raise bottle.HTTPError(404, 'Preview not found')
+        bottle.response.content_type = 'image/png'
+        return png
+
+    def use_preview(token: str):
+        png = previews.pop(token, None)
+        if png is not None:
+            previews[token] = png
+        return png
+
+    def store_preview(token: str, png: bytes):
+        previews[token] = png
+        while len(previews) > PREVIEWS_MAX_COUNT:
+            del previews[next(iter(previews))]
+
+    def invalidate_previews():
+        nonlocal previews_generation
+        previews.clear()
+        previews_generation += 1
+
+    def to_static_paths(manifest: List[str]) -> List[str]:
+        return list(dict.fromkeys('/' + os.path.relpath(x, static_path).replace('\\', '/') for x in manifest))
 
     def init_eel_state():
 
@@ -54,15 +109,58 @@ def run_gui_editor(file_path):
         def open_file(path: str, force_reload: bool = False):
             nonlocal current_file
             nonlocal current_file_id
+            nonlocal current_read
+            nonlocal journal
+            if current_read is not None:
+                # user opened another file: previous one is not needed anymore
+                current_read.cancel()
+            normalized_path = path.replace('\\', '/')
             try:
                 if (force_reload):
                     clear_file_cache(path)
-                current_file = require_file(path)
+                    invalidate_previews()
+                # cached files are opened right away, if they were not modified on disk
+                data = files_cache.get(normalized_path, check_mtime=True)
+                if data is None:
+                    progress = current_read = ReadProgress()
+                    try:
+                        data = __load_file_in_background(path, progress)
+                    finally:
+                        if current_read is progress:
+                            current_read = None
+                    files_cache.put(normalized_path, data, data.block_state['file_mtime'])
+                if current_file_id:
+                    files_cache.unpin(current_file_id.replace('---DRIVE', ':'))
+                # keep unsaved changes of opened file in cache
+                files_cache.pin(normalized_path)
+                current_file = data
                 current_file_id = current_file.block_state['id']
+                journal = EditJournal(current_file)
+            except ReadCancelledException:
+                # GUI waits for the file, opened instead of this one
+                return None
             except Exception as ex:
+                if current_file_id:
+                    files_cache.unpin(current_file_id.replace('---DRIVE', ':'))
                 current_file = ex
                 current_file_id = path
-            return DataTransferSerializer().serialize(current_file)
+                journal = EditJournal()
+            # only root stub: GUI loads as much as it needs to show with get_node and load_children
+            return DataTransferSerializer().serialize(current_file, depth=0)
+
+        @eel.expose
+        def get_node(id: str, depth: int = None):
+            resource, _ = require_resource(id)
+            if resource is None:
+                return DataTransferSerializer().serialize(KeyError(f'Resource {id} not found'))
+            return DataTransferSerializer().serialize(resource, depth=depth)
+
+        @eel.expose
+        def load_children(id: str, offset: int, limit: int, depth: int = None):
+            resource, _ = require_resource(id)
+            if resource is None:
+                return DataTransferSerializer().serialize(KeyError(f'Resource {id} not found'))
+            return DataTransferSerializer().serialize_children(resource, offset, limit, depth=depth)
 
         @eel.expose
         def open_file_with_system_app(path: str):
@@ -72,20 +170,42 @@ def run_gui_editor(file_path):
 
         @eel.expose
         def save_file(path: str, changes: Dict):
-            __apply_delta_to_resource(current_file_id, current_file, changes)
-            bts = current_file.to_bytes()
-            f = open(path, 'wb')
-            f.write(bts)
-            f.close()
-            clear_file_cache(path)
+            journal.apply(changes)
+            # patches changed bytes in place if possible
+            write_file(current_file, path)
+            normalized_path = path.replace('\\', '/')
+            if normalized_path.replace(':', '---DRIVE') == current_file_id:
+                # cache keeps the saved tree, so resource lookups and the journal work with the same nodes
+                files_cache.put(normalized_path, current_file, current_file.block_state['file_mtime'])
+            else:
+                clear_file_cache(path)
+            invalidate_previews()
 
         @eel.expose
         def run_custom_action(resource_id: str, action: Dict, args: Dict):
             _, resource = require_resource(resource_id)
             action_func = getattr(resource.block, f'action_{action["method"]}')
-            action_func(resource, **args)
+            with journal.record(resource):
+                action_func(resource, **args)
+            # actions can move nodes
+            invalidate_resource_index(resource_id)
+            # actions can change data in place without assigning values
+            resource.mark_dirty()
+            invalidate_previews()
             return DataTransferSerializer().serialize(resource)
 
+        @eel.expose
+        def render_preview(id: str, settings_patch={}):
+            token = hashlib.sha1(json.dumps([previews_generation, id, settings_patch],
+                                            sort_keys=True).encode('utf-8')).hexdigest()
+            if use_preview(token) is None:
+                resource, _ = require_resource(id)
+                serializer = get_serializer(resource.block)
+                if settings_patch:
+                    serializer.patch_settings(settings_patch)
+                store_preview(token, serializer.render_png(resource))
+            return f'/previews/{token}.png'
+
         @eel.expose
         def serialize_resource(id: str, settings_patch={}):
             resource, top_level_resource = require_resource(id)
@@ -93,44 +213,54 @@ def run_gui_editor(file_path):
             path = os.path.join(static_path, 'resources', *id.split('/'))
             if settings_patch:
                 serializer.patch_settings(settings_patch)
-            serializer.serialize(resource, path)
-            normal_slashes_path = path.replace('\\', '/')
-            exported_file_paths = [str(x)[len(static_path):]
-                                   for x in chain(Path(normal_slashes_path).glob("**/*"),
-                                                  Path(normal_slashes_path[:normal_slashes_path.rindex('/')]).glob(
-                                                      normal_slashes_path[
-                                                      (normal_slashes_path.rindex('/') + 1):] + '.*'))
-                                   if not x.is_dir()]
-            return [x.replace('\\', '/') for x in exported_file_paths]
+            return to_static_paths(serializer.serialize_with_manifest(resource, path))
 
         @eel.expose
         def serialize_resource_tmp(id: str, changes: Dict, settings_patch={}):
             resource, _ = require_resource(id)
-            resource = deepcopy(resource)
-            __apply_delta_to_resource(id, resource, changes)
+            # changes are previewed without touching the opened file, only changed nodes are copied
+            overlay = ReadDataOverlay(resource)
+            overlay.apply(changes)
+            resource = overlay.data
             serializer = get_serializer(resource.block)
             path = os.path.join(static_path, 'resources_tmp', *id.split('/'))
             if settings_patch:
                 serializer.patch_settings(settings_patch)
-            serializer.serialize(resource, path)
-            normal_slashes_path = path.replace('\\', '/')
-            return [str(x)[len(static_path):]
-                    for x in chain(Path(normal_slashes_path).glob("**/*"),
-                                   Path(normal_slashes_path[:normal_slashes_path.rindex('/')]).glob(
-                                       normal_slashes_path[(normal_slashes_path.rindex('/') + 1):] + '.*'))
-                    if not x.is_dir()]
+            return to_static_paths(serializer.serialize_with_manifest(resource, path))
 
         @eel.expose
         def deserialize_resource(id: str):
             resource, _ = require_resource(id)
             serializer = get_serializer(resource.block)
             path = os.path.join(static_path, 'resources_tmp', *id.split('/'))
-            serializer.deserialize(path, resource)
+            with journal.record(resource):
+                serializer.deserialize(path, resource)
+            invalidate_resource_index(id)
+            resource.mark_dirty()
             remove_file_or_directory(os.path.join(static_path, 'resources', *id.split('/')))
             remove_file_or_directory(os.path.join(static_path, 'resources_tmp', *id.split('/')))
+            invalidate_previews()
             return DataTransferSerializer().serialize(current_file)
 
+        def serialize_changed_nodes(nodes):
+            # only changed nodes are sent, GUI updates them in loaded tree. The same node can be changed many times
+            if nodes:
+                invalidate_previews()
+            return DataTransferSerializer().serialize_nodes(list({x.id: x for x in nodes or []}.values()))
+
+        @eel.expose
+        def undo():
+            return serialize_changed_nodes(journal.undo())
+
+        @eel.expose
+        def redo():
+            return serialize_changed_nodes(journal.redo())
+
+        @eel.expose
+        def get_edit_history():
+            return journal.get_state()
+
     eel.init(static_path)
     init_eel_state()
-    eel.start('index.html', port=0)
+    eel.start('index.html', port=0, app=app)
     static_dir.cleanup()
@@ -32,6 +32,7 @@ export class AppComponent {
         return { id, value };
       }));
       this.mainService.clearUnsavedChanges();
+      await this.mainService.refreshEditHistory();
       this.snackBar.open('File Saved!', 'OK', { duration: 1500 });
     } catch (err: any) {
       this.snackBar.open('Error while saving file! ' + err.errorText, 'OK :(', { duration: 5000 });
@@ -54,6 +55,22 @@ export class AppComponent {
     this.cdr.markForCheck();
   }
 
+  async undo() {
+    try {
+      await this.mainService.undo();
+    } catch (err: any) {
+      this.snackBar.open('Error while undoing change! ' + err.errorText, 'OK :(', { duration: 5000 });
+    }
+  }
+
+  async redo() {
+    try {
+      await this.mainService.redo();
+    } catch (err: any) {
+      this.snackBar.open('Error while redoing change! ' + err.errorText, 'OK :(', { duration: 5000 });
+    }
+  }
+
   async runCustomAction(action: CustomAction) {
     if (this.mainService.hasUnsavedChanges) {
       let dialogRef = this.dialog.open(ConfirmDialogComponent, {
@@ -38,6 +38,7 @@ import { FlagsBlockUiComponent } from './components/editor/library/flags.block-u
 import { ConfirmDialogComponent } from './components/confirm.dialog/confirm.dialog.component';
 import { MatDialogModule } from '@angular/material/dialog';
 import { MatProgressSpinnerModule } from '@angular/material/progress-spinner';
+import { MatProgressBarModule } from '@angular/material/progress-bar';
 import { MatMenuModule } from '@angular/material/menu';
 import { TriMapBlockUiComponent } from './components/editor/eac/tri-map.block-ui/tri-map.block-ui.component';
 import { RunCustomActionDialogComponent } from './components/run-custom-action.dialog/run-custom-action.dialog.component';
@@ -91,6 +92,7 @@ import { MinimapComponent } from './components/editor/eac/tri-map.block-ui/minim
     MatSelectModule,
     MatDialogModule,
     MatProgressSpinnerModule,
+    MatProgressBarModule,
     MatMenuModule,
     ReactiveFormsModule,
   ],
@@ -47,8 +47,7 @@ export class BitmapBlockUiComponent implements GuiComponentInterface, AfterViewI
       takeUntil(this.destroyed$),
     ).subscribe(async (data) => {
       if (data) {
-        const [path] = await this.eelDelegate.serializeResource(data.block_id);
-        this.imageUrl$.next(path);
+        this.imageUrl$.next(await this.eelDelegate.renderPreview(data.block_id));
       } else {
         this.imageUrl$.next(null);
       }
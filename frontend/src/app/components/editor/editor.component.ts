@@ -1,4 +1,13 @@
-import { ChangeDetectionStrategy, Component, ComponentRef, Input, OnDestroy, Type, ViewChild } from '@angular/core';
+import {
+  ChangeDetectionStrategy,
+  ChangeDetectorRef,
+  Component,
+  ComponentRef,
+  Input,
+  OnDestroy,
+  Type,
+  ViewChild
+} from '@angular/core';
 import { DataBlockUIDirective } from './data-block-ui.directive';
 import { FallbackBlockUiComponent } from './library/fallback.block-ui/fallback.block-ui.component';
 import { GuiComponentInterface } from './gui-component.interface';
@@ -47,6 +56,15 @@ export class EditorComponent implements OnDestroy {
     'OripGeometry': OripGeometryBlockUiComponent,
   }
 
+  // depth, node is loaded with for GUI component (entire node if not in map): 1 loads node value with stubs as
+  // children, 0 means that stub is enough (array component loads pages itself)
+  static readonly DATA_BLOCK_LOAD_DEPTH: { [key: string]: number } = {
+    'CompoundBlock': 1,
+    'ArrayBlock': 0,
+    'ShpiBlock': 3,
+    'WwwwBlock': 2,
+  }
+
   @ViewChild(DataBlockUIDirective, { static: true }) dataBlockUiHost!: DataBlockUIDirective;
 
   _component: ComponentRef<GuiComponentInterface> | null = null;
@@ -68,6 +86,7 @@ export class EditorComponent implements OnDestroy {
   };
 
   private _resourceData: ReadData | ReadError | null = null;
+  loading: boolean = false;
   get resourceData(): ReadData | ReadError | null {
     return this._resourceData;
   }
@@ -87,31 +106,62 @@ export class EditorComponent implements OnDestroy {
       if ((this._resourceData as any).block_class_mro) {
         const readData = this._resourceData as ReadData;
         let component: Type<GuiComponentInterface> | undefined;
+        let loadDepth: number | undefined;
         for (const className of readData.block_class_mro.split('__')) {
           component = EditorComponent.DATA_BLOCK_COMPONENTS_MAP[className];
           if (component) {
+            loadDepth = EditorComponent.DATA_BLOCK_LOAD_DEPTH[className];
             break;
           }
         }
         if (!component) {
           throw new Error('Cannot find GUI component for block MRO ' + readData.block_class_mro);
         }
-        if (this._component && this._componentChangedSub) {
-          this._componentChangedSub.unsubscribe();
+        if (loadDepth === 0 && readData.block.child?.simplified) {
+          // simplified items are shown all at once
+          loadDepth = undefined;
+        }
+        // loaded depth of node with stubs as children is 0, of stub itself is -1
+        if ((readData.loaded_depth ?? Infinity) < (loadDepth ?? Infinity) - 1) {
+          this.loading = true;
+          this.mainService.loadNode(readData, loadDepth ?? null)
+            .then(() => {
+              if (this._resourceData === readData) {
+                this.createComponent(component!, readData);
+              }
+            })
+            .catch((err: ReadError) => {
+              if (this._resourceData === readData) {
+                this._resourceData = err;
+              }
+            })
+            .finally(() => {
+              this.loading = false;
+              this.cdr.markForCheck();
+            });
+        } else {
+          this.createComponent(component, readData);
         }
-        this._component = this.dataBlockUiHost.viewContainerRef.createComponent(component);
-        this._component.instance.resourceData = readData;
-        this._component.instance.name = this._name;
-        this._componentChangedSub = this._component.instance.changed
-          .pipe(takeUntil(this.destroyed$))
-          .subscribe(() => {
-            this.mainService.dataBlockChange$.next([readData.block_id, readData.value]);
-          });
       }
     }
   };
 
-  constructor(readonly mainService: MainService) {
+  private createComponent(component: Type<GuiComponentInterface>, readData: ReadData) {
+    if (this._component && this._componentChangedSub) {
+      this._componentChangedSub.unsubscribe();
+    }
+    this._component = this.dataBlockUiHost.viewContainerRef.createComponent(component);
+    this._component.instance.resourceData = readData;
+    this._component.instance.name = this._name;
+    this._componentChangedSub = this._component.instance.changed
+      .pipe(takeUntil(this.destroyed$))
+      .subscribe(() => {
+        this.mainService.dataBlockChange$.next([readData.block_id, readData.value]);
+      });
+  }
+
+  constructor(readonly mainService: MainService,
+              private readonly cdr: ChangeDetectorRef) {
   }
 
   ngOnDestroy(): void {
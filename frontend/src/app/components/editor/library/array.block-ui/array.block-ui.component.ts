@@ -1,5 +1,6 @@
 import { ChangeDetectionStrategy, ChangeDetectorRef, Component, EventEmitter, Input, Output } from '@angular/core';
 import { GuiComponentInterface } from '../../gui-component.interface';
+import { MainService } from '../../../../services/main.service';
 
 @Component({
   selector: 'app-array-block-ui',
@@ -17,7 +18,7 @@ export class ArrayBlockUiComponent implements GuiComponentInterface {
   @Input()
   set resourceData(value: ReadData | null) {
     this._resourceData = value;
-    this.showAsCollapsable = this._resourceData?.value?.length > 5;
+    this.showAsCollapsable = this.length > 5;
     this.updatePageIndexes();
     this.renderPage(0, this.minPageSize);
   }
@@ -39,7 +40,13 @@ export class ArrayBlockUiComponent implements GuiComponentInterface {
   goToIndex: number = 0;
   pageIndexes: number[] = [];
 
-  constructor(private readonly cdr: ChangeDetectorRef) {
+  // array can be a stub: items are loaded by pages
+  get length(): number {
+    return this._resourceData?.value?.length ?? this._resourceData?.size ?? 0;
+  }
+
+  constructor(private readonly cdr: ChangeDetectorRef,
+              private readonly mainService: MainService) {
   }
 
   onContentsTrigger(open: boolean): void {
@@ -59,10 +66,22 @@ export class ArrayBlockUiComponent implements GuiComponentInterface {
     }
   }
 
-  renderPage(pageIndex: number, pageSize: number) {
+  async renderPage(pageIndex: number, pageSize: number) {
     this.goToIndex = this.pageIndex = pageIndex;
     this.pageSize = pageSize;
-    this.renderItems = (this.resourceData?.value || []).slice(pageIndex * pageSize, (pageIndex + 1) * pageSize)
+    const resourceData = this.resourceData;
+    const start = pageIndex * pageSize;
+    const end = Math.min((pageIndex + 1) * pageSize, this.length);
+    if (resourceData && start < end && (!resourceData.value || resourceData.value.slice(start, end).some((x: any) => x === null))) {
+      this.renderItems = [];
+      this.cdr.markForCheck();
+      await this.mainService.loadChildren(resourceData, start, end - start, 1);
+      if (resourceData !== this.resourceData || pageIndex !== this.pageIndex || pageSize !== this.pageSize) {
+        return;
+      }
+    }
+    // value can be a typed array, its map cannot return objects
+    this.renderItems = Array.from((this.resourceData?.value || []).slice(start, end) as ArrayLike<any>)
       .map((x: ReadData) => !!x['block'] ? x : { ...x, block: this.resourceData?.block.child });
     this.cdr.markForCheck();
   }
@@ -70,7 +89,7 @@ export class ArrayBlockUiComponent implements GuiComponentInterface {
   updatePageIndexes() {
     this.goToIndex = this.pageIndex;
     this.pageIndexes = [];
-    for (let i = 0; i < Math.ceil((this.resourceData?.value || []).length / this.pageSize); i++) {
+    for (let i = 0; i < Math.ceil(this.length / this.pageSize); i++) {
       this.pageIndexes.push(i);
     }
   }
@@ -5,6 +5,11 @@ type ReadData = {
   block_id: string,
   editor_validators: any,
   value: any,
+  // stub is not loaded yet: value is null, size is amount of children
+  stub?: boolean,
+  size?: number,
+  // how deep children are loaded, Infinity if entirely
+  loaded_depth?: number,
 };
 
 type ReadError = {
@@ -12,6 +17,25 @@ type ReadError = {
   error_text: string,
 }
 
+// eel response: blocks are sent once in "schemas" table, data nodes reference them by id in "schema" field
+type DataTransferPayload = {
+  data: any,
+  schemas: { [id: string]: any },
+};
+
+// bytes of file, read by backend so far
+type ReadProgress = {
+  path: string,
+  read: number,
+  total: number,
+};
+
+// amount of changes, which can be undone and redone
+type EditHistory = {
+  undo: number,
+  redo: number,
+};
+
 type CustomAction = {
   method: string,
   title: string,
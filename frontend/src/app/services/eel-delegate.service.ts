@@ -3,6 +3,45 @@ import { BehaviorSubject } from 'rxjs';
 
 declare const eel: { expose: (func: Function, alias: string) => void } & { [key: string]: Function };
 
+const TYPED_ARRAYS: { [dtype: string]: any } = {
+  'uint8': Uint8Array,
+  'int8': Int8Array,
+  'uint16': Uint16Array,
+  'int16': Int16Array,
+  'uint32': Uint32Array,
+  'int32': Int32Array,
+  'float64': Float64Array,
+};
+
+// bytes and long number arrays come as base64 of little-endian typed array
+function decodeTypedArray(value: { typed_array: string, data: string }): ArrayLike<number> {
+  const binary = atob(value.data);
+  const bytes = new Uint8Array(binary.length);
+  for (let i = 0; i < binary.length; i++) {
+    bytes[i] = binary.charCodeAt(i);
+  }
+  const arrayClass = TYPED_ARRAYS[value.typed_array];
+  return new arrayClass(bytes.buffer, 0, bytes.length / arrayClass.BYTES_PER_ELEMENT);
+}
+
+// typed arrays are serialized to JSON as objects, backend expects lists
+function toPlainValue(value: any): any {
+  if (ArrayBuffer.isView(value)) {
+    return Array.from(value as any);
+  }
+  if (Array.isArray(value)) {
+    return value.map(toPlainValue);
+  }
+  if (value && typeof value === 'object') {
+    const res: any = {};
+    for (const key of Object.keys(value)) {
+      res[key] = toPlainValue(value[key]);
+    }
+    return res;
+  }
+  return value;
+}
+
 @Injectable({
   providedIn: 'root'
 })
@@ -10,11 +49,16 @@ export class EelDelegateService {
 
   public readonly openedResource$: BehaviorSubject<ReadData | ReadError | null> = new BehaviorSubject<ReadData | ReadError | null>(null);
   public readonly openedResourcePath$: BehaviorSubject<string | null> = new BehaviorSubject<string | null>(null);
+  // progress of file, which is being read by backend
+  public readonly readProgress$: BehaviorSubject<ReadProgress | null> = new BehaviorSubject<ReadProgress | null>(null);
+  // only the last opened file is shown, backend cancels reading of previous one
+  private openFileRequest = 0;
 
   constructor(
     private readonly ngZone: NgZone,
   ) {
     eel.expose(this.wrapHandler(this.openFile), 'open_file');
+    eel.expose(this.wrapHandler(this.onReadProgress), 'on_read_progress');
     eel['on_angular_ready']();
   }
 
@@ -29,24 +73,106 @@ export class EelDelegateService {
     });
   }
 
+  // rebuilds read data from payload: every node gets block from schemas table, the same block object is shared
+  // between all nodes, which reference it. Node gets loaded_depth: how deep its children are loaded
+  private unpackPayload(payload: DataTransferPayload): any {
+    const blocks: { [id: string]: any } = {};
+    const resolveBlock = (id: string): any => {
+      if (!blocks[id]) {
+        const block: any = blocks[id] = {};
+        for (const [key, value] of Object.entries(payload.schemas[id])) {
+          block[key] = (value && (value as any).schema_ref !== undefined) ? resolveBlock((value as any).schema_ref) : value;
+        }
+      }
+      return blocks[id];
+    };
+    // returns the lowest loaded depth of nodes in value, Infinity if there are no nodes
+    const resolveValue = (container: any, key: string | number): number => {
+      const value = container[key];
+      if (!value || typeof value !== 'object') {
+        return Infinity;
+      }
+      if (value.typed_array !== undefined && value.data !== undefined) {
+        container[key] = decodeTypedArray(value);
+        return Infinity;
+      }
+      let depth = Infinity;
+      if (Array.isArray(value)) {
+        for (let i = 0; i < value.length; i++) {
+          depth = Math.min(depth, resolveValue(value, i));
+        }
+        return depth;
+      }
+      if (value.schema !== undefined && value.block_id !== undefined) {
+        const block = resolveBlock(value.schema);
+        const node: ReadData = container[key] = {
+          block_class_mro: block.block_class_mro,
+          block,
+          block_id: value.block_id,
+          editor_validators: block.editor_validators,
+          value: value.stub ? null : value.value,
+          stub: !!value.stub,
+          size: value.size,
+        };
+        node.loaded_depth = value.stub ? -1 : resolveValue(node, 'value') + 1;
+        return node.loaded_depth;
+      }
+      for (const subKey of Object.keys(value)) {
+        depth = Math.min(depth, resolveValue(value, subKey));
+      }
+      return depth;
+    };
+    const root = { data: payload.data };
+    resolveValue(root, 'data');
+    return root.data;
+  }
+
   public async openFile(path: string, forceReload: boolean = false) {
+    const request = ++this.openFileRequest;
     this.openedResource$.next(null);
     this.openedResourcePath$.next(null);
-    const res: ReadData | ReadError = await eel['open_file'](path, forceReload)();
+    this.readProgress$.next({ path, read: 0, total: 0 });
+    // file is opened as a stub, editor components load as much as they need
+    const payload = await eel['open_file'](path, forceReload)();
+    if (request !== this.openFileRequest || !payload) {
+      return;
+    }
+    const res: ReadData | ReadError = this.unpackPayload(payload);
+    this.readProgress$.next(null);
     this.openedResource$.next(res);
     this.openedResourcePath$.next(path);
   }
 
+  private onReadProgress(path: string, read: number, total: number) {
+    if (this.readProgress$.getValue()?.path === path) {
+      this.readProgress$.next({ path, read, total });
+    }
+  }
+
+  public async getNode(id: string, depth: number | null = null): Promise<ReadData | ReadError> {
+    return this.unpackPayload(await eel['get_node'](id, depth)());
+  }
+
+  public async loadChildren(id: string, offset: number, limit: number,
+                            depth: number | null = null): Promise<ReadData[] | ReadError> {
+    return this.unpackPayload(await eel['load_children'](id, offset, limit, depth)());
+  }
+
   public async openFileWithSystemApp(path: string) {
     await eel['open_file_with_system_app'](path)();
   }
 
   public async runCustomAction(readData: ReadData, action: CustomAction, args: { [key: string]: any }) {
-    return eel['run_custom_action'](readData.block_id, action, args)();
+    return this.unpackPayload(await eel['run_custom_action'](readData.block_id, action, args)());
   }
 
   public async saveFile(changes: {id: string, value: any}[]) {
-    return eel['save_file'](this.openedResourcePath$.getValue(), changes)();
+    return eel['save_file'](this.openedResourcePath$.getValue(), toPlainValue(changes))();
+  }
+
+  // returns URL of PNG image, rendered in memory
+  public async renderPreview(id: string, settingsPatch: any = {}): Promise<string> {
+    return eel['render_preview'](id, settingsPatch)();
   }
 
   public async serializeResource(id: string, settingsPatch: any = {}): Promise<string[]> {
@@ -54,10 +180,22 @@ export class EelDelegateService {
   }
 
   public async serializeResourceTmp(id: string, changes: {id: string, value: any}[], settingsPatch: any = {}): Promise<string[]> {
-    return eel['serialize_resource_tmp'](id, changes, settingsPatch)();
+    return eel['serialize_resource_tmp'](id, toPlainValue(changes), settingsPatch)();
   }
 
   public async deserializeResource(id: string): Promise<ReadData | ReadError> {
-    return eel['deserialize_resource'](id)();
+    return this.unpackPayload(await eel['deserialize_resource'](id)());
+  }
+
+  public async undo(): Promise<ReadData[] | ReadError> {
+    return this.unpackPayload(await eel['undo']()());
+  }
+
+  public async redo(): Promise<ReadData[] | ReadError> {
+    return this.unpackPayload(await eel['redo']()());
+  }
+
+  public async getEditHistory(): Promise<EditHistory> {
+    return eel['get_edit_history']()();
   }
 }
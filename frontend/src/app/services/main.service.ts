@@ -13,6 +13,7 @@ export class MainService {
   resourceError$: BehaviorSubject<ReadError | null> = new BehaviorSubject<ReadError | null>(null);
 
   customActionRunning$: BehaviorSubject<boolean> = new BehaviorSubject<boolean>(false);
+  editHistory$: BehaviorSubject<EditHistory> = new BehaviorSubject<EditHistory>({ undo: 0, redo: 0 });
 
   readonly changedDataBlocks: { [key: string]: any } = {};
   dataBlockChange$: Subject<[string, any]> = new Subject<[string, any]>();
@@ -20,6 +21,7 @@ export class MainService {
   constructor(readonly eelDelegate: EelDelegateService) {
     this.eelDelegate.openedResource$.subscribe((value) => {
       this.clearUnsavedChanges();
+      this.refreshEditHistory().then();
       if (!value) {
         this.resourceData$.next(null);
         this.resourceError$.next(null);
@@ -45,6 +47,11 @@ export class MainService {
     return Object.keys(this.changedDataBlocks).length > 0;
   }
 
+  // changes, made in editor and not sent to backend yet
+  get hasLocalChanges(): boolean {
+    return Object.keys(this.changedDataBlocks).some(id => id != '__has_external_changes__');
+  }
+
   private getInitialValueFromSnapshot(blockId: string): any {
     let sub = this.dataSnapshot;
     const blockPath = blockId.replace('__', '/').split('/');
@@ -78,6 +85,40 @@ export class MainService {
     return result;
   }
 
+  private addToSnapshot(readData: ReadData) {
+    merge(this.dataSnapshot, cloneDeep(this.buildResourceDataSnapshot({ node: readData })));
+  }
+
+  // loads stub (or not deep enough loaded node) in place, so all references to it stay valid
+  public async loadNode(readData: ReadData, depth: number | null = null): Promise<ReadData> {
+    const res: ReadData | ReadError = await this.eelDelegate.getNode(readData.block_id, depth);
+    if (!!(res as ReadError).error_class) {
+      throw res;
+    }
+    Object.assign(readData, res);
+    this.addToSnapshot(readData);
+    return readData;
+  }
+
+  // loads page of array items into not loaded array. Items are put into array value, which is created if needed
+  public async loadChildren(readData: ReadData, offset: number, limit: number,
+                            depth: number | null = null): Promise<ReadData[]> {
+    const res: ReadData[] | ReadError = await this.eelDelegate.loadChildren(readData.block_id, offset, limit, depth);
+    if (!!(res as ReadError).error_class) {
+      throw res;
+    }
+    if (!readData.value) {
+      readData.value = new Array(readData.size || 0).fill(null);
+    }
+    (res as ReadData[]).forEach((item, i) => {
+      readData.value[offset + i] = item;
+      if (item?.block_class_mro) {
+        this.addToSnapshot(item);
+      }
+    });
+    return res as ReadData[];
+  }
+
   clearUnsavedChanges() {
     Object.keys(this.changedDataBlocks).forEach(key => {
       delete this.changedDataBlocks[key];
@@ -94,9 +135,49 @@ export class MainService {
     merge(this.resourceData$.getValue()!, res);
     this.changedDataBlocks['__has_external_changes__'] = 1;
     this.customActionRunning$.next(false);
+    await this.refreshEditHistory();
+    return res;
+  }
+
+  // puts changed nodes in place of loaded nodes with the same block id, not loaded nodes are skipped
+  private async processChangedNodes(call: () => Promise<ReadData[] | ReadError>): Promise<ReadData[] | ReadError> {
+    this.customActionRunning$.next(true);
+    const res: ReadData[] | ReadError = await call();
+    if (!!(res as ReadError).error_class) {
+      this.customActionRunning$.next(false);
+      throw res;
+    }
+    const changedNodes = new Map<string, ReadData>((res as ReadData[]).map(x => [x.block_id, x]));
+    let updated = false;
+    const visit = (node: any) => {
+      if (!isObject(node) || ArrayBuffer.isView(node)) {
+        return;
+      }
+      const changedNode = changedNodes.get((node as ReadData).block_id);
+      if (changedNode) {
+        Object.assign(node, changedNode);
+        updated = true;
+      } else if (Array.isArray(node)) {
+        node.forEach(visit);
+      } else if ((node as ReadData).block_id) {
+        visit((node as ReadData).value);
+      } else {
+        forOwn(node, visit);
+      }
+    };
+    visit(this.resourceData$.getValue());
+    if (updated) {
+      this.changedDataBlocks['__has_external_changes__'] = 1;
+    }
+    this.customActionRunning$.next(false);
+    await this.refreshEditHistory();
     return res;
   }
 
+  public async refreshEditHistory() {
+    this.editHistory$.next(await this.eelDelegate.getEditHistory());
+  }
+
   public async runCustomAction(action: CustomAction, args: { [key: string]: any }) {
     return this.processExternalChanges(() => this.eelDelegate.runCustomAction(this.resourceData$.getValue()!, action, args));
   }
@@ -104,4 +185,12 @@ export class MainService {
   public async deserializeResource(id: string) {
     return this.processExternalChanges(() => this.eelDelegate.deserializeResource(id));
   }
+
+  public async undo() {
+    return this.processChangedNodes(() => this.eelDelegate.undo());
+  }
+
+  public async redo() {
+    return this.processChangedNodes(() => this.eelDelegate.redo());
+  }
 }
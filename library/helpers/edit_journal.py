@@ -0,0 +1,147 @@
+from contextlib import contextmanager
+from copy import deepcopy
+from logging import warning
+from typing import Dict, List, Optional, Tuple
+
+from library.helpers.data_wrapper import DataWrapper
+from library.helpers.id import join_id
+from library.helpers.resource_index import ResourceIndex
+from library.read_data import ReadData
+
+
+def _copy_value(value):
+    # leaf values can be mutable (flags, lists of numbers) and changed in place later, journal keeps own copies
+    if isinstance(value, list):
+        return deepcopy(value) if value and isinstance(value[0], (list, dict)) else list(value)
+    if isinstance(value, dict):
+        return deepcopy(value)
+    return value
+
+
+def _get_children(node: ReadData) -> Optional[List[Tuple[str, ReadData]]]:
+    # None for leaf nodes: their value is not made of other nodes
+    value = node.value
+    if isinstance(value, list):
+        children = [(str(i), x) for i, x in enumerate(value) if isinstance(x, ReadData)]
+    elif isinstance(value, DataWrapper):
+        children = [(k, v) for k, v in value.items() if isinstance(v, ReadData)]
+    else:
+        return None
+    return children or None
+
+
+def _get_leaves(node: ReadData, node_id: str) -> Dict[str, object]:
+    # leaf id -> value. Ids are built from position, ids in block state of moved nodes are not valid anymore
+    res = {}
+    stack = [(node_id, node)]
+    while stack:
+        item_id, item = stack.pop()
+        children = _get_children(item)
+        if children is None:
+            res[item_id] = item.value
+        else:
+            stack.extend((join_id(item_id, key), child) for key, child in children)
+    return res
+
+
+class EditJournal:
+    """
+     Undo/redo history of changes of opened file. Entry is a list of (id, old value, new value) of changed leaf nodes,
+     so history takes memory, proportional to size of changes, not to size of file. Changes, made in place (custom
+     actions, deserialization), are recorded by comparing values of affected subtree before and after
+     """
+
+    def __init__(self, root: Optional[ReadData] = None):
+        # changes are looked up in this tree, not in files cache: cached file can be reloaded from disk after saving
+        self.root = root
+        self.undo_entries: List[List[Tuple[str, object, object]]] = []
+        self.redo_entries: List[List[Tuple[str, object, object]]] = []
+        self._index: Optional[ResourceIndex] = None
+
+    def _find_node(self, id: str) -> Optional[ReadData]:
+        if not isinstance(self.root, ReadData):
+            return None
+        if self._index is None:
+            self._index = ResourceIndex(self.root)
+        return self._index.find(id)
+
+    def _push(self, entry: List[Tuple[str, object, object]]):
+        if not entry:
+            return
+        self.undo_entries.append(entry)
+        self.redo_entries.clear()
+
+    def clear(self):
+        self.undo_entries.clear()
+        self.redo_entries.clear()
+
+    def apply(self, changes: List[Dict]):
+        """
+         Applies changes from GUI: list of {"id": full node id, "value": new value} and records them as one entry
+         """
+        entry = []
+        for delta in changes:
+            node = self._find_node(delta['id'])
+            if node is None:
+                warning('Skipped change ' + delta['id'] + '. Wrong ID')
+                continue
+            old_value = _copy_value(node.value)
+            node.value = delta['value']
+            if old_value != delta['value']:
+                entry.append((delta['id'], old_value, _copy_value(delta['value'])))
+        self._push(entry)
+
+    @contextmanager
+    def record(self, resource: ReadData):
+        """
+         Records changes of resource and its children, made in place inside of this context, as one entry. If
+         structure of resource changes, it cannot be undone by values, so history is cleared
+         """
+        before = {k: _copy_value(v) for k, v in _get_leaves(resource, resource.id).items()}
+        yield
+        # nodes could be moved
+        self._index = None
+        after = _get_leaves(resource, resource.id)
+        if before.keys() != after.keys():
+            warning('Structure of ' + resource.id + ' was changed, undo history is cleared')
+            self.clear()
+            return
+        self._push([(k, v, _copy_value(after[k])) for k, v in before.items() if v != after[k]])
+
+    def _replay(self, entry: List[Tuple[str, object, object]], undo: bool) -> List[ReadData]:
+        nodes = []
+        for id, old_value, new_value in (reversed(entry) if undo else entry):
+            node = self._find_node(id)
+            if node is None:
+                raise KeyError(f'Resource {id} not found')
+            node.value = _copy_value(old_value if undo else new_value)
+            nodes.append(node)
+        return nodes
+
+    def undo(self) -> Optional[List[ReadData]]:
+        """
+         Reverts the last entry. Returns changed nodes or None if there is nothing to undo
+         """
+        if not self.undo_entries:
+            return None
+        entry = self.undo_entries.pop()
+        nodes = self._replay(entry, undo=True)
+        self.redo_entries.append(entry)
+        return nodes
+
+    def redo(self) -> Optional[List[ReadData]]:
+        """
+         Applies the last reverted entry again. Returns changed nodes or None if there is nothing to redo
+         """
+        if not self.redo_entries:
+            return None
+        entry = self.redo_entries.pop()
+        nodes = self._replay(entry, undo=False)
+        self.undo_entries.append(entry)
+        return nodes
+
+    def get_state(self) -> Dict:
+        return {
+            'undo': len(self.undo_entries),
+            'redo': len(self.redo_entries),
+        }
@@ -19,3 +19,9 @@ class MultiReadUnavailableException(Exception):
 
 class SerializationException(Exception):
     pass
+
+
+# not an Exception subclass: blocks catch exceptions to keep errors in read data, but cancelled reading should stop
+class ReadCancelledException(BaseException):
+    def __init__(self, message='Reading was cancelled'):
+        super().__init__(message)
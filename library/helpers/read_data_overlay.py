@@ -0,0 +1,72 @@
+from logging import warning
+from typing import Dict, List, Set
+
+from library.helpers.data_wrapper import DataWrapper
+from library.read_data import ReadData
+
+
+class ReadDataOverlay:
+    """
+     Copy-on-write view of read data with pending changes. Only nodes on the way from the root to changed nodes are
+     shadowed with shallow copies, all other nodes are shared with original data, which remains untouched. So applying
+     changes takes time, proportional to amount of changes, not to the size of data. Serializers read the view from
+     "data" attribute as usual read data
+     """
+
+    def __init__(self, data: ReadData):
+        self.original = data
+        self.data = data
+        # pending changes: full id -> new value
+        self.changes: Dict[str, object] = {}
+        # ids of shadow nodes. Shadow nodes are referenced by view, so python ids are not reused while overlay exists
+        self._shadows: Set[int] = set()
+
+    def _shadow(self, node: ReadData) -> ReadData:
+        if id(node) in self._shadows:
+            return node
+        value = node.value
+        if isinstance(value, DataWrapper):
+            value = DataWrapper(value)
+        elif isinstance(value, list):
+            value = list(value)
+        shadow = ReadData(value=value, block=node.block, block_state=node.block_state)
+        self._shadows.add(id(shadow))
+        return shadow
+
+    @staticmethod
+    def _child_key(node: ReadData, key: str):
+        if isinstance(node.value, list):
+            custom_names = node.block_state.get('custom_names') or []
+            if key in custom_names:
+                return custom_names.index(key)
+            if key.isdigit() and int(key) < len(node.value):
+                return int(key)
+        elif isinstance(node.value, dict) and isinstance(node.value.get(key), ReadData):
+            return key
+        raise KeyError(key)
+
+    def set(self, sub_id: str, value):
+        """
+         Sets value of node by id, relative to the root of overlay (without root id and separator)
+         """
+        self.data = node = self._shadow(self.data)
+        for key in [x for x in sub_id.split('/') if x]:
+            child_key = self._child_key(node, key)
+            node.value[child_key] = child = self._shadow(node.value[child_key])
+            node = child
+        node.value = value
+        # shadow node is not a part of read file, nothing to save
+        ReadData.dirty_nodes.pop(id(node), None)
+        self.changes[node.id] = value
+
+    def apply(self, changes: List[Dict]):
+        """
+         Applies changes from GUI: list of {"id": full node id, "value": new value}
+         """
+        root_id = self.original.id
+        prefix = root_id + ('/' if '__' in root_id else '__')
+        for delta in changes:
+            if not delta['id'].startswith(prefix):
+                warning('Skipped change ' + delta['id'] + '. Wrong ID')
+                continue
+            self.set(delta['id'][len(prefix):], delta['value'])
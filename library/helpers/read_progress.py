@@ -0,0 +1,55 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from io import BufferedReader, BytesIO
+from typing import Optional
+
+from library.helpers.exceptions import ReadCancelledException
+
+
+class ReadProgress:
+    """
+     Progress of reading a file. Compound and array blocks report position in buffer after every field or item, only
+     positions in tracked buffer (file itself or uncompressed data of compressed file) are counted. Reading can be
+     cancelled from another thread: it stops with ReadCancelledException at the next report
+     """
+
+    def __init__(self):
+        self.buffer = None
+        self.position = 0
+        self.total = 0
+        self.cancelled = False
+
+    def track(self, buffer: [BufferedReader, BytesIO], total: int):
+        self.buffer = buffer
+        self.position = 0
+        self.total = total
+
+    def report(self, buffer: [BufferedReader, BytesIO], position: int):
+        if self.cancelled:
+            raise ReadCancelledException()
+        # detached blocks jump back and forth, progress only grows
+        if buffer is self.buffer and position > self.position:
+            self.position = position
+
+    def cancel(self):
+        self.cancelled = True
+
+
+# progress of reading in current thread, see report_read_progress
+_read_progress = ContextVar('read_progress', default=None)
+
+
+def get_read_progress() -> Optional[ReadProgress]:
+    return _read_progress.get()
+
+
+@contextmanager
+def report_read_progress(progress: ReadProgress):
+    """
+     Files, read inside this context, report progress to given object
+     """
+    token = _read_progress.set(progress)
+    try:
+        yield progress
+    finally:
+        _read_progress.reset(token)
@@ -0,0 +1,106 @@
+from typing import Dict, Optional, Set, Tuple
+
+from library.helpers.id import join_id
+from library.read_data import ReadData
+
+
+class ResourceIndex:
+    """
+     Index of resources of one file: full id -> node and id -> (id of parent, key in parent value). Built lazily: when
+     id is looked up for the first time, nodes on the way to it are indexed together with their siblings, so next
+     lookups are a single dict access. Named children (like SHPI children) are indexed by name and by position. Index
+     is not updated, when data structure changes (nodes are moved or replaced), such edits should drop it together
+     with memo
+     """
+
+    def __init__(self, root: ReadData):
+        self.root = root
+        self._nodes: Dict[str, ReadData] = {root.id: root}
+        self._parents: Dict[str, Tuple[str, object]] = {}
+        # ids of nodes, which children are indexed
+        self._indexed: Set[str] = set()
+        # values, derived from data structure (like resolved palettes), live as long as index
+        self.memo: Dict[object, object] = {}
+
+    def _index_children(self, node_id: str, node: ReadData):
+        self._indexed.add(node_id)
+        value = node.value
+        if isinstance(value, list):
+            # name takes precedence over position, the first one of the same names wins
+            for i, name in enumerate(node.block_state.get('custom_names') or []):
+                child_id = join_id(node_id, name)
+                if child_id not in self._nodes and i < len(value) and isinstance(value[i], ReadData):
+                    self._nodes[child_id] = value[i]
+                    self._parents[child_id] = (node_id, i)
+            for i, child in enumerate(value):
+                child_id = join_id(node_id, str(i))
+                if child_id not in self._nodes and isinstance(child, ReadData):
+                    self._nodes[child_id] = child
+                    self._parents[child_id] = (node_id, i)
+        elif isinstance(value, dict):
+            for key, child in value.items():
+                if isinstance(child, ReadData):
+                    child_id = join_id(node_id, key)
+                    self._nodes[child_id] = child
+                    self._parents[child_id] = (node_id, key)
+
+    @staticmethod
+    def _get_value(node: ReadData, key: str):
+        # not indexed values: items of lists and dicts, which are not nodes
+        if isinstance(node.value, list):
+            if key.isdigit() and int(key) < len(node.value):
+                return node.value[int(key)]
+            return None
+        try:
+            return node.value[key]
+        except (KeyError, TypeError):
+            return None
+
+    def _resolve(self, id: str) -> Optional[str]:
+        # indexes nodes on the way to id, returns id of the node in index or None if there is no such node
+        if id in self._nodes:
+            return id
+        root_id = self.root.id
+        if not id.startswith(root_id + '__'):
+            return None
+        node_id, node = root_id, self.root
+        for key in [x for x in id[len(root_id) + 2:].split('/') if x]:
+            if node_id not in self._indexed:
+                self._index_children(node_id, node)
+            node_id = join_id(node_id, key)
+            node = self._nodes.get(node_id)
+            if node is None:
+                return None
+        if node_id != id:
+            # the same id with extra separators
+            self._nodes[id] = node
+            if node_id in self._parents:
+                self._parents[id] = self._parents[node_id]
+        return id
+
+    def find(self, id: str):
+        """
+         Returns node by full id or None. Like require_resource, returns plain values of not-node items as well
+         """
+        resolved_id = self._resolve(id)
+        if resolved_id is not None:
+            return self._nodes[resolved_id]
+        prefix = self.root.id + '__'
+        if not id.startswith(prefix):
+            return None
+        parent_id, _, key = id.rpartition('/')
+        if len(parent_id) < len(prefix):
+            parent_id, key = self.root.id, id[len(prefix):]
+        parent_id = self._resolve(parent_id)
+        return self._get_value(self._nodes[parent_id], key) if parent_id is not None else None
+
+    def find_parent(self, id: str) -> Tuple[Optional[ReadData], object]:
+        """
+         Returns container of node by full id and key of node in container value: index for arrays, name for compound
+         fields. (None, None) for root or unknown id
+         """
+        resolved_id = self._resolve(id)
+        if resolved_id is None or resolved_id not in self._parents:
+            return None, None
+        parent_id, key = self._parents[resolved_id]
+        return self._nodes[parent_id], key
@@ -1,10 +1,11 @@
 import os
+import time
 from io import BufferedReader, BytesIO, SEEK_CUR
 
 
 # this looks like a mess, but it is intended to be like that: by using local imports we dramatically increase
 # performance, because we spawn process per file, and it doesn't need to load all those classes every time
-from typing import Tuple
+from typing import Tuple, Dict, Set, Optional
 
 
 def _find_block_class(file_name: str, header_str: str, header_bytes: bytes):
@@ -118,55 +119,296 @@ def probe_block_class(binary_file: [BufferedReader, BytesIO], file_name: str = N
     raise NotImplementedError('Don`t have parser for such resource')
 
 
-# id example: /media/data/nfs/SIMDATA/CARFAMS/LDIABL.CFM__1/frnt
-def require_resource(id: str) -> Tuple:
+def _get_resource_index(id: str):
+    from library.helpers.resource_index import ResourceIndex
     file_path = id.split('__')[0].replace('---DRIVE', ':')
     file_resource = require_file(file_path)
     if not file_resource:
         return None, None
-    if file_path == id:
-        return file_resource, file_resource
-    resource_path = [x for x in id.split('__')[1].split('/') if x]
-    resource = file_resource
-    for key in resource_path:
-        if isinstance(resource.value, list):
-            if key in resource.block_state.get('custom_names', []):
-                return resource.value[resource.block_state.get('custom_names', []).index(key)], file_resource
-            if key.isdigit():
-                try:
-                    resource = resource[int(key)]
-                    continue
-                except KeyError:
-                    pass
-            return None, file_resource
+    # file can be not cached, if it was evicted right away
+    index = files_cache.get_index(file_path.replace('\\', '/')) or ResourceIndex(file_resource)
+    return index, file_resource
+
+
+# id example: /media/data/nfs/SIMDATA/CARFAMS/LDIABL.CFM__1/frnt
+def require_resource(id: str) -> Tuple:
+    index, file_resource = _get_resource_index(id)
+    if index is None:
+        return None, None
+    return index.find(id), file_resource
+
+
+def get_resource_memo(id: str) -> Dict:
+    """
+     Returns dict for caching values, derived from structure of file, which contains resource with given id (like
+     resolved palettes). It is dropped, when file is reloaded or its structure changes, see invalidate_resource_index
+     """
+    index, _ = _get_resource_index(id)
+    return index.memo if index is not None else {}
+
+
+def require_parent(id: str) -> Tuple:
+    """
+     Returns container of resource and key of resource in container value: index for arrays, name for compound fields.
+     (None, None) for file itself or unknown id
+     """
+    index, _ = _get_resource_index(id)
+    if index is None:
+        return None, None
+    return index.find_parent(id)
+
+
+def _estimate_decoded_size(data) -> int:
+    # python objects are much heavier than the binary data they were read from: every ReadData node with its state
+    # takes about half a kilobyte, plain lists (bitmap pixels, colors etc.) take a pointer per item. Good enough for
+    # keeping cache in a memory budget, much cheaper than measuring real memory usage
+    from library.read_data import ReadData
+    nodes = items = raw = 0
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, ReadData):
+            nodes += 1
+            stack.append(item.value)
+        elif isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            items += len(item)
+            stack.extend(x for x in item if isinstance(x, (ReadData, dict, list, tuple, bytes, bytearray)))
+        elif isinstance(item, (bytes, bytearray)):
+            raw += len(item)
+    return nodes * 500 + items * 8 + raw
+
+
+class FileCache:
+    """
+     LRU cache of loaded files, limited by estimated size of decoded data. Entry is dropped if file was modified
+     on disk after it was loaded: modification time is checked at most once per mtime_check_interval seconds, not on
+     every hit, unless check_mtime is requested. Pinned entries (e.g. file, opened in GUI editor, which can have unsaved changes) are
+     never evicted or invalidated automatically. The most recently loaded file is kept even if it alone exceeds
+     the budget. Limits, which are not given, are taken from settings on first use
+     """
+
+    def __init__(self, max_size: Optional[int] = None, mtime_check_interval: Optional[float] = None):
+        # 0 means no limit
+        self._max_size = max_size
+        self._mtime_check_interval = mtime_check_interval
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # path -> (data, mtime, estimated size, time of the last mtime check). Dict keeps insertion order, the most recently used entry is the last
+        self._entries: Dict[str, Tuple] = {}
+        self._pinned: Set[str] = set()
+        # path -> index of resources of cached file, created on demand
+        self._indexes: Dict[str, 'ResourceIndex'] = {}
+
+    @property
+    def max_size(self) -> int:
+        if self._max_size is None:
+            import settings
+            self._max_size = settings.file_cache_max_size_mb * 1024 * 1024
+        return self._max_size
+
+    @max_size.setter
+    def max_size(self, value: int):
+        self._max_size = value
+
+    @property
+    def mtime_check_interval(self) -> float:
+        if self._mtime_check_interval is None:
+            import settings
+            self._mtime_check_interval = settings.file_cache_mtime_check_interval
+        return self._mtime_check_interval
+
+    @mtime_check_interval.setter
+    def mtime_check_interval(self, value: float):
+        self._mtime_check_interval = value
+
+    def __contains__(self, path: str):
+        return path in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _mtime(path: str):
         try:
-            resource = getattr(resource, key)
-        except AttributeError:
-            return None, file_resource
-        if not resource:
-            return None, file_resource
-    return resource, file_resource
+            return os.path.getmtime(path)
+        except OSError:
+            return None
+
+    def get(self, path: str, check_mtime: bool = False):
+        entry = self._entries.get(path)
+        if entry is None:
+            self.misses += 1
+            return None
+        now = time.monotonic()
+        if path not in self._pinned and (check_mtime or now - entry[3] >= self.mtime_check_interval):
+            if self._mtime(path) != entry[1]:
+                self.invalidations += 1
+                self.misses += 1
+                self.invalidate(path)
+                return None
+            entry = (*entry[:3], now)
+        self.hits += 1
+        # move to the end as the most recently used
+        del self._entries[path]
+        self._entries[path] = entry
+        return entry[0]
+
+    def put(self, path: str, data, mtime=None):
+        from library.read_data import ReadData
+        self.invalidate(path)
+        # estimated once per load, see load_file
+        size = (data.block_state.get('estimated_size') if isinstance(data, ReadData) else None)
+        if size is None:
+            size = _estimate_decoded_size(data)
+        self._entries[path] = (data, mtime if mtime is not None else self._mtime(path), size, time.monotonic())
+        self.size += size
+        self._evict(keep=path)
+
+    def _evict(self, keep: str):
+        if not self.max_size:
+            return
+        for path in list(self._entries.keys()):
+            if self.size <= self.max_size:
+                break
+            if path == keep or path in self._pinned:
+                continue
+            self.invalidate(path)
+            self.evictions += 1
+
+    def invalidate(self, path: str):
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self.size -= entry[2]
+        self._indexes.pop(path, None)
+
+    def get_index(self, path: str):
+        """
+         Returns index of resources of cached file or None if file is not cached
+         """
+        from library.helpers.resource_index import ResourceIndex
+        from library.read_data import ReadData
+        entry = self._entries.get(path)
+        if entry is None or not isinstance(entry[0], ReadData):
+            return None
+        index = self._indexes.get(path)
+        if index is None or index.root is not entry[0]:
+            index = self._indexes[path] = ResourceIndex(entry[0])
+        return index
+
+    def invalidate_index(self, path: str):
+        """
+         Drops index of cached file, must be called after changes of data structure: moved, added or removed nodes
+         """
+        self._indexes.pop(path, None)
+
+    def pin(self, path: str):
+        self._pinned.add(path)
+
+    def unpin(self, path: str):
+        self._pinned.discard(path)
+        self._evict(keep=None)
+
+    def clear(self):
+        self._entries.clear()
+        self._indexes.clear()
+        self.size = 0
+
+    def stats(self) -> Dict:
+        return {
+            'entries': len(self._entries),
+            'estimated_size': self.size,
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
 
 
 # not shared between processes: in most cases if file requires another resource, it is in the same file, or it
 # requires one external file multiple times. It will be more time-consuming to serialize/deserialize it for sharing
-# between processes than load some file multiple times. + we avoid potential memory leaks
-files_cache = {}
+# between processes than load some file multiple times. + we avoid potential memory leaks.
+# The exception is a small set of hot files (see settings.multiprocess_shared_files): those are decoded once in the
+# main process and published to workers via shared memory, see library/shared_cache.py
+files_cache = FileCache()
 
 
 def clear_file_cache(path: str):
-    try:
-        del files_cache[path.replace('\\', '/')]
-    except KeyError:
-        pass
+    files_cache.invalidate(path.replace('\\', '/'))
 
 
-def require_file(path: str):
-    data = files_cache.get(path.replace('\\', '/'))
-    if data is None:
+def invalidate_resource_index(id: str):
+    """
+     Drops index of resources of file, which contains resource with given id. Must be called after moving, adding or
+     removing nodes
+     """
+    files_cache.invalidate_index(id.split('__')[0].replace('---DRIVE', ':').replace('\\', '/'))
+
+
+def read_payload(block_class, payload: bytes, path: str):
+    """
+     Reads file resource from already loaded file contents. If block class is compressed, payload is expected to be
+     decompressed already
+     """
+    from library.helpers.read_progress import get_read_progress
+    from library.read_data import changes_not_tracked
+    block = block_class()
+    state = {'id': path.replace('\\', '/').replace(':', '---DRIVE')}
+    with changes_not_tracked():
+        if hasattr(block, 'read_uncompressed'):
+            return block.read_uncompressed(payload, state)
+        buffer = BytesIO(payload)
+        # some blocks rely on file name of the buffer
+        buffer.name = path
+        progress = get_read_progress()
+        if progress is not None:
+            progress.track(buffer, len(payload))
+        return block.read(buffer, len(payload), state)
+
+
+def load_file(path: str):
+    """
+     Reads file, bypassing files cache. Safe to call from another thread: if reading is done in report_read_progress
+     context, it reports progress and can be cancelled, see library.helpers.read_progress
+     """
+    normalized_path = path.replace('\\', '/')
+    mtime = os.path.getmtime(path)
+    from library.helpers.read_progress import get_read_progress
+    from library.read_data import changes_not_tracked
+    from library.shared_cache import get_shared_payload
+    shared = get_shared_payload(normalized_path)
+    if shared is not None:
+        block_class, payload = shared
+        data = read_payload(block_class, payload, path)
+    else:
         with open(path, 'rb', buffering=100 * 1024 * 1024) as bdata:
             block_class = probe_block_class(bdata, path)
             block = block_class()
-            data = block.read(bdata, os.path.getsize(path), {'id': path.replace('\\', '/').replace(':', '---DRIVE')})
-            files_cache[path.replace('\\', '/')] = data
+            progress = get_read_progress()
+            if progress is not None:
+                progress.track(bdata, os.path.getsize(path))
+            # blocks fix up values while reading, loaded file has no changes to save
+            with changes_not_tracked():
+                data = block.read(bdata, os.path.getsize(path), {'id': normalized_path.replace(':', '---DRIVE')})
+    # lets saver check, that file was not changed by someone else before patching it in place
+    data.block_state['file_mtime'] = mtime
+    if 'read_offset' not in data.block_state:
+        data.block_state['read_offset'] = 0
+        data.block_state['read_size'] = os.path.getsize(path)
+    # cache needs it every time file is put there, walking the whole tree is too slow for that
+    data.block_state['estimated_size'] = _estimate_decoded_size(data)
+    return data
+
+
+def require_file(path: str):
+    normalized_path = path.replace('\\', '/')
+    data = files_cache.get(normalized_path)
+    if data is None:
+        data = load_file(path)
+        files_cache.put(normalized_path, data, data.block_state['file_mtime'])
     return data
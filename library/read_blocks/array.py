@@ -8,6 +8,7 @@ from library.helpers.exceptions import (BlockDefinitionException,
                                         SerializationException,
                                         )
 from library.helpers.id import join_id
+from library.helpers.read_progress import get_read_progress
 from library.read_blocks.atomic import AtomicDataBlock
 from library.read_blocks.data_block import DataBlock
 from library.read_data import ReadData
@@ -118,15 +119,23 @@ class ArrayBlock(DataBlock):
                 raise MultiReadUnavailableException('Supports only atomic data blocks')
         except (MultiReadUnavailableException, AttributeError) as ex:
             buffer.seek(start)
+            progress = get_read_progress()
             for i in range(amount):
                 start = buffer.tell()
                 try:
                     if not self.child.simplified and not state['children_states'][str(i)]:
                         state['children_states'][str(i)] = {'id': id_prefix + str(i)}
-                    res.append(self.child.read(buffer, size, {
+                    item = self.child.read(buffer, size, {
                         **state.get('common_children_states', {}),
                         **state['children_states'][str(i)]
-                    } if not self.child.simplified else None))
+                    } if not self.child.simplified else None)
+                    if isinstance(item, ReadData) and not isinstance(self.child, AtomicDataBlock):
+                        # see CompoundBlock._load_value
+                        item.block_state['read_offset'] = start
+                        item.block_state['read_size'] = buffer.tell() - start
+                    res.append(item)
+                    if progress is not None:
+                        progress.report(buffer, buffer.tell())
                 except EndOfBufferException as ex:
                     if self.length_strategy == "read_available":
                         # assume this array is finished
@@ -177,7 +186,12 @@ class ExplicitOffsetsArrayBlock(ArrayBlock):
                 **child_state,
                 'id': join_id(state.get('id'), (str(i) if not custom_names else custom_names[i])),
             }
-            res.append(self.child.read(buffer, self.get_item_length(state, i, end_offset), child_state))
+            item = self.child.read(buffer, self.get_item_length(state, i, end_offset), child_state)
+            if isinstance(item, ReadData):
+                # see CompoundBlock._load_value
+                child_state['read_offset'] = offset
+                child_state['read_size'] = buffer.tell() - offset
+            res.append(item)
         return res
 
     def to_raw_value(self, data: ReadData) -> bytes:
@@ -5,6 +5,8 @@ from typing import List, Tuple
 from library.helpers.data_wrapper import DataWrapper
 from library.helpers.exceptions import EndOfBufferException, BlockIntegrityException
 from library.helpers.id import join_id
+from library.helpers.read_progress import get_read_progress
+from library.read_blocks.atomic import AtomicDataBlock
 from library.read_blocks.data_block import DataBlock
 from library.read_data import ReadData
 
@@ -31,6 +33,9 @@ class CompoundBlock(DataBlock, ABC):
         super().__init__(**kwargs)
         self.instance_fields = [(name, instance) for name, instance in self.__class__.Fields.fields]
         self.instance_fields_map = {name: res for (name, res) in self.instance_fields}
+        # location of these fields is known from sizes, so they do not keep read offset, see _load_value
+        self._static_size_field_names = {name for (name, res) in self.instance_fields
+                                         if isinstance(res, AtomicDataBlock) and res.get_size({}) is not None}
         self.inline_description = inline_description
 
     @property
@@ -66,6 +71,7 @@ class CompoundBlock(DataBlock, ABC):
 
     def _load_value(self, buffer: [BufferedReader, BytesIO], size: int, state: dict):
         initial_buffer_pointer = buffer.tell()
+        progress = get_read_progress()
         fields = self.instance_fields
         res = dict()
         remaining_size = size
@@ -89,9 +95,17 @@ class CompoundBlock(DataBlock, ABC):
                     raise EndOfBufferException()
             try:
                 res[name] = field.read(buffer, remaining_size, state[name])
-                remaining_size -= buffer.tell() - start
+                end = buffer.tell()
+                remaining_size -= end - start
                 if remaining_size < 0:
                     raise EndOfBufferException()
+                if name not in self._static_size_field_names and 'read_offset' not in state[name]:
+                    # offset in buffer and size of read bytes, for saving changes in place, see library.saver.
+                    # Detached blocks set it themselves
+                    state[name]['read_offset'] = start
+                    state[name]['read_size'] = end - start
+                if progress is not None:
+                    progress.report(buffer, end)
             except (EndOfBufferException, BlockIntegrityException, NotImplementedError) as ex:
                 if name in self.Fields.optional_fields:
                     field.wrap_result(None, block_state=state[name])
@@ -38,5 +38,8 @@ class DetachedBlock(DelegateBlock):
         if not state.get('delegated_block'):
             state['delegated_block'] = self.delegated_block
         res = super().read(buffer, self.get_size(state), state)
+        # see CompoundBlock._load_value
+        state['read_offset'] = state['offset']
+        state['read_size'] = buffer.tell() - state['offset']
         buffer.seek(ptr)
         return res
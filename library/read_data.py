@@ -1,15 +1,50 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
 from io import BufferedWriter
 from typing import TypeVar, Generic
 from copy import deepcopy
+from weakref import WeakValueDictionary
 
 T = TypeVar('T')
+_set_attribute = object.__setattr__
+# False while file is being read: blocks fix up values after reading them (e.g. SHPI item names), it is not a change
+_tracking_changes = ContextVar('read_data_tracking_changes', default=True)
+
+
+@contextmanager
+def changes_not_tracked():
+    """
+     Assignments of values inside of this context do not mark nodes as changed. Context variable, so reading a file in
+     another thread does not affect edits, made meanwhile
+     """
+    token = _tracking_changes.set(False)
+    try:
+        yield
+    finally:
+        _tracking_changes.reset(token)
 
 
 class ReadData(Generic[T]):
+    # nodes, which value was assigned after reading, by python id. Used for saving only changed parts of file,
+    # see library.saver. Weak, so forgotten data is not kept in memory
+    dirty_nodes: WeakValueDictionary = WeakValueDictionary()
+
     def __init__(self, value, block: T, block_state: dict):
-        self.value = value
-        self.block = block
-        self.block_state = block_state
+        # not a change of read value, so it is not tracked
+        _set_attribute(self, 'value', value)
+        _set_attribute(self, 'block', block)
+        _set_attribute(self, 'block_state', block_state)
+
+    def __setattr__(self, key, value):
+        _set_attribute(self, key, value)
+        if key == 'value' and _tracking_changes.get():
+            ReadData.dirty_nodes[id(self)] = self
+
+    def mark_dirty(self):
+        """
+         Marks node as changed, for changes, which are not assignments of value (e.g. changed list items in place)
+         """
+        ReadData.dirty_nodes[id(self)] = self
 
     def __getattr__(self, item):
         if item not in ['value', 'block', 'block_state']:
@@ -0,0 +1,203 @@
+import os
+import tempfile
+from typing import List, Optional, Tuple
+
+from library.helpers.data_wrapper import DataWrapper
+from library.read_data import ReadData
+
+
+def _resolve_path(root: ReadData, id: str) -> Optional[List[Tuple[object, ReadData]]]:
+    # (key in parent value, node) from root to node with given id, the same lookup as in require_resource
+    if id == root.id:
+        return [(None, root)]
+    if not id.startswith(root.id + '__'):
+        return None
+    path = [(None, root)]
+    node = root
+    for key in [x for x in id[len(root.id) + 2:].split('/') if x]:
+        if isinstance(node.value, list):
+            custom_names = node.block_state.get('custom_names') or []
+            if key in custom_names:
+                key = custom_names.index(key)
+            elif key.isdigit() and int(key) < len(node.value):
+                key = int(key)
+            else:
+                return None
+            node = node.value[key]
+        elif isinstance(node.value, dict):
+            node = node.value.get(key)
+        else:
+            return None
+        if not isinstance(node, ReadData):
+            return None
+        path.append((key, node))
+    return path
+
+
+def _get_read_range(path: List[Tuple[object, ReadData]]) -> Optional[Tuple[int, int]]:
+    # offset and size of the last node in path. Static size atomic blocks do not keep it, they are located by sizes
+    # of previous items in parent
+    from library.read_blocks.array import ArrayBlock, ExplicitOffsetsArrayBlock
+    from library.read_blocks.atomic import AtomicDataBlock
+    from library.read_blocks.compound import CompoundBlock
+    from library.read_blocks.detached import DetachedBlock
+    key, node = path[-1]
+    if node.block_state.get('read_offset') is not None:
+        return node.block_state['read_offset'], node.block_state['read_size']
+    if not isinstance(node.block, AtomicDataBlock) or len(path) < 2:
+        return None
+    size = node.block.get_size(node.block_state)
+    if size is None:
+        return None
+    parent = path[-2][1]
+    parent_range = _get_read_range(path[:-1])
+    if parent_range is None:
+        return None
+    if (isinstance(parent.block, ArrayBlock) and not isinstance(parent.block, ExplicitOffsetsArrayBlock)
+            and isinstance(parent.block.child, AtomicDataBlock)):
+        # atomic arrays are read at once, see AtomicDataBlock.read_multiple
+        return parent_range[0] + key * node.block.static_size, node.block.static_size
+    if not isinstance(parent.block, CompoundBlock):
+        return None
+    offset = None
+    fields_size = 0
+    for name, field in parent.block.instance_fields:
+        if name == key:
+            offset = parent_range[0] + fields_size
+        value = parent.value.get(name)
+        if value is None or isinstance(field, DetachedBlock):
+            continue
+        if isinstance(value, ReadData) and value.block_state.get('read_size') is not None:
+            fields_size += value.block_state['read_size']
+        elif isinstance(field, AtomicDataBlock) and field.get_size({}) is not None:
+            fields_size += field.get_size({})
+        else:
+            return None
+    # fields are not contiguous, if reading hooks skipped something
+    if offset is None or fields_size != parent_range[1]:
+        return None
+    return offset, size
+
+
+def _is_patchable(node: ReadData) -> bool:
+    # encoded data of these blocks is exactly the range, which was read: no explicit offsets, no compression
+    from library.read_blocks.array import ExplicitOffsetsArrayBlock
+    stack = [node]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, ReadData):
+            if isinstance(item.block, ExplicitOffsetsArrayBlock) or (item.block_state or {}).get('compressed'):
+                return False
+            stack.append(item.value)
+        elif isinstance(item, DataWrapper):
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(x for x in item if isinstance(x, (ReadData, DataWrapper, list)))
+    return True
+
+
+def _is_own_file(data: ReadData, path: str) -> bool:
+    return path.replace('\\', '/').replace(':', '---DRIVE') == data.id
+
+
+def _get_patches(data: ReadData, path: str, dirty_nodes: List[ReadData]) -> Optional[List[Tuple[int, bytes]]]:
+    # returns (offset, bytes) to write in place or None if file should be written from scratch
+    state = data.block_state
+    if (not _is_own_file(data, path)
+            or state.get('compressed')
+            or state.get('read_offset') is None
+            or state.get('file_mtime') is None):
+        return None
+    try:
+        if (os.path.getmtime(path) != state['file_mtime']
+                or state['read_offset'] != 0
+                or state['read_size'] != os.path.getsize(path)):
+            return None
+    except OSError:
+        return None
+    # the deepest node on the way to changed node, which location in file is known
+    targets = {}
+    for node in dirty_nodes:
+        nodes_path = _resolve_path(data, node.id)
+        if nodes_path is None or nodes_path[-1][1] is not node:
+            # moved or detached node: its id is not valid anymore
+            return None
+        if any(x.block_state.get('compressed') for _, x in nodes_path):
+            return None
+        for i in range(len(nodes_path), 0, -1):
+            read_range = _get_read_range(nodes_path[:i])
+            if read_range is not None:
+                targets[id(nodes_path[i - 1][1])] = ([x for _, x in nodes_path[:i]], read_range)
+                break
+        else:
+            return None
+    patches = []
+    for nodes_path, (offset, size) in targets.values():
+        if any(id(x) in targets for x in nodes_path[:-1]):
+            # encoded together with changed parent
+            continue
+        node = nodes_path[-1]
+        if not _is_patchable(node):
+            return None
+        raw = node.to_bytes()
+        if len(raw) != size:
+            return None
+        patches.append((offset, raw))
+    return patches
+
+
+def _write_patches(path: str, patches: List[Tuple[int, bytes]]):
+    with open(path, 'r+b') as f:
+        for offset, raw in sorted(patches, key=lambda x: x[0]):
+            if hasattr(os, 'pwrite'):
+                os.pwrite(f.fileno(), raw, offset)
+            else:
+                # not available on windows
+                f.seek(offset)
+                f.write(raw)
+
+
+def _write_whole_file(data: ReadData, path: str):
+    # written next to target file and renamed, so file is never left half-written
+    bts = data.to_bytes()
+    directory = os.path.dirname(os.path.abspath(path))
+    file = tempfile.NamedTemporaryFile(mode='wb', dir=directory, prefix='.' + os.path.basename(path) + '.',
+                                       delete=False)
+    try:
+        with file:
+            file.write(bts)
+        if os.path.exists(path):
+            os.chmod(file.name, os.stat(path).st_mode & 0o7777)
+        else:
+            # temporary files are private, new file gets usual permissions
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(file.name, 0o666 & ~umask)
+        os.replace(file.name, path)
+    except BaseException:
+        os.unlink(file.name)
+        raise
+
+
+def write_file(data: ReadData, path: str) -> bool:
+    """
+     Saves file resource to path. If it is the file, which data was read from, it was not changed on disk since then
+     and every changed node keeps its size, only changed nodes are encoded and patched in place. Otherwise the whole
+     file is encoded and atomically replaces target file. Returns True if file was patched in place
+     """
+    file_prefix = data.id + '__'
+    dirty_nodes = [x for x in list(ReadData.dirty_nodes.values())
+                   if x.block_state and (x.id == data.id or x.id.startswith(file_prefix))]
+    patches = _get_patches(data, path, dirty_nodes)
+    if patches is not None:
+        _write_patches(path, patches)
+    else:
+        _write_whole_file(data, path)
+    if _is_own_file(data, path):
+        if patches is None:
+            # read ranges of nodes after changed ones are shifted now, next save will write the whole file as well
+            data.block_state.pop('read_offset', None)
+        data.block_state['file_mtime'] = os.path.getmtime(path)
+        for node in dirty_nodes:
+            ReadData.dirty_nodes.pop(id(node), None)
+    return patches is not None
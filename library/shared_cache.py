@@ -0,0 +1,167 @@
+import importlib
+import os
+from fnmatch import fnmatch
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from library.read_data import ReadData
+
+# Description of published resources, received by pool worker from the broker. Maps normalized file path to:
+# {'segment': shared memory name, 'block_class': full class name, 'payload_size': int, 'palettes': {shpi_id: {...}}}
+_manifest: Dict[str, Dict] = {}
+# attached shared memory segments of current process
+_segments: Dict[str, shared_memory.SharedMemory] = {}
+# palettes, built from shared colors tables. Built once per process
+_palettes: Dict[str, ReadData] = {}
+
+
+def _normalize_path(path: str) -> str:
+    return path.replace('\\', '/')
+
+
+def _import_class(full_name: str) -> type:
+    module_name, class_name = full_name.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def is_shared_file(path: str, patterns: List[str]) -> bool:
+    path = _normalize_path(path)
+    return any(fnmatch(path, pattern) or fnmatch(os.path.basename(path), pattern) for pattern in patterns)
+
+
+class SharedResourceBroker:
+    """
+     Decodes hot files, required by many other files (like CENTRAL.QFS), only once in the main process and publishes
+     decompressed payload and colors of their palettes via shared memory. Pool workers receive the manifest in the
+     initializer (see init_shared_cache) and read those files from shared memory instead of decompressing them again
+     """
+
+    def __init__(self):
+        self.manifest: Dict[str, Dict] = {}
+        self._segments: List[shared_memory.SharedMemory] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def publish(self, path: str):
+        from library.loader import probe_block_class, read_payload
+        with open(path, 'rb') as bdata:
+            block_class = probe_block_class(bdata, path)
+            block = block_class()
+            algorithm = getattr(block, 'algorithm', None)
+            payload = algorithm(bdata, os.path.getsize(path)) if algorithm else bdata.read()
+        palettes = self._collect_palettes(read_payload(block_class, payload, path))
+        palettes_offset = (len(payload) + 3) // 4 * 4
+        colors_count = sum(len(colors) for _, _, _, colors in palettes)
+        segment = shared_memory.SharedMemory(create=True, size=max(palettes_offset + 4 * colors_count, 1))
+        self._segments.append(segment)
+        segment.buf[:len(payload)] = payload
+        colors_table = np.ndarray((colors_count,), dtype=np.uint32, buffer=segment.buf, offset=palettes_offset)
+        palettes_manifest = {}
+        offset = 0
+        for shpi_id, palette_id, palette, colors in palettes:
+            colors_table[offset:offset + len(colors)] = colors
+            palettes_manifest[shpi_id] = {
+                'id': palette_id,
+                'block_class': f'{palette.block.__class__.__module__}.{palette.block.__class__.__name__}',
+                'last_color_transparent': bool(getattr(palette, 'last_color_transparent', False)),
+                'offset': palettes_offset + 4 * offset,
+                'length': len(colors),
+            }
+            offset += len(colors)
+        del colors_table
+        self.manifest[_normalize_path(path)] = {
+            'segment': segment.name,
+            'block_class': f'{block_class.__module__}.{block_class.__name__}',
+            'payload_size': len(payload),
+            'palettes': palettes_manifest,
+        }
+
+    @staticmethod
+    def _collect_palettes(data) -> List[Tuple[str, str, ReadData, List[int]]]:
+        from resources.eac.archives import ShpiBlock, WwwwBlock
+        from resources.utils import _get_palette_from_shpi
+        res = []
+        if not isinstance(data, ReadData):
+            return res
+        if isinstance(data.block, ShpiBlock):
+            palette = _get_palette_from_shpi(data)
+            if palette is not None:
+                res.append((data.id, palette.id, palette, [c.value for c in palette.colors]))
+        elif isinstance(data.block, WwwwBlock):
+            for child in data.children:
+                res += SharedResourceBroker._collect_palettes(child)
+        return res
+
+    def close(self):
+        for segment in self._segments:
+            segment.close()
+            segment.unlink()
+        self._segments = []
+        self.manifest = {}
+
+
+def init_shared_cache(manifest: Dict[str, Dict]):
+    # segments of previous manifest are not needed anymore: payloads and palettes are copied out of them
+    for segment in _segments.values():
+        segment.close()
+    _segments.clear()
+    _palettes.clear()
+    _manifest.clear()
+    _manifest.update(manifest)
+
+
+def _attach(entry: Dict) -> shared_memory.SharedMemory:
+    try:
+        return _segments[entry['segment']]
+    except KeyError:
+        segment = shared_memory.SharedMemory(name=entry['segment'])
+        _segments[entry['segment']] = segment
+        return segment
+
+
+def get_shared_payload(path: str) -> Optional[Tuple[type, bytes]]:
+    """
+     Returns block class and (decompressed) file payload if file was published by the broker. Payload is copied out of
+     shared memory once per read: blocks are read from BytesIO and keep slices of payload as bytes, which can not
+     reference shared memory. It is cheap compared to decompression it replaces and to decoded tree, which is several
+     times bigger than payload
+     """
+    entry = _manifest.get(_normalize_path(path))
+    if entry is None:
+        return None
+    segment = _attach(entry)
+    return _import_class(entry['block_class']), bytes(segment.buf[:entry['payload_size']])
+
+
+def get_shared_palette(shpi_id: str) -> Optional[ReadData]:
+    """
+     Returns palette of SHPI block, published by the broker, without parsing the file it belongs to
+     """
+    try:
+        return _palettes[shpi_id]
+    except KeyError:
+        pass
+    entry = _manifest.get(_normalize_path(shpi_id.split('__')[0].replace('---DRIVE', ':')))
+    if entry is None or shpi_id not in entry['palettes']:
+        return None
+    description = entry['palettes'][shpi_id]
+    segment = _attach(entry)
+    colors = np.ndarray((description['length'],), dtype=np.uint32, buffer=segment.buf,
+                        offset=description['offset']).tolist()
+    block = _import_class(description['block_class'])()
+    colors_block = block.instance_fields_map['colors']
+    colors_id = description['id'] + '/colors'
+    from library.helpers.data_wrapper import DataWrapper
+    palette = block.wrap_result(DataWrapper({
+        'colors': colors_block.wrap_result([colors_block.child.wrap_result(c, {'id': f'{colors_id}/{i}'})
+                                            for i, c in enumerate(colors)], {'id': colors_id}),
+        'last_color_transparent': description['last_color_transparent'],
+    }), {'id': description['id']})
+    _palettes[shpi_id] = palette
+    return palette
@@ -1,12 +1,12 @@
 import os
+import subprocess
 import tempfile
-import settings
+import time
+from logging import warning
 
-def get_log_throwaway_suffix():
-    if os.name == 'nt':
-        return " >NUL 2>&1"
-    else:
-        return " >\dev\null 2>&1"
+import settings
+from library.utils.blender_worker import BlenderJobError, get_blender_worker_port, run_blender_job
+from library.utils.processes import external_tool_slot
 
 def get_blender_save_script(out_blend_name=None):
     temp_blend_name = out_blend_name.replace("\\", "/")
@@ -16,6 +16,71 @@ def get_blender_save_script(out_blend_name=None):
     return script
 
 
+_load_meshes_script = """
+import json
+import os
+import numpy as np
+
+
+def load_meshes(file_name):
+    with np.load(file_name) as data:
+        arrays = {key: data[key] for key in data.files}
+    description = json.loads(str(arrays['description']))
+    materials = {}
+    for name, texture_path in description['materials'].items():
+        material = bpy.data.materials.new(name)
+        material.use_nodes = True
+        if texture_path:
+            texture = material.node_tree.nodes.new('ShaderNodeTexImage')
+            try:
+                texture.image = bpy.data.images.load(os.path.abspath(texture_path), check_existing=True)
+            except RuntimeError:
+                # missing texture, mesh is still useful
+                pass
+            material.node_tree.links.new(material.node_tree.nodes['Principled BSDF'].inputs['Base Color'],
+                                         texture.outputs['Color'])
+        materials[name] = material
+    vertex_offset = loop_offset = polygon_offset = 0
+    for (vertices_count, loops_count, polygons_count), mesh_description in zip(arrays['counts'].tolist(),
+                                                                                description['meshes']):
+        loops = arrays['loops'][loop_offset:loop_offset + loops_count]
+        polygon_sizes = arrays['polygon_sizes'][polygon_offset:polygon_offset + polygons_count]
+        mesh = bpy.data.meshes.new(mesh_description['name'])
+        mesh.vertices.add(vertices_count)
+        mesh.vertices.foreach_set('co', arrays['vertices'][vertex_offset:vertex_offset + vertices_count].ravel())
+        mesh.loops.add(loops_count)
+        mesh.loops.foreach_set('vertex_index', loops)
+        mesh.polygons.add(polygons_count)
+        mesh.polygons.foreach_set('loop_start', np.cumsum(polygon_sizes) - polygon_sizes)
+        if bpy.app.version < (4, 0, 0):
+            # read-only since blender 4.0, calculated from loop starts
+            mesh.polygons.foreach_set('loop_total', polygon_sizes)
+        uv_layer = mesh.uv_layers.new(name='UVMap')
+        uv_layer.data.foreach_set('uv', arrays['uvs'][vertex_offset:vertex_offset + vertices_count][loops].ravel())
+        if mesh_description['material']:
+            mesh.materials.append(materials[mesh_description['material']])
+        mesh.validate()
+        mesh.update()
+        mesh_object = bpy.data.objects.new(mesh_description['name'], mesh)
+        bpy.context.collection.objects.link(mesh_object)
+        vertex_offset += vertices_count
+        loop_offset += loops_count
+        polygon_offset += polygons_count
+"""
+
+
+def get_blender_load_meshes_script(file_names=()):
+    """
+     Script, which builds meshes from .npz files, saved by library.utils.meshes.save_blender_meshes
+     """
+    return _load_meshes_script + '\n' + '\n'.join(f'load_meshes("{x}")' for x in file_names) + '\n'
+
+
+# persistent blender worker is tried once more after connection error, then blender is started for the resource
+_WORKER_ATTEMPTS = 2
+_WORKER_RETRY_DELAY = 0.5
+
+
 def run_blender(path, script, out_blend_name=None):
     working_dir = path.replace("\\", "/")
     script = f"""import bpy
@@ -24,13 +89,36 @@ os.chdir("{working_dir}")
 """ + script
     if out_blend_name:
         script += '\n\n' + get_blender_save_script(out_blend_name=out_blend_name)
-    script += '\nquit()'
-    script_file = tempfile.NamedTemporaryFile(delete=False, mode='w')
-    script_file.write(script)
-    script_file.flush()
-    script_file.close()
-    command = f'"{settings.blender_executable}" --python {script_file.name} --background'
-    if not settings.print_blender_log:
-        command += get_log_throwaway_suffix()
-    os.system(command)
-    os.unlink(script_file.name)
+    with external_tool_slot('blender') as slot:
+        for attempt in range(_WORKER_ATTEMPTS):
+            port = get_blender_worker_port(slot)
+            if port is None:
+                break
+            try:
+                run_blender_job(port, os.path.abspath(path), script)
+                return
+            except BlenderJobError as ex:
+                if settings.multiprocess_blender_script_errors_fail_export:
+                    raise
+                warning(f'Blender script failed: {ex}')
+                return
+            except OSError as ex:
+                # blender worker crashed or is being restarted. Retry, when main process restarts it, then run
+                # a separate blender
+                warning(f'Blender worker on port {port} is not available: {ex}')
+                if attempt < _WORKER_ATTEMPTS - 1:
+                    time.sleep(_WORKER_RETRY_DELAY)
+        script_file = tempfile.NamedTemporaryFile(delete=False, mode='w')
+        script_file.write(script + '\nquit()')
+        script_file.flush()
+        script_file.close()
+        output = None if settings.print_blender_log else subprocess.DEVNULL
+        try:
+            subprocess.run([settings.blender_executable, '--python', script_file.name, '--background'],
+                           stdout=output, stderr=output)
+        except OSError as ex:
+            # blender is optional
+            if settings.print_blender_log:
+                warning(f'Cannot run blender: {ex}')
+        finally:
+            os.unlink(script_file.name)
@@ -0,0 +1,211 @@
+import json
+import os
+import socket
+import struct
+import subprocess
+import tempfile
+import time
+from logging import warning
+from multiprocessing import Array
+from typing import List, Optional
+
+import settings
+
+# executed inside of blender: accepts jobs over local socket one by one and runs them in the same blender process.
+# Job is a length-prefixed json {"working_dir": ..., "script": ...}, response is {"success": ..., "error": ...}
+_server_script = """
+import bpy
+import json
+import os
+import socket
+import struct
+import sys
+import traceback
+
+port_file = sys.argv[sys.argv.index('--') + 1]
+server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+server.bind(('127.0.0.1', 0))
+server.listen()
+with open(port_file + '.tmp', 'w') as f:
+    f.write(str(server.getsockname()[1]))
+os.replace(port_file + '.tmp', port_file)
+
+
+def receive(connection, size):
+    data = b''
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('Connection closed')
+        data += chunk
+    return data
+
+
+while True:
+    connection, _ = server.accept()
+    with connection:
+        try:
+            job = json.loads(receive(connection, struct.unpack('>I', receive(connection, 4))[0]))
+        except Exception:
+            continue
+        if job.get('command') == 'stop':
+            break
+        try:
+            bpy.ops.wm.read_factory_settings(use_empty=True)
+            os.chdir(job['working_dir'])
+            exec(compile(job['script'], 'blender_job', 'exec'), {'__name__': '__main__'})
+            result = {'success': True}
+        except BaseException:
+            result = {'success': False, 'error': traceback.format_exc()}
+        response = json.dumps(result).encode('utf8')
+        try:
+            connection.sendall(struct.pack('>I', len(response)) + response)
+        except OSError:
+            pass
+"""
+
+
+class BlenderJobError(Exception):
+    pass
+
+
+# ports of persistent blender workers, shared with the main process, see BlenderWorkerPool.
+# Set in pool worker by init_blender_workers
+_worker_ports = None
+_PORT_STARTING = -1
+_PORT_UNAVAILABLE = 0
+
+
+def init_blender_workers(ports):
+    global _worker_ports
+    _worker_ports = ports
+
+
+def get_blender_worker_port(index: Optional[int]) -> Optional[int]:
+    if index is None or _worker_ports is None or index >= len(_worker_ports):
+        return None
+    # blender is still starting, it is faster to wait than to start another one
+    while _worker_ports[index] == _PORT_STARTING:
+        time.sleep(0.1)
+    return _worker_ports[index] or None
+
+
+def _send_message(connection: socket.socket, message: dict):
+    data = json.dumps(message).encode('utf8')
+    connection.sendall(struct.pack('>I', len(data)) + data)
+
+
+def _receive_message(connection: socket.socket) -> dict:
+    def receive(size):
+        data = b''
+        while len(data) < size:
+            chunk = connection.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError('Blender worker closed connection')
+            data += chunk
+        return data
+
+    return json.loads(receive(struct.unpack('>I', receive(4))[0]))
+
+
+def run_blender_job(port: int, working_dir: str, script: str):
+    """
+     Runs script in persistent blender worker, listening on the port. Raises BlenderJobError if script failed
+     """
+    with socket.create_connection(('127.0.0.1', port)) as connection:
+        _send_message(connection, {'working_dir': working_dir, 'script': script})
+        result = _receive_message(connection)
+    if not result['success']:
+        raise BlenderJobError(result['error'])
+
+
+class BlenderWorkerPool:
+    """
+     A few long-living background blender processes, started once by the main process. Every process runs
+     a command loop (see _server_script) and executes scripts, generated by serializers, one by one, so blender startup
+     time is paid once per worker, not once per resource. Ports are shared with pool workers, worker picks a blender
+     by the token of external tools slots (see library/utils/processes.py). Main process should call update()
+     periodically: it publishes ports of started blenders and restarts crashed ones
+     """
+
+    def __init__(self, count: int):
+        self.count = count
+        self.ports = Array('i', [_PORT_UNAVAILABLE] * count)
+        self._processes: List[Optional[subprocess.Popen]] = [None] * count
+        self._directory = tempfile.TemporaryDirectory()
+        self._script_path = os.path.join(self._directory.name, 'blender_worker.py')
+        with open(self._script_path, 'w') as f:
+            f.write(_server_script)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self):
+        for index in range(self.count):
+            self._start_process(index)
+
+    def _port_file(self, index):
+        return os.path.join(self._directory.name, f'port_{index}')
+
+    def _start_process(self, index):
+        try:
+            os.unlink(self._port_file(index))
+        except FileNotFoundError:
+            pass
+        output = None if settings.print_blender_log else subprocess.DEVNULL
+        try:
+            # own session: Ctrl-C in terminal should not kill blender in the middle of the job, it is stopped by close()
+            self._processes[index] = subprocess.Popen([settings.blender_executable, '--background',
+                                                       '--python', self._script_path, '--', self._port_file(index)],
+                                                      stdout=output, stderr=output, start_new_session=True)
+            self.ports[index] = _PORT_STARTING
+        except OSError as ex:
+            # blender is optional
+            self._processes[index] = None
+            self.ports[index] = _PORT_UNAVAILABLE
+            if settings.print_blender_log:
+                warning(f'Cannot run blender: {ex}')
+
+    def update(self):
+        for index, process in enumerate(self._processes):
+            if process is None:
+                continue
+            if process.poll() is not None:
+                if self.ports[index] == _PORT_STARTING:
+                    # cannot start at all, workers will run blender per resource
+                    self._processes[index] = None
+                    self.ports[index] = _PORT_UNAVAILABLE
+                else:
+                    self.restart(index)
+            elif self.ports[index] == _PORT_STARTING:
+                try:
+                    with open(self._port_file(index)) as f:
+                        self.ports[index] = int(f.read())
+                except FileNotFoundError:
+                    pass
+
+    def restart(self, index: int):
+        """
+         Restarts blender, which can be still busy with the job of killed process
+         """
+        self._stop_process(index)
+        self._start_process(index)
+
+    def _stop_process(self, index):
+        process = self._processes[index]
+        self.ports[index] = _PORT_UNAVAILABLE
+        if process is None:
+            return
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        self._processes[index] = None
+
+    def close(self):
+        for index in range(self.count):
+            self._stop_process(index)
+        self._directory.cleanup()
@@ -0,0 +1,154 @@
+import json
+import struct
+from typing import Dict, List, Optional
+
+import numpy as np
+
+_GLB_MAGIC = 0x46546C67
+_CHUNK_JSON = 0x4E4F534A
+_CHUNK_BIN = 0x004E4942
+
+_FLOAT = 5126
+_UNSIGNED_INT = 5125
+_ARRAY_BUFFER = 34962
+_ELEMENT_ARRAY_BUFFER = 34963
+_TYPES = {1: 'SCALAR', 2: 'VEC2', 3: 'VEC3', 4: 'VEC4'}
+
+
+class GlbBuilder:
+    """
+     Minimal binary glTF 2.0 writer: meshes with one material per primitive, embedded PNG textures and a flat list of
+     nodes with custom properties (extras). Coordinates are written as is (Z-up, as gg-web-engine export from blender
+     with export_yup=False does)
+     """
+
+    def __init__(self):
+        self.gltf = {
+            'asset': {'version': '2.0', 'generator': 'nfs-resources-converter', 'copyright': 'Gurakl Games'},
+            'scene': 0,
+            'scenes': [{'nodes': []}],
+            'nodes': [],
+            'meshes': [],
+            'materials': [],
+            'textures': [],
+            'images': [],
+            'samplers': [],
+            'accessors': [],
+            'bufferViews': [],
+            'buffers': [],
+        }
+        self._binary_chunks: List[bytes] = []
+        self._binary_length = 0
+        self._materials_map: Dict[str, int] = {}
+
+    def _add_buffer_view(self, data: bytes, target: Optional[int] = None) -> int:
+        view = {'buffer': 0, 'byteOffset': self._binary_length, 'byteLength': len(data)}
+        if target is not None:
+            view['target'] = target
+        padding = (4 - len(data) % 4) % 4
+        self._binary_chunks.append(data + b'\x00' * padding)
+        self._binary_length += len(data) + padding
+        self.gltf['bufferViews'].append(view)
+        return len(self.gltf['bufferViews']) - 1
+
+    def _add_accessor(self, array: np.ndarray, target: int, with_bounds: bool = False) -> int:
+        if array.ndim == 1:
+            array = array.reshape(-1, 1)
+        accessor = {
+            'bufferView': self._add_buffer_view(array.tobytes(), target),
+            'componentType': _UNSIGNED_INT if array.dtype == np.uint32 else _FLOAT,
+            'count': len(array) if target == _ARRAY_BUFFER else array.size,
+            'type': _TYPES[array.shape[1]] if target == _ARRAY_BUFFER else 'SCALAR',
+        }
+        if with_bounds and len(array):
+            accessor['min'] = array.min(axis=0).tolist()
+            accessor['max'] = array.max(axis=0).tolist()
+        self.gltf['accessors'].append(accessor)
+        return len(self.gltf['accessors']) - 1
+
+    def add_material(self, name: str, png_path: Optional[str] = None, image_uri: Optional[str] = None) -> int:
+        """
+         Adds material (once per name). If path to PNG texture provided, the texture is embedded into GLB, otherwise
+         texture references image_uri (path relative to GLB file), if provided
+         """
+        try:
+            return self._materials_map[name]
+        except KeyError:
+            pass
+        material = {
+            'name': name,
+            'pbrMetallicRoughness': {'metallicFactor': 0, 'roughnessFactor': 1},
+            'doubleSided': False,
+        }
+        if png_path or image_uri:
+            if png_path:
+                with open(png_path, 'rb') as f:
+                    image = {'name': name, 'mimeType': 'image/png', 'bufferView': self._add_buffer_view(f.read())}
+            else:
+                image = {'name': name, 'uri': image_uri}
+            if not self.gltf['samplers']:
+                self.gltf['samplers'].append({})
+            self.gltf['images'].append(image)
+            self.gltf['textures'].append({'sampler': 0, 'source': len(self.gltf['images']) - 1})
+            material['pbrMetallicRoughness']['baseColorTexture'] = {'index': len(self.gltf['textures']) - 1}
+            material['alphaMode'] = 'MASK'
+        self.gltf['materials'].append(material)
+        self._materials_map[name] = len(self.gltf['materials']) - 1
+        return self._materials_map[name]
+
+    def add_mesh(self, name: str, positions, indices, uvs=None, material: Optional[int] = None) -> int:
+        positions = np.asarray(positions, dtype=np.float32).reshape(-1, 3)
+        attributes = {'POSITION': self._add_accessor(positions, _ARRAY_BUFFER, with_bounds=True)}
+        if uvs is not None and len(uvs):
+            attributes['TEXCOORD_0'] = self._add_accessor(np.asarray(uvs, dtype=np.float32).reshape(-1, 2),
+                                                          _ARRAY_BUFFER)
+        primitive = {
+            'attributes': attributes,
+            'indices': self._add_accessor(np.asarray(indices, dtype=np.uint32).reshape(-1),
+                                          _ELEMENT_ARRAY_BUFFER),
+            'mode': 4,
+        }
+        if material is not None:
+            primitive['material'] = material
+        self.gltf['meshes'].append({'name': name, 'primitives': [primitive]})
+        return len(self.gltf['meshes']) - 1
+
+    def add_node(self, name: str, mesh: Optional[int] = None, translation=None, rotation=None, scale=None,
+                 extras: Optional[Dict] = None, parent: Optional[int] = None) -> int:
+        node = {'name': name}
+        if mesh is not None:
+            node['mesh'] = mesh
+        if translation is not None:
+            node['translation'] = [float(x) for x in translation]
+        if rotation is not None:
+            # quaternion x, y, z, w
+            node['rotation'] = [float(x) for x in rotation]
+        if scale is not None:
+            node['scale'] = [float(x) for x in scale]
+        if extras:
+            node['extras'] = extras
+        self.gltf['nodes'].append(node)
+        index = len(self.gltf['nodes']) - 1
+        if parent is None:
+            self.gltf['scenes'][0]['nodes'].append(index)
+        else:
+            self.gltf['nodes'][parent].setdefault('children', []).append(index)
+        return index
+
+    def to_bytes(self) -> bytes:
+        gltf = {key: value for key, value in self.gltf.items() if value != []}
+        if self._binary_length:
+            gltf['buffers'] = [{'byteLength': self._binary_length}]
+        json_chunk = json.dumps(gltf, separators=(',', ':')).encode('utf8')
+        json_chunk += b' ' * ((4 - len(json_chunk) % 4) % 4)
+        binary_chunk = b''.join(self._binary_chunks)
+        total_length = 12 + 8 + len(json_chunk) + (8 + len(binary_chunk) if binary_chunk else 0)
+        res = [struct.pack('<III', _GLB_MAGIC, 2, total_length),
+               struct.pack('<II', len(json_chunk), _CHUNK_JSON), json_chunk]
+        if binary_chunk:
+            res += [struct.pack('<II', len(binary_chunk), _CHUNK_BIN), binary_chunk]
+        return b''.join(res)
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
@@ -1,3 +1,8 @@
+import io
+import itertools
+import json
+from typing import Dict, List, Optional
+
 from resources.eac.bitmaps import AnyBitmapBlock
 
 
@@ -12,36 +17,47 @@ class SubMesh:
         self.scaled_uvs = set()
 
     def to_obj(self, face_index_increment, multiply_uvws=False, textures_shpi_block=None, mtllib=None,
-               pivot_offset=(0, 0, 0)) -> str:
-        res = f'\n\no {self.name}'
-        if mtllib is not None:
-            res += f'\nmtllib {mtllib}'
-        res += '\n' + '\n'.join(['v ' + ' '.join(
-            [str(coordinates[i] - pivot_offset[i]) for i in range(3)]
-        ) for coordinates in self.vertices])
+               pivot_offset=(0, 0, 0), float_precision=None) -> str:
+        res = io.StringIO()
+        write_obj(res, [self], mtllib, multiply_uvws, textures_shpi_block, pivot_offset, float_precision,
+                  face_index_increment)
+        return res.getvalue()
+
+    def to_glb(self, builder, material=None, multiply_uvws=False, textures_shpi_block=None,
+               pivot_offset=(0, 0, 0)) -> int:
+        # same data as in to_obj, but glTF UV origin is top left corner, so V is not flipped
+        positions = [[coordinates[i] - pivot_offset[i] for i in range(3)] for coordinates in self.vertices]
+        return builder.add_mesh(self.name, positions, self.get_triangles(),
+                                uvs=self.get_scaled_uvs(multiply_uvws, textures_shpi_block),
+                                material=material)
+
+    def get_triangles(self) -> list:
+        # terrain polygons are pairs of triangles, written as one 6-vertex polygon. Others are triangulated as a fan
+        triangles = [polygon[i:i + 3] for polygon in self.polygons if len(polygon) % 3 == 0
+                     for i in range(0, len(polygon), 3)]
+        triangles += [[polygon[0], polygon[i], polygon[i + 1]] for polygon in self.polygons if len(polygon) % 3 != 0
+                      for i in range(1, len(polygon) - 1)]
+        return triangles
+
+    def get_scaled_uvs(self, multiply_uvws=False, textures_shpi_block=None) -> list:
+        # texture coordinates in ORIP are in pixels, scales them to 0..1 range if multiply_uvws
+        if not multiply_uvws:
+            return self.vertex_uvs
         u_multiplier, v_multiplier = 1, 1
-        if multiply_uvws:
-            uvs_scaled_to_texture = False
-            if self.texture_id:
-                for texture in textures_shpi_block.children:
-                    if isinstance(texture.block, AnyBitmapBlock) and texture.id.split('/')[-1] == self.texture_id:
-                        u_multiplier, v_multiplier = 1 / texture.width.value, 1 / texture.height.value
-                        uvs_scaled_to_texture = True
-                        break
-            if not uvs_scaled_to_texture and self.vertex_uvs:
-                u_multiplier = 1 / max([x[0] for x in self.vertex_uvs])
-                v_multiplier = 1 / max([x[1] for x in self.vertex_uvs])
-        uvs = [[
+        uvs_scaled_to_texture = False
+        if self.texture_id:
+            for texture in textures_shpi_block.children:
+                if isinstance(texture.block, AnyBitmapBlock) and texture.id.split('/')[-1] == self.texture_id:
+                    u_multiplier, v_multiplier = 1 / texture.width.value, 1 / texture.height.value
+                    uvs_scaled_to_texture = True
+                    break
+        if not uvs_scaled_to_texture and self.vertex_uvs:
+            u_multiplier = 1 / max([x[0] for x in self.vertex_uvs])
+            v_multiplier = 1 / max([x[1] for x in self.vertex_uvs])
+        return [[
             uv[0] * u_multiplier if i not in self.scaled_uvs else uv[0],
             uv[1] * v_multiplier if i not in self.scaled_uvs else uv[1]
         ] for i, uv in enumerate(self.vertex_uvs)]
-        res += '\n' + '\n'.join([f'vt {uv[0]} {1 - uv[1]}' for uv in uvs])
-        if self.texture_id:
-            res += '\nusemtl ' + self.texture_id
-        res += '\n' + '\n'.join(
-            ['f ' + ' '.join([f'{x + face_index_increment}/{x + face_index_increment}' for x in polygon]) for polygon in
-             self.polygons])
-        return res
 
     def change_axes(self, new_x='x', new_y='y', new_z='z'):
         map = {
@@ -62,12 +78,207 @@ class SubMesh:
             get_value_from_vertex_list(v, new_z),
         ] for v in self.vertices]
 
+    def _flatten_polygons(self):
+        import numpy as np
+        sizes = [len(polygon) for polygon in self.polygons]
+        return np.fromiter(itertools.chain.from_iterable(self.polygons), dtype=np.int64, count=sum(sizes)), sizes
+
+    def _set_polygons(self, indices, sizes):
+        indices = indices.tolist()
+        offsets = itertools.accumulate(sizes, initial=0)
+        self.polygons = [indices[offset:offset + size] for offset, size in zip(offsets, sizes)]
+
+    def _reindex_vertices(self, kept, new_indices):
+        # kept: old indices of remaining vertices in new order, new_indices: new index for every old vertex index
+        vertices_count = len(self.vertices)
+        kept_list = kept.tolist()
+        self.vertices = [self.vertices[i] for i in kept_list]
+        self.vertex_uvs = ([self.vertex_uvs[i] for i in kept_list if i < len(self.vertex_uvs)]
+                           + self.vertex_uvs[vertices_count:])
+        kept_set = set(kept_list)
+        self.scaled_uvs = {int(new_indices[i]) for i in self.scaled_uvs if i in kept_set}
+        indices, sizes = self._flatten_polygons()
+        self._set_polygons(new_indices[indices], sizes)
+
     # after deleting polygons should call this function
     def remove_orphaned_vertices(self):
-        orphans = [vi for vi in range(len(self.vertices)) if
-                   vi not in [element for sublist in self.polygons for element in sublist]]
-        self.vertices = [v for (i, v) in enumerate(self.vertices) if i not in orphans]
-        self.vertex_uvs = [v for (i, v) in enumerate(self.vertex_uvs) if i not in orphans]
-        for removed_index in orphans[::-1]:
-            for j, p in enumerate(self.polygons):
-                self.polygons[j] = [idx if idx <= removed_index else idx - 1 for idx in p]
+        import numpy as np
+        indices, _ = self._flatten_polygons()
+        used = np.zeros(len(self.vertices), dtype=bool)
+        used[indices] = True
+        if used.all():
+            return
+        self._reindex_vertices(np.flatnonzero(used), np.cumsum(used) - 1)
+
+    def weld_vertices(self, respect_uvs=True):
+        """
+         Merges vertices with the same coordinates into the first of them. If respect_uvs, vertices are merged only if
+         texture coordinates are the same as well, so texture seams are kept. Polygons can become degenerate after that
+         """
+        import numpy as np
+        if not self.vertices:
+            return
+        keys = np.asarray(self.vertices, dtype=np.float64).reshape(-1, 3)
+        if respect_uvs and len(self.vertex_uvs) == len(self.vertices):
+            scaled = np.zeros((len(keys), 1))
+            scaled[list(self.scaled_uvs), 0] = 1
+            keys = np.hstack([keys, np.asarray(self.vertex_uvs, dtype=np.float64).reshape(-1, 2), scaled])
+        # 0.0 and -0.0 are the same vertex
+        keys = keys + 0.0
+        _, first_indices, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        if len(first_indices) == len(keys):
+            return
+        # unique rows are sorted, keep original order of vertices instead
+        order = np.argsort(first_indices)
+        ranks = np.empty_like(order)
+        ranks[order] = np.arange(len(order))
+        self._reindex_vertices(first_indices[order], ranks[inverse.ravel()])
+
+    def remove_degenerate_polygons(self, min_area=0.0):
+        """
+         Removes polygons, which use the same vertex more than once, and triangles with area not bigger than min_area
+         """
+        import numpy as np
+        indices, sizes = self._flatten_polygons()
+        if not sizes:
+            return
+        sizes_array = np.asarray(sizes, dtype=np.int64)
+        keep = np.ones(len(sizes), dtype=bool)
+        is_triangle = sizes_array == 3
+        triangle_positions = np.flatnonzero(is_triangle)
+        if len(triangle_positions):
+            triangles = indices[(np.cumsum(sizes_array) - sizes_array)[triangle_positions, None] + np.arange(3)]
+            vertices = np.asarray(self.vertices, dtype=np.float64).reshape(-1, 3)[triangles]
+            areas = np.linalg.norm(np.cross(vertices[:, 1] - vertices[:, 0], vertices[:, 2] - vertices[:, 0]),
+                                   axis=1) / 2
+            keep[triangle_positions] = ((triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2])
+                                        & (triangles[:, 0] != triangles[:, 2]) & (areas > min_area))
+        for i in np.flatnonzero(~is_triangle).tolist():
+            keep[i] = len(set(self.polygons[i])) == sizes[i]
+        if keep.all():
+            return
+        self.polygons = [polygon for polygon, kept in zip(self.polygons, keep.tolist()) if kept]
+
+
+def save_blender_meshes(file_name: str, sub_models: List[SubMesh], textures: Dict[str, Optional[str]],
+                        multiply_uvws=False, textures_shpi_block=None, pivot_offset=(0, 0, 0)):
+    """
+     Saves meshes as raw arrays (numpy .npz) for the script from get_blender_load_meshes_script, so blender builds
+     meshes directly, without OBJ text round-trip. Textures map texture id to image path, relative to blender working
+     directory (None if there is no image). Meshes without polygons are skipped. Polygons are sent as triangles: terrain
+     polygons repeat vertices and would be removed by mesh validation in blender
+     """
+    import numpy as np
+    sub_models = [x for x in sub_models if x.polygons]
+    vertices, uvs, loops, polygon_sizes, counts = [], [], [], [], []
+    for sub_model in sub_models:
+        vertices += sub_model.vertices
+        # V flipped the same way as in to_obj
+        uvs += [[uv[0], 1 - uv[1]] for uv in sub_model.get_scaled_uvs(multiply_uvws, textures_shpi_block)]
+        triangles = sub_model.get_triangles()
+        loops += [x for triangle in triangles for x in triangle]
+        polygon_sizes += [3] * len(triangles)
+        counts.append((len(sub_model.vertices), len(triangles) * 3, len(triangles)))
+    description = {
+        'meshes': [{'name': x.name, 'material': x.texture_id} for x in sub_models],
+        'materials': {x.texture_id: textures.get(x.texture_id) for x in sub_models if x.texture_id},
+    }
+    np.savez(file_name,
+             vertices=(np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+                       - np.asarray(pivot_offset, dtype=np.float64)).astype(np.float32),
+             uvs=np.asarray(uvs, dtype=np.float32).reshape(-1, 2),
+             loops=np.asarray(loops, dtype=np.int32),
+             polygon_sizes=np.asarray(polygon_sizes, dtype=np.int32),
+             counts=np.asarray(counts, dtype=np.int32).reshape(-1, 3),
+             description=np.array(json.dumps(description)))
+
+
+def _format_floats(values, float_precision=None) -> List[str]:
+    # formats float64 array as str() does (or with fixed precision). Vertices are shared between neighbour meshes, so
+    # every distinct value (compared bitwise: 0.0 and -0.0 are formatted differently) is formatted only once
+    import numpy as np
+    values = np.ascontiguousarray(values, dtype=np.float64).ravel()
+    unique_values, inverse = np.unique(values.view(np.int64), return_inverse=True)
+    formatted = np.array(_format_values(unique_values.view(np.float64).tolist(), float_precision), dtype=object)
+    return formatted[inverse.ravel()].tolist()
+
+
+def _format_values(values: list, float_precision=None) -> List[str]:
+    # str() of every value, or fixed precision. Integers stay integers in default mode
+    value_format = '%r\0' if float_precision is None else f'%.{float_precision}f\0'
+    return (value_format * len(values) % tuple(values)).split('\0')[:-1]
+
+
+def write_obj(f, sub_models: List[SubMesh], mtllib=None, multiply_uvws=False, textures_shpi_block=None,
+              pivot_offset=(0, 0, 0), float_precision=None, face_index_increment=1) -> int:
+    """
+     Writes sub-meshes to OBJ file handle. Every mesh is formatted in bulk and written right away, so only text of one
+     mesh is kept in memory. If float_precision is None, numbers are written as str() does, otherwise with given
+     amount of digits after decimal point. Returns amount of written vertices
+     """
+    import numpy as np
+    pivot_offset = np.asarray(pivot_offset, dtype=np.float64)
+    vertex_offset = 0
+    for sub_model in sub_models:
+        f.write(f'\n\no {sub_model.name}')
+        if mtllib is not None:
+            f.write(f'\nmtllib {mtllib}')
+        vertices_count = len(sub_model.vertices)
+        if vertices_count:
+            coordinates = np.asarray(sub_model.vertices, dtype=np.float64).reshape(-1, 3) - pivot_offset
+            f.write('\nv %s %s %s' * vertices_count % tuple(_format_floats(coordinates, float_precision)))
+        else:
+            f.write('\n')
+        uvs = sub_model.get_scaled_uvs(multiply_uvws, textures_shpi_block)
+        if uvs:
+            # uvs can be integers, they are written without fraction part
+            f.write('\nvt %s %s' * len(uvs) % tuple(_format_values([x for uv in uvs for x in (uv[0], 1 - uv[1])],
+                                                                   float_precision)))
+        else:
+            f.write('\n')
+        if sub_model.texture_id:
+            f.write('\nusemtl ' + sub_model.texture_id)
+        if sub_model.polygons:
+            # face vertex is "index/uv index", formatted once per vertex of mesh
+            first_index = face_index_increment + vertex_offset
+            formatted_indices = np.array([f'{i}/{i}' for i in range(first_index, first_index + vertices_count)],
+                                         dtype=object)
+            sizes = [len(polygon) for polygon in sub_model.polygons]
+            if sizes.count(sizes[0]) == len(sizes):
+                # all polygons of the same size (always true for terrain): indices are taken from numpy array at once
+                face_format = ('\nf' + ' %s' * sizes[0]) * len(sizes)
+                indices = np.asarray(sub_model.polygons, dtype=np.int64).ravel()
+            else:
+                face_format = ''.join(['\nf' + ' %s' * size for size in sizes])
+                indices = np.fromiter(itertools.chain.from_iterable(sub_model.polygons), dtype=np.int64,
+                                      count=sum(sizes))
+            f.write(face_format % tuple(formatted_indices[indices].tolist()))
+        else:
+            f.write('\n')
+        vertex_offset += vertices_count
+    return vertex_offset
+
+
+# triangles of a cube with vertices in order: (-1,-1,-1), (-1,-1,1), (-1,1,-1), (-1,1,1), (1,-1,-1), ... (1,1,1)
+_box_corners = [[x, y, z] for x in [-1, 1] for y in [-1, 1] for z in [-1, 1]]
+_box_triangles = [[0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5], [0, 4, 5], [0, 5, 1],
+                  [2, 3, 7], [2, 7, 6], [0, 2, 6], [0, 6, 4], [1, 5, 7], [1, 7, 3]]
+
+
+def build_boxes(locations, scales, rotations_z):
+    """
+     Builds one mesh from many boxes, the same as blender creates with primitive_cube_add(location, scale,
+     rotation=(0, 0, rotation_z)). Returns vertices (N * 8, 3) and triangles (N * 12, 3) numpy arrays
+     """
+    import numpy as np
+    locations = np.asarray(locations, dtype=np.float64).reshape(-1, 3)
+    scales = np.asarray(scales, dtype=np.float64).reshape(-1, 3)
+    rotations_z = np.asarray(rotations_z, dtype=np.float64).reshape(-1)
+    corners = np.asarray(_box_corners, dtype=np.float64)[np.newaxis, :, :] * scales[:, np.newaxis, :]
+    cos, sin = np.cos(rotations_z)[:, np.newaxis], np.sin(rotations_z)[:, np.newaxis]
+    vertices = np.stack([corners[:, :, 0] * cos - corners[:, :, 1] * sin,
+                         corners[:, :, 0] * sin + corners[:, :, 1] * cos,
+                         corners[:, :, 2]], axis=2) + locations[:, np.newaxis, :]
+    triangles = (np.asarray(_box_triangles)[np.newaxis, :, :]
+                 + (np.arange(len(locations)) * 8)[:, np.newaxis, np.newaxis])
+    return vertices.reshape(-1, 3), triangles.reshape(-1, 3)
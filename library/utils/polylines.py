@@ -0,0 +1,48 @@
+import heapq
+import math
+from typing import List, Sequence, Tuple
+
+
+def simplify_polyline(points: List[Sequence[float]], tolerance: float,
+                      axes: Tuple[int, int] = (0, 1)) -> List[Sequence[float]]:
+    """
+     Removes polyline points, which make too small turn. Polyline is considered in 2D plane of given axes. The
+     deviation of point is |sin(turn angle)| * (sum of lengths of adjacent segments), point with the smallest deviation
+     is removed first (the first one in polyline if equal), until all points deviate more than tolerance. First and
+     last points are always kept. Only neighbours of removed point are re-evaluated, so it takes O(n log n)
+     """
+    count = len(points)
+    if count < 3:
+        return list(points)
+    a, b = axes
+    previous_indexes = list(range(-1, count - 1))
+    next_indexes = list(range(1, count + 1))
+    versions = [0] * count
+    removed = [False] * count
+
+    def deviation(index):
+        previous_point, point, next_point = points[previous_indexes[index]], points[index], points[next_indexes[index]]
+        orientation_in = math.atan2(point[a] - previous_point[a], point[b] - previous_point[b])
+        orientation_out = math.atan2(next_point[a] - point[a], next_point[b] - point[b])
+        length_in = math.sqrt((previous_point[a] - point[a]) ** 2 + (previous_point[b] - point[b]) ** 2)
+        length_out = math.sqrt((point[a] - next_point[a]) ** 2 + (point[b] - next_point[b]) ** 2)
+        return abs(math.sin(orientation_in - orientation_out) * (length_in + length_out))
+
+    # entries are (deviation, index, version): outdated entries are skipped when popped
+    heap = [(deviation(i), i, 0) for i in range(1, count - 1)]
+    heapq.heapify(heap)
+    while heap:
+        value, index, version = heapq.heappop(heap)
+        if removed[index] or version != versions[index]:
+            continue
+        if value > tolerance:
+            break
+        removed[index] = True
+        previous_index, next_index = previous_indexes[index], next_indexes[index]
+        next_indexes[previous_index] = next_index
+        previous_indexes[next_index] = previous_index
+        for neighbour in (previous_index, next_index):
+            if 0 < neighbour < count - 1:
+                versions[neighbour] += 1
+                heapq.heappush(heap, (deviation(neighbour), neighbour, versions[neighbour]))
+    return [point for i, point in enumerate(points) if not removed[i]]
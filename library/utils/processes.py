@@ -0,0 +1,115 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from multiprocessing import Array
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+def become_process_group_leader():
+    # pool worker calls it on start: all external tools (blender, ffmpeg), launched by worker, will be in the same
+    # process group, so the whole tree can be killed at once. It also detaches the worker from terminal's process
+    # group, so Ctrl-C is handled only by the main process
+    if sys.platform != "win32":
+        os.setpgrp()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def kill_process_tree(pid: int):
+    try:
+        if sys.platform == "win32":
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        # already finished
+        pass
+
+
+class ExternalToolSlots:
+    """
+     Cross-process limit of simultaneously running external tools (blender, ffmpeg). Created in the main process and
+     passed to pool workers in initializer. Every tool has an array of slot owners (pid or 0 for free slot). Slot is
+     taken by writing own pid to a free item under the lock of array, so it is owned from the very moment it is taken,
+     and slots of killed process can be returned. Lock is held only for scanning the array, waiting for a free slot is
+     done outside of it: worker, killed while waiting, does not block others
+     """
+
+    # how often waiting process checks for a free slot, seconds
+    poll_interval = 0.05
+
+    def __init__(self, limits: Dict[str, int]):
+        self.owners = {}
+        for tool, limit in limits.items():
+            if limit:
+                self.owners[tool] = Array('i', limit)
+
+    def _try_acquire(self, tool: str, pid: int) -> Optional[int]:
+        owners = self.owners[tool]
+        with owners.get_lock():
+            for token in range(len(owners)):
+                if owners[token] == 0:
+                    owners[token] = pid
+                    return token
+        return None
+
+    @contextmanager
+    def acquire(self, tool: str, on_wait: Optional[Callable[[bool], None]] = None):
+        # on_wait is called with True if there is no free slot and process starts waiting, and with False when it got
+        # the slot after waiting
+        if tool not in self.owners:
+            yield None
+            return
+        pid = os.getpid()
+        token = self._try_acquire(tool, pid)
+        if token is None:
+            if on_wait:
+                on_wait(True)
+            while token is None:
+                time.sleep(self.poll_interval)
+                token = self._try_acquire(tool, pid)
+            if on_wait:
+                on_wait(False)
+        try:
+            yield token
+        finally:
+            owners = self.owners[tool]
+            with owners.get_lock():
+                # could be already returned by release_owned_by and taken by another process
+                if owners[token] == pid:
+                    owners[token] = 0
+
+    def release_owned_by(self, pid: int) -> List[Tuple[str, int]]:
+        released = []
+        for tool, owners in self.owners.items():
+            with owners.get_lock():
+                for token in range(len(owners)):
+                    if owners[token] == pid:
+                        owners[token] = 0
+                        released.append((tool, token))
+        return released
+
+
+# set in pool worker, see init_external_tool_slots. If not set (single file conversion, GUI), no limits applied
+_external_tool_slots: Optional[ExternalToolSlots] = None
+_on_slot_wait: Optional[Callable[[bool], None]] = None
+
+
+def init_external_tool_slots(slots: Optional[ExternalToolSlots], on_wait: Optional[Callable[[bool], None]] = None):
+    global _external_tool_slots, _on_slot_wait
+    _external_tool_slots = slots
+    _on_slot_wait = on_wait
+
+
+@contextmanager
+def external_tool_slot(tool: str):
+    # should wrap launching of the tool only, all preparations should be done before waiting for a slot.
+    # Yields index of the slot, or None if there are no limits
+    if _external_tool_slots is None:
+        yield None
+    else:
+        with _external_tool_slots.acquire(tool, _on_slot_wait) as token:
+            yield token
@@ -1,5 +1,6 @@
 from io import BufferedReader, BytesIO
 
+from library.helpers.read_progress import get_read_progress
 from library.read_blocks.array import ArrayBlock, ExplicitOffsetsArrayBlock
 from library.read_blocks.atomic import Utf8Block, IntegerBlock, BytesField
 from library.read_blocks.compound import CompoundBlock
@@ -27,8 +28,16 @@ class CompressedBlock(DelegateBlock):
         self.algorithm = None
 
     def read(self, buffer: [BufferedReader, BytesIO], size: int, state):
-        uncompressed_bytes = self.algorithm(buffer, size)
+        return self.read_uncompressed(self.algorithm(buffer, size), state)
+
+    def read_uncompressed(self, uncompressed_bytes: bytes, state):
         uncompressed = BytesIO(uncompressed_bytes)
+        # read ranges of this data are offsets in uncompressed bytes, not in file
+        state['compressed'] = True
+        progress = get_read_progress()
+        if progress is not None and '__' not in state.get('id', '__'):
+            # compressed file: progress of reading is counted in uncompressed data
+            progress.track(uncompressed, len(uncompressed_bytes))
         delegated_block = state.get('delegated_block')
         if delegated_block is None:
             from library import probe_block_class
@@ -1,3 +1,7 @@
+from typing import Dict
+
+import numpy as np
+
 from library.read_blocks.array import ArrayBlock
 from library.read_blocks.atomic import IntegerBlock, Utf8Block, BitFlagsBlock
 from library.read_blocks.compound import CompoundBlock
@@ -227,3 +231,25 @@ class OripGeometry(CompoundBlock):
 
     def _before_polygon_vertex_map_block_read(self, data, buffer, initial_buffer_pointer, **kwargs):
         buffer.seek(initial_buffer_pointer + data['polygon_vertex_map_block_offset'].value)
+
+    def get_mesh_arrays(self, read_data) -> Dict[str, np.ndarray]:
+        """
+         Returns vertices, texture coordinates, polygon vertex map and polygon fields as NumPy arrays, one item per
+         block item, so geometry can be built without walking the read data polygon by polygon
+         """
+        polygons = [polygon.value for polygon in read_data.polygons_block]
+        mappings = [polygon.mapping.value for polygon in polygons]
+        return {
+            'vertices': np.array([[vertex.x.value, vertex.y.value, vertex.z.value]
+                                  for vertex in read_data.vertex_block], dtype=np.float64).reshape(-1, 3),
+            'vertex_uvs': np.array([[uv.u.value, uv.v.value] for uv in read_data.vertex_uvs_block],
+                                   dtype=np.int64).reshape(-1, 2),
+            'polygon_vertex_map': np.array([x.value for x in read_data.polygon_vertex_map_block], dtype=np.int64),
+            'polygon_types': np.array([x.polygon_type.value for x in polygons], dtype=np.int64),
+            'two_sided': np.array([x['two_sided'] for x in mappings], dtype=bool),
+            'flip_normal': np.array([x['flip_normal'] for x in mappings], dtype=bool),
+            'use_uv': np.array([x['use_uv'] for x in mappings], dtype=bool),
+            'texture_indexes': np.array([x.texture_index.value for x in polygons], dtype=np.int64),
+            'offsets_3d': np.array([x.offset_3d.value for x in polygons], dtype=np.int64),
+            'offsets_2d': np.array([x.offset_2d.value for x in polygons], dtype=np.int64),
+        }
@@ -1,3 +1,5 @@
+from typing import List
+
 from library.helpers.exceptions import BlockIntegrityException
 from library.read_blocks.array import ArrayBlock
 from library.read_blocks.atomic import BitFlagsBlock, IntegerBlock, EnumByteBlock, Utf8Block
@@ -262,6 +264,19 @@ class TriMap(CompoundBlock):
             state['proxy_object_instances'] = {}
         state['proxy_object_instances']['length'] = data['proxy_object_instances_count'].value
 
+    def get_proxy_object_instances_by_chunk(self, read_data) -> List[List[int]]:
+        """
+         Groups indexes of proxy object instances by terrain chunk of referenced road spline vertex, in one pass.
+         Instances, referencing vertex outside of the track (like -1 in unused records), are skipped
+         """
+        chunks_count = len(read_data.terrain)
+        res = [[] for _ in range(chunks_count)]
+        for index, instance in enumerate(read_data.proxy_object_instances):
+            spline_index = instance.reference_road_spline_vertex.value
+            if 0 <= spline_index < chunks_count * 4:
+                res[spline_index // 4].append(index)
+        return res
+
     def list_custom_actions(self):
         return [
             *super().list_custom_actions(),
@@ -1,42 +1,98 @@
+from typing import List, Optional, Tuple
+
 from library.read_data import ReadData
 from resources.eac.archives import ShpiBlock, WwwwBlock
 from resources.eac.bitmaps import Bitmap8Bit
 from resources.eac.palettes import BasePalette
 
 
+def _get_archive(resource: ReadData) -> Tuple[Optional[ReadData], int]:
+    # archive (SHPI or WWWW), which has resource in its children, and position of resource in children
+    from library import require_parent
+    children, index = require_parent(resource.id)
+    if children is None:
+        return None, -1
+    archive, key = require_parent(children.id)
+    if key != 'children':
+        return None, -1
+    return archive, index
+
+
 def _get_palette_from_shpi(shpi: ReadData[ShpiBlock]):
+    # memoized per SHPI. Nodes are compared as well: preview of changes (see ReadDataOverlay) has other nodes with
+    # the same ids
+    from library.loader import get_resource_memo
+    memo = get_resource_memo(shpi.id)
+    key = ('shpi_palette', shpi.id)
+    cached = memo.get(key)
+    if cached is not None and cached[0] is shpi:
+        return cached[1]
     # some of SHPI directories have upper-cased name of palette. Happens in TNFS track FAM files
     # some of SHPI directories have 0000 as palette. Happens in NFS2SE car models, dash hud, render/pc
-    for id in ['!pal', '!PAL', '0000']:
-        try:
-            palette = next(
-                x for x in shpi.children if isinstance(x, ReadData) and x.block_state['id'].endswith('/' + id))
-            from resources.eac.palettes import BasePalette
-            if palette and isinstance(palette.block, BasePalette):
-                return palette
-        except StopIteration:
-            pass
-    return None
+    names = ['!pal', '!PAL', '0000']
+    # the first child with each of names, found in one pass
+    candidates = {}
+    for x in shpi.children:
+        if isinstance(x, ReadData):
+            name = x.block_state['id'][x.block_state['id'].rfind('/') + 1:]
+            if name in names and name not in candidates:
+                candidates[name] = x
+    palette = next((candidates[name] for name in names
+                    if candidates.get(name) and isinstance(candidates[name].block, BasePalette)), None)
+    memo[key] = (shpi, palette)
+    return palette
+
+
+def _get_wwww_palettes(wwww: ReadData[WwwwBlock]) -> List[Optional[ReadData]]:
+    # item i is the palette of the nearest child at or before i, which has palette. Computed once per WWWW
+    from library.loader import get_resource_memo
+    memo = get_resource_memo(wwww.id)
+    key = ('wwww_palettes', wwww.id)
+    cached = memo.get(key)
+    if cached is not None and cached[0] is wwww:
+        return cached[1]
+    palettes = []
+    palette = None
+    for child in wwww.children:
+        child_palette = None
+        if isinstance(child, ReadData) and isinstance(child.block, ShpiBlock):
+            child_palette = _get_palette_from_shpi(child)
+        elif isinstance(child, ReadData) and isinstance(child.block, WwwwBlock):
+            child_palette = _get_palette_from_wwww(child, skip_parent_check=True)
+        if child_palette:
+            palette = child_palette
+        palettes.append(palette)
+    memo[key] = (wwww, palettes)
+    return palettes
 
 
 def _get_palette_from_wwww(wwww: ReadData[WwwwBlock], max_index=-1, skip_parent_check=False):
+    # the nearest palette before max_index, then before this WWWW in parent WWWW
     if max_index == -1:
         max_index = len(wwww.children)
-    palette = None
-    for i in range(max_index - 1, -1, -1):
-        if isinstance(wwww.children[i], ReadData) and isinstance(wwww.children[i].block, ShpiBlock):
-            palette = _get_palette_from_shpi(wwww.children[i])
-            if palette:
-                break
-        elif isinstance(wwww.children[i], ReadData) and isinstance(wwww.children[i].block, WwwwBlock):
-            palette = _get_palette_from_wwww(wwww.children[i], skip_parent_check=True)
-            if palette:
-                break
-    if not palette and not skip_parent_check and 'children' in wwww.id:
-        from library import require_resource
-        parent, _ = require_resource(wwww.id[:wwww.id.rindex('children')])
-        return _get_palette_from_wwww(parent, max_index=next((i for i, x in enumerate(parent.children)
-                                                                   if x.id == wwww.id), -1))
+    palette = _get_wwww_palettes(wwww)[max_index - 1] if max_index > 0 else None
+    if not palette and not skip_parent_check:
+        parent, index = _get_archive(wwww)
+        if parent is not None:
+            return _get_palette_from_wwww(parent, max_index=index)
+    return palette
+
+
+def _get_bitmaps_palette(shpi: ReadData[ShpiBlock]):
+    # palette for bitmaps of SHPI, which do not have own palette, memoized per SHPI
+    from library.loader import get_resource_memo
+    memo = get_resource_memo(shpi.id)
+    key = ('bitmaps_palette', shpi.id)
+    cached = memo.get(key)
+    if cached is not None and cached[0] is shpi:
+        return cached[1]
+    palette = _get_palette_from_shpi(shpi)
+    # TNFS track FAM files contain WWWW directories with SHPI entries, some of them do not have palette, use previous available !pal. 7C bitmap resource data seems to not change as well :(
+    if not palette and '.FAM' in shpi.id:
+        shpi_parent_wwww, index = _get_archive(shpi)
+        if shpi_parent_wwww is not None:
+            palette = _get_palette_from_wwww(shpi_parent_wwww, index)
+    memo[key] = (shpi, palette)
     return palette
 
 
@@ -53,21 +109,18 @@ def determine_palette_for_8_bit_bitmap(bitmap: ReadData[Bitmap8Bit]) -> ReadData
         # If ignore inline palette in all FAM textures, the train in alpine track will be broken ¯\_(ツ)_/¯
         # autumn valley fence texture broken only in ETRACKFM and NTRACKFM
         # TODO find a generic solution to this problem
-        from library import require_resource
         # finding in current SHPI directory
-        shpi_id = bitmap.id[:max(bitmap.id.rfind('__children'), bitmap.id.rfind('/children'))]
-        palette = _get_palette_from_shpi(require_resource(shpi_id)[0])
-        # TNFS track FAM files contain WWWW directories with SHPI entries, some of them do not have palette, use previous available !pal. 7C bitmap resource data seems to not change as well :(
-        if not palette and '.FAM' in bitmap.id:
-            shpi_parent_wwww, _ = require_resource(shpi_id[:shpi_id.rindex('children')])
-            palette = _get_palette_from_wwww(shpi_parent_wwww,
-                                                  next((i for i, x in enumerate(shpi_parent_wwww.children)
-                                                        if x.id == shpi_id), -1))
+        shpi, _ = _get_archive(bitmap)
+        palette = _get_bitmaps_palette(shpi) if shpi is not None else None
         if palette is None and 'ART/CONTROL/' in bitmap.id:
             # TNFS has QFS files without palette in this directory, and 7C bitmap resource data seems to not differ in this case :(
             from library import require_resource
-            shpi, _ = require_resource('/'.join(bitmap.id.split('__')[0].split('/')[:-1]) + '/CENTRAL.QFS')
-            palette = _get_palette_from_shpi(shpi)
+            from library.shared_cache import get_shared_palette
+            central_id = '/'.join(bitmap.id.split('__')[0].split('/')[:-1]) + '/CENTRAL.QFS'
+            palette = get_shared_palette(central_id)
+            if palette is None:
+                shpi, _ = require_resource(central_id)
+                palette = _get_palette_from_shpi(shpi)
     else:
         palette = bitmap.palette
     return palette
@@ -32,7 +32,7 @@ class ShpiArchiveSerializer(BaseFileSerializer):
                     traceback.print_exc()
                 skipped_resources.append((name, format_exception(ex)))
         if not self.settings.images__save_images_only:
-            with open(os.path.join(path, 'positions.txt'), 'w') as f:
+            with open(self.register_artifact(os.path.join(path, 'positions.txt')), 'w') as f:
                 for name, item in [(name, item) for name, item in items if
                                    isinstance(item, ReadData) and isinstance(item.block, AnyBitmapBlock)]:
                     f.write(f"{name}: {item.x.value}, {item.y.value}\n")
@@ -40,11 +40,12 @@ class ShpiArchiveSerializer(BaseFileSerializer):
             try:
                 horz_bitmap = next(x for name, x in items if name == 'horz')
                 nfs1_panorama_to_spherical(data.id[data.id.index('.FAM') - 7:data.id.index('.FAM') - 4],
-                                           os.path.join(path, 'horz.png'), os.path.join(path, 'spherical.png'))
+                                           os.path.join(path, 'horz.png'),
+                                           self.register_artifact(os.path.join(path, 'spherical.png')))
             except StopIteration:
                 pass
         if skipped_resources:
-            with open(os.path.join(path, 'skipped.txt'), 'w') as f:
+            with open(self.register_artifact(os.path.join(path, 'skipped.txt')), 'w') as f:
                 for item in skipped_resources:
                     f.write("%s\t\t%s\n" % item)
 
@@ -180,7 +181,7 @@ class WwwwArchiveSerializer(BaseFileSerializer):
                     traceback.print_exc()
                 skipped_resources.append((name, format_exception(ex)))
         if skipped_resources:
-            with open(os.path.join(path, 'skipped.txt'), 'w') as f:
+            with open(self.register_artifact(os.path.join(path, 'skipped.txt')), 'w') as f:
                 for item in skipped_resources:
                     f.write("%s\t\t%s\n" % item)
 
@@ -206,6 +207,6 @@ class SoundBankSerializer(BaseFileSerializer):
                     traceback.print_exc()
                 skipped_resources.append((name, format_exception(ex)))
         if skipped_resources:
-            with open(os.path.join(path, 'skipped.txt'), 'w') as f:
+            with open(self.register_artifact(os.path.join(path, 'skipped.txt')), 'w') as f:
                 for item in skipped_resources:
                     f.write("%s\t\t%s\n" % item)
@@ -6,6 +6,7 @@ from wave import Wave_write
 
 from library.read_data import ReadData
 from library.utils import audio_ima_adpcm_codec
+from library.utils.processes import external_tool_slot
 from resources.eac.audios import EacsAudio, AsfAudio
 from serializers import BaseFileSerializer
 
@@ -45,7 +46,7 @@ class EacsAudioSerializer(BaseFileSerializer):
         self._save_wave_data(data, wave_bytes, path)
         if loop_wave_data:
             self._save_wave_data(data, loop_wave_data, f"{path}_loop")
-        with open(f'{path}.meta.json', 'w') as file:
+        with open(self.register_artifact(f'{path}.meta.json'), 'w') as file:
             file.write(json.dumps({
                 "loop_start_time_ms": loop_start_time_ms,
                 "loop_end_time_ms": loop_end_time_ms
@@ -62,8 +63,9 @@ class EacsAudioSerializer(BaseFileSerializer):
             wave.close()
             args = [self.settings.ffmpeg_executable, "-y", "-nostats", '-loglevel', '0', "-i",
                     file.name.replace('\\', '/'),
-                    f'{path}.mp3']
-            subprocess.run(args, check=True)
+                    self.register_artifact(f'{path}.mp3')]
+            with external_tool_slot('ffmpeg'):
+                subprocess.run(args, check=True)
         except Exception as ex:
             raise ex
         finally:
@@ -75,10 +77,12 @@ class FfmpegSupportedAudioSerializer(BaseFileSerializer):
 
     def serialize(self, data: ReadData[AsfAudio], path: str):
         super().serialize(data, path)
-        subprocess.run(
-            [self.settings.ffmpeg_executable, "-y", "-nostats", '-loglevel', '0', "-i", data.id, f'{path}.mp3'],
-            check=True)
-        with open(f'{path}.meta.json', 'w') as file:
+        with external_tool_slot('ffmpeg'):
+            subprocess.run(
+                [self.settings.ffmpeg_executable, "-y", "-nostats", '-loglevel', '0', "-i", data.id,
+                 self.register_artifact(f'{path}.mp3')],
+                check=True)
+        with open(self.register_artifact(f'{path}.meta.json'), 'w') as file:
             loop_start_time_ms = 1000 * data.repeat_loop_beginning.value / data.sampling_rate.value
             loop_end_time_ms = loop_start_time_ms + 1000 * data.repeat_loop_length.value / data.sampling_rate.value
             file.write(json.dumps({
@@ -1,7 +1,8 @@
 import json
 import os
 from abc import ABC, abstractmethod
-from typing import Dict
+from contextvars import ContextVar
+from typing import Dict, List, Optional
 
 import settings
 from library.read_blocks.array import ArrayBlock
@@ -24,8 +25,37 @@ class ResourceSerializer(ABC):
         raise NotImplementedError
 
 
+# files, produced by serializers while manifest is being collected, see BaseFileSerializer.serialize_with_manifest
+_manifest = ContextVar('serializers_manifest', default=None)
+
+
 class BaseFileSerializer(ResourceSerializer):
 
+    @staticmethod
+    def register_artifact(path: str) -> str:
+        """
+         Adds produced file path to the manifest (if it is collected at the moment) and returns this path
+         """
+        manifest = _manifest.get()
+        if manifest is not None:
+            manifest.append(path)
+        return path
+
+    def serialize_with_manifest(self, data: ReadData, path: str) -> List[str]:
+        """
+         Serializes resource and returns paths of all produced files, including files of nested resources
+         """
+        outer_manifest = _manifest.get()
+        token = _manifest.set([])
+        try:
+            self.serialize(data, path)
+            manifest = _manifest.get()
+        finally:
+            _manifest.reset(token)
+        if outer_manifest is not None:
+            outer_manifest.extend(manifest)
+        return manifest
+
     def get_unknowns_dict(self, data: ReadData):
         if not isinstance(data, ReadData):
             return None
@@ -64,7 +94,8 @@ class BaseFileSerializer(ResourceSerializer):
         if self.settings.export_unknown_values and isinstance(block, CompoundBlock):
             unknowns = self.get_unknowns_dict(data)
             if unknowns:
-                with open(f'{path}{"__" if path.endswith("/") else ""}.unknowns.json', 'w') as file:
+                with open(self.register_artifact(f'{path}{"__" if path.endswith("/") else ""}.unknowns.json'),
+                          'w') as file:
                     file.write(json.dumps(unknowns, indent=4))
 
     def deserialize(self, path: str, resource: ReadData, **kwargs) -> None:
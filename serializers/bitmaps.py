@@ -1,3 +1,5 @@
+from io import BytesIO
+
 from PIL import Image
 
 from library.helpers.exceptions import SerializationException
@@ -8,23 +10,39 @@ from serializers import BaseFileSerializer
 from serializers.misc.path_utils import escape_chars
 
 
-class BitmapSerializer(BaseFileSerializer):
+class BaseBitmapSerializer(BaseFileSerializer):
+
+    def get_image(self, data: ReadData[AnyBitmapBlock]) -> Image.Image:
+        raise NotImplementedError
+
+    def render_png(self, data: ReadData[AnyBitmapBlock]) -> bytes:
+        """
+         Encodes bitmap to PNG in memory, used for GUI previews, which do not need a file on disk
+         """
+        buffer = BytesIO()
+        self.get_image(data).save(buffer, format='PNG')
+        return buffer.getvalue()
 
     def serialize(self, data: ReadData[AnyBitmapBlock], path: str):
         super().serialize(data, path)
-        Image.frombytes('RGBA',
-                        (data.width.value, data.height.value),
-                        bytes().join([c.to_bytes(4, 'big') for c in data.bitmap])).save(f'{escape_chars(path)}.png')
+        self.get_image(data).save(self.register_artifact(f'{escape_chars(path)}.png'))
+
+
+class BitmapSerializer(BaseBitmapSerializer):
+
+    def get_image(self, data: ReadData[AnyBitmapBlock]) -> Image.Image:
+        return Image.frombytes('RGBA',
+                               (data.width.value, data.height.value),
+                               bytes().join([c.to_bytes(4, 'big') for c in data.bitmap]))
 
 
-class BitmapWithPaletteSerializer(BaseFileSerializer):
+class BitmapWithPaletteSerializer(BaseBitmapSerializer):
 
     @staticmethod
     def has_tail_lights(data: ReadData[Bitmap8Bit]):
         return data.id[-4:] in ['rsid', 'lite'] and '.CFM' in data.id
 
-    def serialize(self, data: ReadData[Bitmap8Bit], path: str):
-        super().serialize(data, path)
+    def get_image(self, data: ReadData[Bitmap8Bit]) -> Image.Image:
         palette = determine_palette_for_8_bit_bitmap(data)
         if palette is None:
             raise SerializationException('Palette not found for 8bit bitmap')
@@ -44,10 +62,14 @@ class BitmapWithPaletteSerializer(BaseFileSerializer):
                 colors.append(palette_colors[index])
             except IndexError:
                 colors.append(0)
-        Image.frombytes('RGBA',
-                        (data.width.value, data.height.value),
-                        bytes().join([c.to_bytes(4, 'big') for c in colors])).save(f'{escape_chars(path)}.png')
-        if self.settings.images__save_inline_palettes and data.value.palette and data.value.palette == palette:
+        return Image.frombytes('RGBA',
+                               (data.width.value, data.height.value),
+                               bytes().join([c.to_bytes(4, 'big') for c in colors]))
+
+    def serialize(self, data: ReadData[Bitmap8Bit], path: str):
+        super().serialize(data, path)
+        if (self.settings.images__save_inline_palettes and data.value.palette
+                and data.value.palette == determine_palette_for_8_bit_bitmap(data)):
             from serializers import PaletteSerializer
             palette_serializer = PaletteSerializer()
             palette_serializer.serialize(data.palette, f'{escape_chars(path)}_pal')
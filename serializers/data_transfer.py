@@ -1,4 +1,8 @@
-from typing import Dict
+import base64
+from typing import Dict, List, Optional
+from weakref import WeakKeyDictionary
+
+import numpy as np
 
 from library.helpers.data_wrapper import DataWrapper
 from library.read_data import ReadData
@@ -6,19 +10,97 @@ from serializers.base import ResourceSerializer
 
 
 class DataTransferSerializer(ResourceSerializer):
+    """
+     Serializes read data for GUI editor. Output consists of two parts: "schemas" table with every used block, sent
+     once and keyed by schema id, and "data" tree, where every node references block with "schema" field. Block,
+     nested into another block, is a reference {"schema_ref": id} as well. If depth is limited, nodes deeper than
+     depth, which have children, are sent as stubs {"schema", "block_id", "stub": true, "size"}, GUI loads them later.
+     Bytes and long arrays of numbers (like bitmap pixels) are sent as base64 of little-endian typed array:
+     {"typed_array": dtype name, "data": base64 string}
+     """
+
+    typed_array_min_length = 64
+    # smallest type first. JS has no 64-bit integer arrays, numbers are exact in float64 up to 2^53
+    _integer_dtypes = [np.dtype(x) for x in ['<u1', '<i1', '<u2', '<i2', '<u4', '<i4']]
+
+    # block classes and block instances are not changed in runtime, so it is safe to compute these once. Validators
+    # cache does not keep blocks alive: blocks of closed files are dropped from it together with files
+    _class_mro_cache: Dict[type, str] = {}
+    _validators_cache: 'WeakKeyDictionary[object, Dict]' = WeakKeyDictionary()
+
+    def __init__(self):
+        self.schemas: Dict[str, Dict] = {}
+        self._schema_ids: Dict[int, str] = {}
+        self._schema_blocks: List = []
 
     @staticmethod
-    def _serialize_block(block):
+    def _get_class_mro(block_class: type) -> str:
+        try:
+            return DataTransferSerializer._class_mro_cache[block_class]
+        except KeyError:
+            pass
+        mro = '__'.join([x.__name__ for x in block_class.mro() if x.__name__ not in ['object', 'ABC']])
+        DataTransferSerializer._class_mro_cache[block_class] = mro
+        return mro
+
+    @staticmethod
+    def _get_editor_validators(block, state) -> Dict:
+        try:
+            return DataTransferSerializer._validators_cache[block]
+        except KeyError:
+            pass
+        validators = block.get_editor_validators(state)
+        DataTransferSerializer._validators_cache[block] = validators
+        return validators
+
+    def _get_schema_id(self, block) -> str:
+        try:
+            return self._schema_ids[id(block)]
+        except KeyError:
+            pass
         from library.read_blocks.data_block import DataBlock
-        result = {k: v if not isinstance(v, DataBlock) else DataTransferSerializer._serialize_block(v)
-                  for (k, v) in block.__dict__.items()
-                  if k not in ['instance_fields', 'instance_fields_map']}
-        return {
+        schema_id = self._schema_ids[id(block)] = str(len(self._schema_blocks))
+        self._schema_blocks.append(block)
+        self.schemas[schema_id] = {
+            'block_class_mro': self._get_class_mro(block.__class__),
             'custom_actions': block.list_custom_actions(),
-            **result,
+            **{k: v if not isinstance(v, DataBlock) else {'schema_ref': self._get_schema_id(v)}
+               for (k, v) in block.__dict__.items()
+               if k not in ['instance_fields', 'instance_fields_map']},
         }
+        return schema_id
 
-    def serialize(self, data: ReadData, skip_block_info=False) -> Dict:
+    @staticmethod
+    def _pack_typed_array(values: np.ndarray) -> Dict:
+        return {
+            'typed_array': values.dtype.name,
+            'data': base64.b64encode(values.tobytes()).decode('ascii'),
+        }
+
+    @staticmethod
+    def _pack_numbers(values: list) -> Optional[Dict]:
+        # returns None if values are not numbers or too few of them
+        if len(values) < DataTransferSerializer.typed_array_min_length or isinstance(values[0], ReadData):
+            return None
+        try:
+            array = np.asarray(values)
+        except ValueError:
+            return None
+        if array.ndim != 1:
+            return None
+        if array.dtype.kind in 'iu':
+            min_value, max_value = array.min(), array.max()
+            for dtype in DataTransferSerializer._integer_dtypes:
+                info = np.iinfo(dtype)
+                if info.min <= min_value and max_value <= info.max:
+                    return DataTransferSerializer._pack_typed_array(array.astype(dtype))
+            if -(1 << 53) <= min_value and max_value <= (1 << 53):
+                return DataTransferSerializer._pack_typed_array(array.astype('<f8'))
+        elif array.dtype.kind == 'f':
+            return DataTransferSerializer._pack_typed_array(array.astype('<f8'))
+        return None
+
+    def _serialize_data(self, data: ReadData, depth: Optional[int] = None):
         if not isinstance(data, ReadData):
             if isinstance(data, Exception):
                 return {
@@ -29,32 +111,58 @@ class DataTransferSerializer(ResourceSerializer):
                 return data.__dict__
             except AttributeError:
                 return data
+        if depth is not None and depth <= 0 and isinstance(data.value, (DataWrapper, list, bytes)):
+            return {
+                'schema': self._get_schema_id(data.block),
+                'block_id': data.block_state['id'],
+                'stub': True,
+                'size': len(data.value),
+            }
+        child_depth = depth - 1 if depth is not None else None
         if isinstance(data.value, DataWrapper):
-            value = {k: self.serialize(v) for k, v in data.value.items()}
+            value = {k: self._serialize_data(v, child_depth) for k, v in data.value.items()}
         elif isinstance(data.value, list):
-            array_scoped_block = None
-            try:
-                array_scoped_block = data.block.child
-            except Exception:
-                pass
-            value = [self.serialize(x, isinstance(x, ReadData) and x.block == array_scoped_block) for x in data.value]
+            value = self._pack_numbers(data.value)
+            if value is None:
+                value = [self._serialize_data(x, child_depth) for x in data.value]
         elif isinstance(data.value, bytes):
-            value = list(data.value)
+            value = (self._pack_typed_array(np.frombuffer(data.value, dtype=np.uint8))
+                     if len(data.value) >= self.typed_array_min_length
+                     else list(data.value))
         else:
             value = data.value
-        if skip_block_info:
-            return {
-                'block_class_mro': '__'.join(
-                    [x.__name__ for x in data.block.__class__.mro() if x.__name__ not in ['object', 'ABC']]),
-                'block_id': data.block_state['id'],
-                'editor_validators': data.block.get_editor_validators(data.block_state),
-                'value': value
-            }
+        schema_id = self._get_schema_id(data.block)
+        schema = self.schemas[schema_id]
+        if 'editor_validators' not in schema:
+            # validators need state, so they are added, when block is used by data node for the first time
+            schema['editor_validators'] = self._get_editor_validators(data.block, data.block_state)
         return {
-            'block_class_mro': '__'.join(
-                [x.__name__ for x in data.block.__class__.mro() if x.__name__ not in ['object', 'ABC']]),
-            'block': DataTransferSerializer._serialize_block(block=data.block),
+            'schema': schema_id,
             'block_id': data.block_state['id'],
-            'editor_validators': data.block.get_editor_validators(data.block_state),
             'value': value
         }
+
+    def serialize(self, data: ReadData, depth: Optional[int] = None) -> Dict:
+        return {
+            'data': self._serialize_data(data, depth),
+            'schemas': self.schemas,
+        }
+
+    def serialize_nodes(self, nodes: List[ReadData], depth: Optional[int] = None) -> Dict:
+        """
+         Serializes separate nodes, like nodes changed by undo. GUI puts them in place of loaded nodes by block id
+         """
+        return {
+            'data': [self._serialize_data(x, depth) for x in nodes],
+            'schemas': self.schemas,
+        }
+
+    def serialize_children(self, data: ReadData, offset: int, limit: int, depth: Optional[int] = None) -> Dict:
+        """
+         Serializes a page of array items (or compound fields) with given depth. Data is a list of items
+         """
+        children = list(data.value.values()) if isinstance(data.value, DataWrapper) else data.value
+        return {
+            'data': [self._serialize_data(x, depth) for x in children[offset:offset + limit]],
+            'schemas': self.schemas,
+        }
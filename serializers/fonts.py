@@ -11,7 +11,7 @@ class FfnFontSerializer(BaseFileSerializer):
         super().serialize(data, path, is_dir=True)
         image_serializer = BitmapSerializer()
         image_serializer.serialize(data.bitmap, os.path.join(path, 'bitmap'))
-        with open(os.path.join(path, 'font.fnt'), 'w') as file:
+        with open(self.register_artifact(os.path.join(path, 'font.fnt')), 'w') as file:
             file.write(f'info face="{data.id.split("/")[-1]}" size=24\n')
             file.write('common lineHeight=32\n')
             file.write(f'page id=0 file="bitmap.png"\n')
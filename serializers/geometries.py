@@ -1,52 +1,104 @@
 import json
 import math
 import os
-from collections import defaultdict
-from copy import deepcopy
+from copy import copy
 from string import Template
-from typing import Literal, List, Tuple
+from typing import Literal, List, Tuple, Dict
+
+import numpy as np
 
-from library.helpers.data_wrapper import DataWrapper
 from library.helpers.exceptions import BlockIntegrityException
 from library.read_data import ReadData
-from library.utils.blender_scripts import run_blender
-from library.utils.meshes import SubMesh
+from library.utils.blender_scripts import get_blender_load_meshes_script, run_blender
+from library.utils.gltf import GlbBuilder
+from library.utils.meshes import SubMesh, save_blender_meshes, write_obj
 from resources.eac.archives import ShpiBlock
 from resources.eac.bitmaps import AnyBitmapBlock
 from resources.eac.geometries import OripGeometry
 from serializers import BaseFileSerializer
+from serializers.misc.path_utils import escape_chars
 
 default_uvs = [(0, 0), (1, 0), (1, 1), (0, 1)]
 
 
-def _setup_vertex(model: SubMesh, block: ReadData[OripGeometry], vertices_file_indices_map, index_3D, index_2D,
-                  index_in_polygon):
-    try:
-        return vertices_file_indices_map[model][index_3D]
-    except KeyError:
-        pass
-    # new vertex creation
-    vertex = block.vertex_block[block.polygon_vertex_map_block[index_3D].value]
-    model.vertices.append([vertex.x.value, vertex.y.value, vertex.z.value])
-    vertices_file_indices_map[model][index_3D] = len(model.vertices) - 1
-    # setup texture coordinate
-    if index_2D is None:
-        model.scaled_uvs.add(len(model.vertex_uvs))
-        uv = DataWrapper({'u': default_uvs[index_in_polygon][0], 'v': default_uvs[index_in_polygon][1]})
-    else:
-        uv = DataWrapper({
-            'u': block.vertex_uvs_block[block.polygon_vertex_map_block[index_2D].value].u.value,
-            'v': block.vertex_uvs_block[block.polygon_vertex_map_block[index_2D].value].v.value,
-        })
-    model.vertex_uvs.append([uv.u, uv.v])
-    return vertices_file_indices_map[model][index_3D]
+# corners of triangles, built from ORIP polygon: front side triangles first, then back side ones. Triangle
+# polygon uses only the first front and the first back triangle
+_triangle_corners = np.array([[0, 1, 2], [0, 2, 1], [0, 0, 0], [0, 0, 0]])
+_quad_corners = np.array([[0, 1, 2], [0, 2, 3], [0, 2, 1], [0, 3, 2]])
+
+
+def _build_sub_models(data: ReadData[OripGeometry]) -> Dict[str, SubMesh]:
+    # one sub-model per texture name, in order of the first polygon with this texture. Vertices are shared by
+    # triangles of sub-model if they have the same offset in polygon_vertex_map_block, texture coordinates are taken
+    # from the first triangle corner, which uses the vertex
+    arrays = data.block.get_mesh_arrays(data)
+    polygon_types = arrays['polygon_types']
+    is_triangle = (polygon_types & (0xff >> 5)) == 3
+    is_quad = (polygon_types & (0xff >> 5)) == 4
+    # BURNT SIENNA prop has polygon with type 2. Looks good without this polygon
+    unknown_types = polygon_types[~is_triangle & ~is_quad & (polygon_types != 2)]
+    if len(unknown_types):
+        raise NotImplementedError(f'Unknown polygon: {unknown_types[0]}')
+
+    texture_names = np.array([x.file_name.value for x in data.texture_names_block], dtype=object)
+    names, texture_name_indexes = np.unique(texture_names, return_inverse=True)
+    polygon_models = texture_name_indexes.ravel()[arrays['texture_indexes']]
+    models, first_polygons = np.unique(polygon_models, return_index=True)
+    models = models[np.argsort(first_polygons)]
+
+    front = arrays['two_sided'] | ~arrays['flip_normal']
+    back = arrays['two_sided'] | arrays['flip_normal']
+    no_triangle = np.zeros_like(front)
+    triangles_mask = np.where(is_triangle[:, None],
+                              np.stack([front, back, no_triangle, no_triangle], axis=1),
+                              np.stack([front, front, back, back], axis=1) & is_quad[:, None])
+    triangle_polygons, triangle_slots = np.nonzero(triangles_mask)
+    corners = np.where(is_triangle[triangle_polygons, None], _triangle_corners[triangle_slots],
+                       _quad_corners[triangle_slots]).ravel()
+    corner_polygons = np.repeat(triangle_polygons, 3)
+    corner_models = polygon_models[corner_polygons]
+    corner_offsets_3d = arrays['offsets_3d'][corner_polygons] + corners
+
+    # unique vertices, sorted by sub-model, then by the first corner, which uses vertex
+    keys = corner_models * (corner_offsets_3d.max(initial=0) + 1) + corner_offsets_3d
+    _, first_corners, corner_vertices = np.unique(keys, return_index=True, return_inverse=True)
+    vertices_order = np.lexsort((first_corners, corner_models[first_corners]))
+    first_corners = first_corners[vertices_order]
+    vertex_models = corner_models[first_corners]
+    model_starts = np.searchsorted(vertex_models, np.arange(len(names) + 1))
+    vertex_indexes = np.empty_like(vertices_order)
+    vertex_indexes[vertices_order] = np.arange(len(vertices_order)) - model_starts[vertex_models]
+    triangles = vertex_indexes[corner_vertices.ravel()].reshape(-1, 3)
+
+    polygon_vertex_map = arrays['polygon_vertex_map']
+    vertices = arrays['vertices'][polygon_vertex_map[corner_offsets_3d[first_corners]]].tolist()
+    use_uv = arrays['use_uv'][corner_polygons[first_corners]]
+    uvs = np.array(default_uvs, dtype=np.int64)[corners[first_corners]]
+    uvs[use_uv] = arrays['vertex_uvs'][polygon_vertex_map[
+        arrays['offsets_2d'][corner_polygons[first_corners[use_uv]]] + corners[first_corners[use_uv]]]]
+    uvs = uvs.tolist()
+    default_uv_vertices = np.flatnonzero(~use_uv)
+
+    sub_models = {}
+    triangle_models = corner_models[::3]
+    for model in models.tolist():
+        sub_model = SubMesh()
+        sub_model.name = sub_model.texture_id = names[model]
+        start, end = model_starts[model], model_starts[model + 1]
+        sub_model.vertices = vertices[start:end]
+        sub_model.vertex_uvs = uvs[start:end]
+        sub_model.scaled_uvs = set((default_uv_vertices[(default_uv_vertices >= start)
+                                                        & (default_uv_vertices < end)] - start).tolist())
+        sub_model.polygons = triangles[triangle_models == model].tolist()
+        sub_models[names[model]] = sub_model
+    return sub_models
 
 
 class OripGeometrySerializer(BaseFileSerializer):
     blender_script = Template("""
 import json
 bpy.ops.wm.read_factory_settings(use_empty=True)
-bpy.ops.import_scene.obj(filepath="$obj_file_path", use_image_search=False, axis_forward='Y', axis_up='Z')
+$load_meshes_script
 
 dummies = json.loads('$dummies')
 for dummy in dummies:
@@ -60,6 +112,32 @@ for dummy in dummies:
 
     """)
 
+    def _save_glb(self, sub_models: Dict[str, SubMesh], dummies: List[Dict], textures_shpi_block, path: str):
+        # the same body.glb and body.meta as gg-web-engine export from blender produces, but without blender
+        builder = GlbBuilder()
+        for sub_model in sub_models.values():
+            if not sub_model.polygons:
+                continue
+            texture_path = os.path.join(path, 'assets', f'{escape_chars(sub_model.texture_id)}.png')
+            material = builder.add_material(sub_model.texture_id,
+                                            texture_path if os.path.exists(texture_path) else None)
+            builder.add_node(sub_model.name, mesh=sub_model.to_glb(builder, material, True, textures_shpi_block))
+        for dummy in dummies:
+            builder.add_node(dummy['name'], translation=dummy['position'],
+                             extras={key: value for key, value in dummy.items() if key not in ['position', 'name']})
+        builder.save(self.register_artifact(os.path.join(path, 'body.glb')))
+        with open(self.register_artifact(os.path.join(path, 'body.meta')), 'w') as f:
+            json.dump({
+                'curves': [],
+                'dummies': [{
+                    'name': dummy['name'],
+                    'position': dict(zip('xyz', dummy['position'])),
+                    'rotation': {'x': 0, 'y': 0, 'z': 0, 'w': 1},
+                    **{key: value for key, value in dummy.items() if key not in ['position', 'name']},
+                } for dummy in dummies],
+                'rigidBodies': [],
+            }, f)
+
     def serialize(self, data: ReadData[OripGeometry], path: str):
         # shpi is always next block
         from library import require_resource
@@ -73,47 +151,7 @@ for dummy in dummies:
             is_car = '.CFM__' in data.block_state['id']
         except:
             is_car = False
-        vertices_file_indices_map = defaultdict(lambda: dict())
-        sub_models = defaultdict(SubMesh)
-
-        for polygon in data.polygons_block:
-            polygon_type = polygon.polygon_type.value
-            mapping = polygon.mapping.value
-            texture_id = data.texture_names_block[polygon.texture_index.value].file_name.value
-            sub_model = sub_models[texture_id]
-            if not sub_model.name:
-                sub_model.name = texture_id
-                sub_model.texture_id = texture_id
-            offset_3D = polygon.offset_3d.value
-            offset_2D = polygon.offset_2d.value
-
-            def _setup_polygon(offsets):
-                sub_model.polygons.append([_setup_vertex(sub_model,
-                                                         data,
-                                                         vertices_file_indices_map,
-                                                         offset_3D + offset,
-                                                         (offset_2D + offset) if mapping['use_uv'] else None,
-                                                         offset)
-                                           for offset in offsets])
-
-            if (polygon_type & (0xff >> 5)) == 3:
-                # triangle
-                if mapping['two_sided'] or not mapping['flip_normal']:
-                    _setup_polygon([0, 1, 2])
-                if mapping['two_sided'] or mapping['flip_normal']:
-                    _setup_polygon([0, 2, 1])
-            elif (polygon_type & (0xff >> 5)) == 4:
-                # quad
-                if mapping['two_sided'] or not mapping['flip_normal']:
-                    _setup_polygon([0, 1, 2])
-                    _setup_polygon([0, 2, 3])
-                if mapping['two_sided'] or mapping['flip_normal']:
-                    _setup_polygon([0, 2, 1])
-                    _setup_polygon([0, 3, 2])
-            elif polygon_type == 2:  # BURNT SIENNA prop. looks good without this polygon
-                continue
-            else:
-                raise NotImplementedError(f'Unknown polygon: {polygon_type}')
+        sub_models = _build_sub_models(data)
         dummies = []
         if is_car:
             if self.settings.geometry__replace_car_wheel_with_dummies:
@@ -144,14 +182,19 @@ for dummy in dummies:
                         continue
                     if len(model.polygons) > 8:
                         # save non-wheel part of model (F512TR)
-                        model_without_wheels = deepcopy(model)
+                        # vertex lists are not modified in place, shallow copy is enough
+                        model_without_wheels = copy(model)
                         model_without_wheels.polygons = [p for p in model_without_wheels.polygons if
                                                          not get_wheel_polygon_key(p)]
+                        model_without_wheels.remove_degenerate_polygons()
                         model_without_wheels.remove_orphaned_vertices()
                         non_wheel_models[name] = model_without_wheels
                         # remove non wheel part from current model to process
                         model.polygons = [p for p in model.polygons if get_wheel_polygon_key(p)]
-                        model.remove_orphaned_vertices()
+                    # only positions of wheel vertices are used, wheel square can have duplicated vertices
+                    model.weld_vertices(respect_uvs=False)
+                    model.remove_degenerate_polygons()
+                    model.remove_orphaned_vertices()
                     wheel_polygons_map = {'fl': [], 'fr': [], 'rl': [], 'rr': []}
                     for polygon in model.polygons:
                         try:
@@ -181,41 +224,53 @@ for dummy in dummies:
             sub_model.change_axes(new_z='y', new_y='z')
         for dummy in dummies:
             dummy['position'] = [dummy['position'][0], dummy['position'][2], dummy['position'][1]]
-        with open(os.path.join(path, 'geometry.obj'), 'w') as f:
-            f.write('mtllib material.mtl')
-            face_index_increment = 1
-            for sub_model in sub_models.values():
-                f.write(sub_model.to_obj(face_index_increment, True, textures_shpi_block))
-                face_index_increment += len(sub_model.vertices)
-        with open(os.path.join(path, 'material.mtl'), 'w') as f:
-            for texture in textures_shpi_block.children:
-                if not isinstance(texture, ReadData) or not isinstance(texture.block, AnyBitmapBlock):
-                    continue
-                f.write(f"""\n\nnewmtl {texture.id.split('/')[-1]}
+        from serializers import ShpiArchiveSerializer
+        shpi_serializer = ShpiArchiveSerializer()
+        shpi_serializer.serialize(textures_shpi_block, os.path.join(path, 'assets/'))
+        if self.settings.geometry__save_obj:
+            with open(self.register_artifact(os.path.join(path, 'geometry.obj')), 'w') as f:
+                f.write('mtllib material.mtl')
+                write_obj(f, list(sub_models.values()), multiply_uvws=True, textures_shpi_block=textures_shpi_block,
+                          float_precision=self.settings.geometry__obj_float_precision)
+            with open(self.register_artifact(os.path.join(path, 'material.mtl')), 'w') as f:
+                for texture in textures_shpi_block.children:
+                    if not isinstance(texture, ReadData) or not isinstance(texture.block, AnyBitmapBlock):
+                        continue
+                    f.write(f"""\n\nnewmtl {texture.id.split('/')[-1]}
 Ka 1.000000 1.000000 1.000000
 Kd 1.000000 1.000000 1.000000
 Ks 0.000000 0.000000 0.000000
 illum 1
 Ns 0.000000
 map_Kd assets/{texture.id.split('/')[-1]}.png""")
-        from serializers import ShpiArchiveSerializer
-        shpi_serializer = ShpiArchiveSerializer()
-        shpi_serializer.serialize(textures_shpi_block, os.path.join(path, 'assets/'))
-        script = self.blender_script.substitute({'obj_file_path': 'geometry.obj',
-                                                 'is_car': is_car,
-                                                 'dummies': json.dumps(dummies)})
-        if self.settings.geometry__export_to_gg_web_engine:
-            from serializers.misc.build_blender_scene import construct_blender_export_script
-            script += '\n' + construct_blender_export_script(
-                file_name=os.path.join(os.getcwd(), path, 'body'),
-                export_materials='EXPORT')
-        # skip running blender if it does not save anything
-        if self.settings.geometry__export_to_gg_web_engine or self.settings.geometry__save_blend:
-            run_blender(path=path,
-                        script=script,
-                        out_blend_name=os.path.join(os.getcwd(), path, 'body')
-                        if self.settings.geometry__save_blend
-                        else None)
-        if not self.settings.geometry__save_obj:
-            os.unlink(os.path.join(path, 'material.mtl'))
-            os.unlink(os.path.join(path, 'geometry.obj'))
+        # skip exporting if it does not save anything
+        if not (self.settings.geometry__export_to_gg_web_engine or self.settings.geometry__save_blend):
+            pass
+        elif not self.settings.geometry__use_blender:
+            self._save_glb(sub_models, dummies, textures_shpi_block, path)
+        else:
+            save_blender_meshes(os.path.join(path, 'geometry.npz'), list(sub_models.values()),
+                                {x.texture_id: f'assets/{escape_chars(x.texture_id)}.png'
+                                 for x in sub_models.values() if x.texture_id},
+                                True, textures_shpi_block)
+            script = self.blender_script.substitute({
+                'load_meshes_script': get_blender_load_meshes_script(['geometry.npz']),
+                'dummies': json.dumps(dummies),
+            })
+            if self.settings.geometry__export_to_gg_web_engine:
+                from serializers.misc.build_blender_scene import construct_blender_export_script
+                script += '\n' + construct_blender_export_script(
+                    file_name=os.path.join(os.getcwd(), path, 'body'),
+                    export_materials='EXPORT')
+            try:
+                run_blender(path=path,
+                            script=script,
+                            out_blend_name=os.path.join(os.getcwd(), path, 'body')
+                            if self.settings.geometry__save_blend
+                            else None)
+            finally:
+                os.unlink(os.path.join(path, 'geometry.npz'))
+            # blender is optional, so files are checked
+            for file_name in ['body.blend', 'body.glb', 'body.meta']:
+                if os.path.exists(os.path.join(path, file_name)):
+                    self.register_artifact(os.path.join(path, file_name))
@@ -27,5 +27,5 @@ class JsonSerializer(BaseFileSerializer):
     def serialize(self, data: ReadData, path: str):
         super().serialize(data, path, is_dir=False)
         json_str = json.dumps(self.__make_dict(data), indent=4)
-        with open(f'{path}.json', 'w') as file:
+        with open(self.register_artifact(f'{path}.json'), 'w') as file:
             file.write(json_str)
@@ -1,16 +1,19 @@
 import json
 import math
 import os
-from copy import deepcopy
 from string import Template
 from typing import List, Dict
 
+import numpy as np
+
 from library.helpers.data_wrapper import DataWrapper
-from library.helpers.json import resource_to_json
 from library.read_data import ReadData
-from library.utils.blender_scripts import get_blender_save_script, run_blender
-from library.utils.meshes import SubMesh
-from resources.eac.maps import RoadSplinePoint, TriMap
+from library.utils.blender_scripts import get_blender_load_meshes_script, get_blender_save_script, \
+    run_blender
+from library.utils.gltf import GlbBuilder
+from library.utils.meshes import SubMesh, build_boxes, save_blender_meshes, write_obj
+from library.utils.polylines import simplify_polyline
+from resources.eac.maps import TriMap
 from serializers import BaseFileSerializer
 
 
@@ -40,6 +43,22 @@ class TriMapSerializer(BaseFileSerializer):
                                self.points[i + 1][1 if self.z_up else 2] - self.points[i][1 if self.z_up else 2])
                     for i in range(len(self.points) - 1)]
 
+        def build_wall_boxes(self, is_left):
+            """
+             Builds collision boxes of invisible wall along Z-up path as one mesh. Returns vertices and triangles
+             numpy arrays, see build_boxes
+             """
+            middle_points, lengths, orientations = self.middle_points, self.lengths, self.orientations
+            locations, scales, rotations = [], [], []
+            for i in range(len(middle_points)):
+                rotation = orientations[i] + (math.pi if is_left else 0)
+                locations.append((middle_points[i][0] + math.cos(rotation),
+                                  middle_points[i][1] - math.sin(rotation),
+                                  self.points[i][2] + 100))
+                scales.append((1, lengths[i] / 2, 125))
+                rotations.append(-orientations[i])
+            return build_boxes(locations, scales, rotations)
+
         def fix_angle(self, angle):
             while angle > math.pi:
                 angle -= 2 * math.pi
@@ -47,93 +66,64 @@ class TriMapSerializer(BaseFileSerializer):
                 angle += 2 * math.pi
             return angle
 
-        def optimize(self):
+        def optimize(self, tolerance: float = 0.3):
+            # tolerance is in meters, 30cm by default
             orientations = self.orientations
             lengths = self.lengths
             delta_angles = [abs(math.sin(orientations[i] - orientations[i + 1]) * (lengths[i] + lengths[i + 1]))
                             for i in range(len(orientations) - 1)]
-            if self.is_closed:
+            if self.is_closed and delta_angles:
                 # make the most valuable angle as break
                 break_delta_angle = abs(self.fix_angle(orientations[-1] - orientations[0]))
                 max_delta_angle = max(delta_angles)
                 if max_delta_angle > break_delta_angle:
                     index = delta_angles.index(max_delta_angle)
                     self.points = self.points[index + 1:] + self.points[:index + 2]
-                    orientations = self.orientations
-                    lengths = self.lengths
-                    delta_angles = [abs(math.sin(orientations[i] - orientations[i + 1]) * (lengths[i] + lengths[i + 1]))
-                                    for i in range(len(orientations) - 1)]
-            while True:
-                min_delta_angle = min(delta_angles)
-                if min_delta_angle > 0.3:  # 30cm threshold
-                    break
-                index = delta_angles.index(min_delta_angle)
-                self.points = self.points[:index + 1] + self.points[index + 2:]
-                orientations = self.orientations
-                lengths = self.lengths
-                delta_angles = [abs(math.sin(orientations[i] - orientations[i + 1]) * (lengths[i] + lengths[i + 1]))
-                                for i in range(len(orientations) - 1)]
-
-    class TerrainChunk:
-
-        def get_fence_height(self, fence_texture_name):
-            try:
-                # TODO determine where to get fence height from resource file
-                # resource = self.tri_block.fam.resources[0]
-                # for path in fence_texture_name.split('/'):
-                #     resource = resource.get_resource_by_name(path)
-                if self.tri_block.id.split('/')[-1][:3] in ['TR1', 'TR3']:
-                    # TR1 texture height == 64; TR3: 51
-                    return 1
-                elif self.tri_block.id.split('/')[-1][:3] in ['AL1', 'TR2', 'TR6']:
-                    return 2  # TR2 95; TR6: 65; AL1: 64
-                elif self.tri_block.id.split('/')[-1][:3] in ['TR7']:
-                    return 1.5  # TR7: 47
-                # didn't test other tracks
-                return 1
-            except:
-                return 1
+            self.points = simplify_polyline(self.points, tolerance, axes=(0, 1 if self.z_up else 2))
+
+    class TerrainBuilder:
+        """
+         Builds terrain meshes of all chunks at once. Vertices of all chunks are kept in (N, 4, 11, 3) arrays, see
+         the matrix in _read_matrix. Chunk meshes are taken from it with index templates, lane split/merge and
+         tunnels are handled as edits of matrix rows and vertex indices
+         """
+
+        # mapping of spline item mode to columns of the first polygon (tunnels in Vertigo Ridge and Coastal #2).
+        # Columns mapped as follows:
+        # A10   A9  A8  A7  A6  A0  A1  A2  A3  A4  A5
+        # 0     1   2   3   4   5   6   7   8   9   10
+        tunnel_columns = {
+            'left_tunnel_A4_A7': (9, 3),
+            'left_tunnel_A4_A8': (9, 2),
+            'left_tunnel_A5_A8': (10, 2),
+            'right_tunnel_A9_A2': (1, 7),
+        }
 
-        def __init__(self, tri_block):
+        def __init__(self, tri_block, is_opened_track):
             self.tri_block = tri_block
-            self.next_chunk = None
-            self.matrix = None
-            self.fence_texture_name = None
-            self.has_left_fence = False
+            self.is_opened_track = is_opened_track
+            self.track_prefix = tri_block.id.split('/')[-1][:3]
             self.left_fence_polygon_index = 3
             # FIXME hardcode
-            if self.tri_block.id.split('/')[-1][:3] == 'TR3':
+            if self.track_prefix == 'TR3':
                 self.left_fence_polygon_index = 2
-            self.has_right_fence = False
             self.right_fence_polygon_index = 7
-            self.lane_merge_initiated = False
+            self._templates = {}
 
-        # for lane split and merge chunks. Happens in TNFS open tracks
-        # pure magic. No idea how I wrote it
-        def _make_vertex_offset(self, build_matrix_row, vertex_to_remove, vertex_to_duplicate, com_matrix_row):
-            build_matrix_row = row = (build_matrix_row[:vertex_to_remove]
-                                      + build_matrix_row[vertex_to_remove + 1:vertex_to_duplicate + 1]
-                                      + build_matrix_row[vertex_to_duplicate:])
-            # add a tiny offset for duplicated vertex so polygon will be rendered correctly
-            row[vertex_to_duplicate - 1] = deepcopy(row[vertex_to_duplicate - 1])
-            for i in ['x', 'y', 'z']:
-                row[vertex_to_duplicate - 1][i] = row[vertex_to_duplicate - 1][i] * 0.99 + row[vertex_to_duplicate - 2][
-                    i] * 0.01
-            # fix vertex position in default matrix to omit holes in chunk connection (second point was removed from build matrix)
-            row = com_matrix_row
-            distance_to_left_vertex = math.sqrt(
-                sum((row[vertex_to_remove][i] - row[vertex_to_remove - 1][i]) ** 2 for i in ['x', 'y', 'z']))
-            distance_to_right_vertex = math.sqrt(
-                sum((row[vertex_to_remove][i] - row[vertex_to_remove + 1][i]) ** 2 for i in ['x', 'y', 'z']))
-            left_right_factor = distance_to_left_vertex / (distance_to_left_vertex + distance_to_right_vertex)
-            # now vertex will be located on the straight line between neighbour vertices
-            row[vertex_to_remove] = DataWrapper({
-                i: row[vertex_to_remove - 1][i] * (1 - left_right_factor) + row[vertex_to_remove + 1][
-                    i] * left_right_factor
-                for i in ['x', 'y', 'z']})
-            return build_matrix_row, com_matrix_row
-
-        def read_matrix(self, rows, reference_points: List[RoadSplinePoint]):
+        def get_fence_height(self, fence_texture_name):
+            # TODO determine where to get fence height from resource file
+            if self.track_prefix in ['TR1', 'TR3']:
+                # TR1 texture height == 64; TR3: 51
+                return 1
+            elif self.track_prefix in ['AL1', 'TR2', 'TR6']:
+                return 2  # TR2 95; TR6: 65; AL1: 64
+            elif self.track_prefix in ['TR7']:
+                return 1.5  # TR7: 47
+            # didn't test other tracks
+            return 1
+
+        @staticmethod
+        def _read_matrix(rows: np.ndarray, positions: np.ndarray) -> np.ndarray:
             # This matrix from http://auroux.free.fr/nfs/nfsspecs.txt :
             # D10   D9   D8   D7   D6   D0   D1   D2   D3   D4   D5  node 4n+3
             # |  T |  T |  T |  T |  T || T  | T  | T  | T  | T  |
@@ -145,131 +135,129 @@ class TriMapSerializer(BaseFileSerializer):
             # |    |    |    |    |    ||    |    |    |    |    |
             # |    |    |    |    |    ||    |    |    |    |    |
             # A10---A9---A8---A7---A6---A0---A1---A2---A3---A4---A5  node 4n
-            self.reference_points = reference_points
-            self.matrix = [None] * 4
-            for row_index in range(4):
-                A0 = rows[row_index][0]
-                A0.x += reference_points[row_index].position.x
-                A0.y += reference_points[row_index].position.y
-                A0.z += reference_points[row_index].position.z
-
-                A15 = [rows[row_index][i + 1] for i in range(5)]
-                A610 = [rows[row_index][i + 6] for i in range(5)]
-                # Each point is relative to the previous point
-                for i in range(5):
-                    for j in ['x', 'y', 'z']:
-                        A15[i][j] += A0[j] if i == 0 else A15[i - 1][j]
-                        A610[i][j] += A0[j] if i == 0 else A610[i - 1][j]
-                A610.reverse()
-                self.matrix[3 - row_index] = A610 + [A0] + A15
-            self.build_matrix = deepcopy(self.matrix)
-            for row_index in range(4):
-                if reference_points[row_index].spline_item_mode == 'lane_split':
-                    self.build_matrix[3 - row_index], self.matrix[3 - row_index] = self._make_vertex_offset(
-                        self.build_matrix[3 - row_index],
-                        2, 6,
-                        self.matrix[3 - row_index]
-                    )
-                elif reference_points[row_index].spline_item_mode == 'lane_merge':
+            # rows: (N, 4, 11, 3) as in file, positions: (N, 4, 3) of road spline points.
+            # Returns (N, 4, 11, 3), where rows are in reversed order (D, C, B, A) and columns as on the picture
+            A0 = rows[:, :, 0] + positions
+            # Each point is relative to the previous point. cumsum adds sequentially, so result is the same as
+            # adding points one by one
+            A05 = np.cumsum(np.concatenate([A0[:, :, None], rows[:, :, 1:6]], axis=2), axis=2)
+            A0610 = np.cumsum(np.concatenate([A0[:, :, None], rows[:, :, 6:11]], axis=2), axis=2)
+            return np.ascontiguousarray(np.concatenate([A0610[:, :, :0:-1], A05], axis=2)[:, ::-1])
+
+        # for lane split and merge chunks. Happens in TNFS open tracks
+        # pure magic. No idea how I wrote it
+        @staticmethod
+        def _make_vertex_offset(build_matrix_row, vertex_to_remove, vertex_to_duplicate, com_matrix_row):
+            row = np.concatenate([build_matrix_row[:vertex_to_remove],
+                                  build_matrix_row[vertex_to_remove + 1:vertex_to_duplicate + 1],
+                                  build_matrix_row[vertex_to_duplicate:]])
+            # add a tiny offset for duplicated vertex so polygon will be rendered correctly
+            row[vertex_to_duplicate - 1] = row[vertex_to_duplicate - 1] * 0.99 + row[vertex_to_duplicate - 2] * 0.01
+            # fix vertex position in default matrix (in place) to omit holes in chunk connection (second point was
+            # removed from build matrix)
+            distance_to_left_vertex = math.sqrt(sum(
+                x ** 2 for x in (com_matrix_row[vertex_to_remove] - com_matrix_row[vertex_to_remove - 1]).tolist()))
+            distance_to_right_vertex = math.sqrt(sum(
+                x ** 2 for x in (com_matrix_row[vertex_to_remove] - com_matrix_row[vertex_to_remove + 1]).tolist()))
+            left_right_factor = distance_to_left_vertex / (distance_to_left_vertex + distance_to_right_vertex)
+            # now vertex will be located on the straight line between neighbour vertices
+            com_matrix_row[vertex_to_remove] = (com_matrix_row[vertex_to_remove - 1] * (1 - left_right_factor)
+                                                + com_matrix_row[vertex_to_remove + 1] * left_right_factor)
+            return row
+
+        def _get_templates(self, rows_count):
+            # polygons and UVs of terrain sub-model only depend on amount of matrix rows
+            try:
+                return self._templates[rows_count]
+            except KeyError:
+                pass
+            polygons = [[i, rows_count + i, 1 + i, rows_count + i, rows_count + 1 + i, 1 + i]
+                        for i in range(rows_count - 1)]
+            uvs_forward = [[(x % rows_count) / 2, 0 if x < rows_count else 1] for x in range(rows_count * 2)]
+            uvs_backward = [[(x % rows_count) / 2, 1 if x < rows_count else 0] for x in range(rows_count * 2)]
+            self._templates[rows_count] = polygons, uvs_forward, uvs_backward
+            return self._templates[rows_count]
+
+        def build(self, rows: np.ndarray, positions: np.ndarray, modes: List[str], chunks: List[Dict]):
+            """
+             Builds meshes of all terrain chunks. Chunk is a dict with texture_names and fence info, meshes are saved
+             to it under 'meshes' key
+             """
+            matrix = self._read_matrix(rows, positions)
+            build_matrix = matrix.copy()
+            lane_merges = np.zeros(len(chunks), dtype=bool)
+            for index in range(len(chunks) * 4):
+                chunk_index, row_index = divmod(index, 4)
+                if modes[index] == 'lane_split':
+                    build_matrix[chunk_index, 3 - row_index] = self._make_vertex_offset(
+                        build_matrix[chunk_index, 3 - row_index], 2, 6, matrix[chunk_index, 3 - row_index])
+                elif modes[index] == 'lane_merge':
                     assert row_index == 0, Exception('Unexpected lane merge position!')
-                    self.lane_merge_initiated = True
-
-        def build_models(self, counter, texture_names):
-            matrix = deepcopy(self.build_matrix)
-            if self.next_chunk:
-                matrix = [self.next_chunk.matrix[-1]] + matrix
-                if self.lane_merge_initiated:
-                    matrix[0], self.next_chunk.build_matrix[3] = self._make_vertex_offset(
-                        matrix[0],
-                        3, 6,
-                        self.next_chunk.build_matrix[3]
-                    )
+                    lane_merges[chunk_index] = True
+            for chunk_index, chunk in enumerate(chunks):
+                next_index = chunk_index + 1 if chunk_index < len(chunks) - 1 else (None if self.is_opened_track else 0)
+                chunk_matrix = build_matrix[chunk_index].copy()
+                if next_index is not None:
+                    first_row = matrix[next_index, 3]
+                    if lane_merges[chunk_index]:
+                        # affects build matrix of next chunk, it is built on next iteration
+                        first_row = self._make_vertex_offset(first_row, 3, 6, build_matrix[next_index, 3])
+                    chunk_matrix = np.concatenate([first_row[None], chunk_matrix])
+                chunk['meshes'] = self._build_models(chunk_index, chunk, chunk_matrix, modes)
+                fence_matrix = matrix[chunk_index]
+                if next_index is not None:
+                    fence_matrix = np.concatenate([matrix[next_index, 3:], fence_matrix])
+                if chunk['has_left_fence']:
+                    chunk['meshes'].append(self._build_fence(chunk_index, chunk, fence_matrix,
+                                                             self.left_fence_polygon_index))
+                if chunk['has_right_fence']:
+                    chunk['meshes'].append(self._build_fence(chunk_index, chunk, fence_matrix,
+                                                             self.right_fence_polygon_index))
+
+        def _build_models(self, counter, chunk, matrix, modes):
+            rows_count = len(matrix)
+            # vertices of sub-model i: matrix column i, then column i + 1
+            vertices = np.concatenate([matrix[:, :-1], matrix[:, 1:]]).transpose(1, 0, 2)
+            for j in range(5):
+                # we have 4 points, but 5 items in matrix. last should obey mode of 4th point
+                columns = self.tunnel_columns.get(modes[counter * 4 + min(j, 3)])
+                if columns:
+                    vertices[0, j] = matrix[j, columns[0]]
+                    vertices[0, j + 5] = matrix[j, columns[1]]
+            vertices = vertices.tolist()
+            polygons, uvs_forward, uvs_backward = self._get_templates(rows_count)
             models = []
             for i in range(10):
-                inverted_matrix = [list(x) for x in zip(*matrix)]
                 model = SubMesh()
-                model.vertices = [[v.x, v.y, v.z] for v in sum(inverted_matrix[i:i + 2], [])]
-                # in some cases, first polygon is placed differently (tunnels in Vertigo Ridge and Coastal #2)
-                if i == 0:
-                    for j in range(5):
-                        vertices_matrix_indices = 0, 1
-                        # we have 4 points, but 5 items in matrix. last should obey mode of 4th point
-                        mode = self.reference_points[min(j, 3)].spline_item_mode
-                        # matrix_indices mapped as follows:
-                        # A10   A9  A8  A7  A6  A0  A1  A2  A3  A4  A5
-                        # 0     1   2   3   4   5   6   7   8   9   10
-                        if mode == 'left_tunnel_A4_A7':
-                            vertices_matrix_indices = 9, 3
-                        if mode == 'left_tunnel_A4_A8':
-                            vertices_matrix_indices = 9, 2
-                        elif mode == 'left_tunnel_A5_A8':
-                            vertices_matrix_indices = 10, 2
-                        elif mode == 'right_tunnel_A9_A2':
-                            vertices_matrix_indices = 1, 7
-                        if vertices_matrix_indices != (0, 1):
-                            model.vertices[j] = [
-                                inverted_matrix[vertices_matrix_indices[0]][j].x,
-                                inverted_matrix[vertices_matrix_indices[0]][j].y,
-                                inverted_matrix[vertices_matrix_indices[0]][j].z
-                            ]
-                            model.vertices[j + 5] = [
-                                inverted_matrix[vertices_matrix_indices[1]][j].x,
-                                inverted_matrix[vertices_matrix_indices[1]][j].y,
-                                inverted_matrix[vertices_matrix_indices[1]][j].z,
-                            ]
-                model.polygons = [
-                    [0, int(len(model.vertices) / 2), 1],
-                    [int(len(model.vertices) / 2), int(len(model.vertices) / 2) + 1, 1],
-                    [1, int(len(model.vertices) / 2) + 1, 2],
-                    [int(len(model.vertices) / 2) + 1, int(len(model.vertices) / 2) + 2, 2],
-                ]
-                model.polygons = [[i, int(len(model.vertices) / 2) + i, 1 + i] + [int(len(model.vertices) / 2) + i,
-                                                                                  int(len(model.vertices) / 2) + 1 + i,
-                                                                                  1 + i] for i in
-                                  range(int(len(model.vertices) / 2) - 1)]
-                model.vertex_uvs = [[
-                    (x % int(len(model.vertices) / 2)) / 2,
-                    (0 if x < int(len(model.vertices) / 2) else 1) if i < int(len(model.vertices) / 2) else (
-                        1 if x < int(len(model.vertices) / 2) else 0)
-                ] for x in range(len(model.vertices))]
-                model.texture_id = texture_names[i - 5 if i >= 5 else 9 - i]
+                model.vertices = vertices[i]
+                model.polygons = [list(x) for x in polygons]
+                model.vertex_uvs = [list(x) for x in (uvs_forward if i < rows_count else uvs_backward)]
+                model.texture_id = chunk['texture_names'][i - 5 if i >= 5 else 9 - i]
                 model.name = f'terrain_chunk_{counter}_{i}_{model.texture_id}'
                 models.append(model)
-            if self.has_left_fence:
-                models.append(self.build_fence(counter, self.left_fence_polygon_index))
-            if self.has_right_fence:
-                models.append(self.build_fence(counter, self.right_fence_polygon_index))
             return models
 
-        def build_fence(self, counter, index):
+        def _build_fence(self, counter, chunk, matrix, index):
             is_left = index < 5
-            matrix = deepcopy(self.matrix)
-            if self.next_chunk:
-                matrix = [self.next_chunk.matrix[-1]] + matrix
+            road_points = matrix[:, index]
+            # shift a bit (20cm) fence to fix z-fighting specifically on transtropolis track.
+            # It has vertical walls, intersecting with fence
+            # FIXME remove this after finding a way to render with custom z-buffer, required for NFS1 wheels
+            if self.track_prefix == 'TR7':
+                neighbour_points = matrix[:, index + 1 if is_left else index - 1]
+                offsets = neighbour_points - road_points
+                koef = (0.2 / np.sqrt(offsets[:, 0] ** 2 + offsets[:, 1] ** 2 + offsets[:, 2] ** 2))[:, None]
+                road_points = road_points * (1 - koef) + neighbour_points * koef
+            top_points = road_points.copy()
+            top_points[:, 1] = road_points[:, 1] + self.get_fence_height(chunk['fence_texture_name'])
             model = SubMesh()
-            for i in range(len(matrix)):
-                road_point = matrix[i][index]
-                # shift a bit (20cm) fence to fix z-fighting specifically on transtropolis track.
-                # It has vertical walls, intersecting with fence
-                # FIXME remove this after finding a way to render with custom z-buffer, required for NFS1 wheels
-                if self.tri_block.id.split('/')[-1][:3] == 'TR7':
-                    neighbour_point = matrix[i][index + 1 if is_left else index - 1]
-                    distance = math.sqrt(sum(pow(neighbour_point[c] - road_point[c], 2) for c in ['x', 'y', 'z']))
-                    koef = 0.2 / distance
-                    road_point = DataWrapper(
-                        {c: road_point[c] * (1 - koef) + neighbour_point[c] * koef for c in ['x', 'y', 'z']})
-                model.vertices.append([road_point.x, road_point.y, road_point.z])
-                model.vertices.append(
-                    [road_point.x, road_point.y + self.get_fence_height(self.fence_texture_name), road_point.z])
+            model.vertices = np.stack([road_points, top_points], axis=1).reshape(-1, 3).tolist()
             for i in range(len(matrix) - 1):
                 model.polygons.append([i * 2, i * 2 + 1, i * 2 + 3])
                 model.polygons.append([i * 2 + 2, i * 2, i * 2 + 3])
-            model.vertex_uvs = [[
-                math.floor(x / 2),
-                0 if x % 2 == 1 else 1
-            ] for x in range(len(model.vertices))]
-            model.texture_id = self.fence_texture_name
-            model.name = f'terrain_chunk_{counter}_{"left" if is_left else "right"}fence_{self.fence_texture_name}'
+            model.vertex_uvs = [[x // 2, 0 if x % 2 == 1 else 1] for x in range(len(model.vertices))]
+            model.texture_id = chunk['fence_texture_name']
+            model.name = f'terrain_chunk_{counter}_{"left" if is_left else "right"}fence_{chunk["fence_texture_name"]}'
             return model
 
     blender_map_script = Template("""
@@ -327,34 +315,24 @@ o.rotation_quaternion = Euler((player_start_position['rotation_x'], 0, 0), 'XYZ'
 # barriers collisions
 if $save_invisible_wall_collisions:
     print('defining wall collisions...')
-    left_barrier = json.loads('$left_barrier')
-    right_barrier = json.loads('$right_barrier')
-    wall_cube_names = []
-    for barrier in [left_barrier, right_barrier]:
-        if not barrier:
+    for name, wall in [('wall_collision_left', json.loads('$left_wall')),
+                       ('wall_collision_right', json.loads('$right_wall'))]:
+        if not wall:
             continue
-        for i in range(len(barrier['middle_points'])):
-            rotation = barrier['orientations'][i]
-            if barrier == left_barrier:
-                rotation += math.pi
-            bpy.ops.mesh.primitive_cube_add(location=(
-                                                barrier['middle_points'][i][0] + math.cos(rotation),
-                                                barrier['middle_points'][i][1] - math.sin(rotation),
-                                                barrier['points'][i][2] + 100),
-                                            scale=(1, barrier['lengths'][i] / 2, 125),
-                                            rotation=(0, 0, -barrier['orientations'][i]))
-            cube = bpy.data.objects['Cube']
-            cube.name = f"wall_collision_{'left' if barrier == left_barrier else 'right'}_{i}"
-            cube.hide_render = True
-            cube.display_bounds_type = 'BOX'
-            cube.display_type = 'BOUNDS'
-            wall_cube_names.append(cube.name)
-    bpy.ops.object.select_all(action='DESELECT')
-    for name in wall_cube_names:
-        bpy.data.objects[name].select_set(True)
-    bpy.ops.rigidbody.objects_add(type='PASSIVE')
-    for obj in bpy.context.selected_objects:
-        obj.rigid_body.collision_shape = 'BOX'
+        # all boxes of the side are built in python as one mesh: creating them one by one with operators is too slow
+        mesh = bpy.data.meshes.new(name)
+        mesh.from_pydata([wall['vertices'][i:i + 3] for i in range(0, len(wall['vertices']), 3)], [],
+                         [wall['triangles'][i:i + 3] for i in range(0, len(wall['triangles']), 3)])
+        mesh.update()
+        wall_object = bpy.data.objects.new(name, mesh)
+        bpy.context.collection.objects.link(wall_object)
+        wall_object.hide_render = True
+        wall_object.display_type = 'WIRE'
+        bpy.ops.object.select_all(action='DESELECT')
+        wall_object.select_set(True)
+        bpy.context.view_layer.objects.active = wall_object
+        bpy.ops.rigidbody.object_add(type='PASSIVE')
+        wall_object.rigid_body.collision_shape = 'MESH'
     """)
 
     blender_chunk_script = Template("""
@@ -364,7 +342,7 @@ from mathutils import Euler
 
 if $new_file:
     bpy.ops.wm.read_factory_settings(use_empty=True)
-bpy.ops.import_scene.obj(filepath="$obj_name", use_image_search=False, axis_forward='Y', axis_up='Z')
+load_meshes("$meshes_file_name")
 
 # create proxy objects
 proxy_objects = json.loads('$proxy_objects_json')
@@ -414,21 +392,8 @@ if $save_terrain_collisions:
         return [f"{tex_id + i}/0000" if is_opened_track else f"0/{str(tex_id + i).rjust(2, '0')}00"
                 for i in range(max(frame_count, 1))]
 
-    def _proxy_object_instance_json(self, data: ReadData[TriMap], instance, is_opened_track,
-                                    use_local_coordinates) -> Dict:
-        proxy_definition = data.proxy_objects[instance.proxy_object_index.value % len(data.proxy_objects)]
-        spline_index = instance.reference_road_spline_vertex.value
-        road_spline_vertex = data.road_spline[spline_index]
-        res = {
-            'x': instance.position.x.value + road_spline_vertex.position.x.value,
-            'y': instance.position.y.value + road_spline_vertex.position.y.value,
-            'z': instance.position.z.value + road_spline_vertex.position.z.value,
-            'rotation_z': instance.rotation.value + road_spline_vertex.orientation.value,
-            'type': proxy_definition.type.value
-        }
-        if use_local_coordinates:
-            for axis in ['x', 'y', 'z']:
-                res[axis] -= getattr(data.road_spline[spline_index - (spline_index % 4)].position, axis).value
+    def _proxy_object_json(self, proxy_definition, is_opened_track) -> Dict:
+        res = {'type': proxy_definition.type.value}
         if res['type'] == 'model':
             res = {
                 **res,
@@ -462,11 +427,40 @@ if $save_terrain_collisions:
             }
         return res
 
+    def _proxy_object_instance_json(self, data: ReadData[TriMap], instance, proxy_definitions: List[Dict],
+                                    use_local_coordinates) -> Dict:
+        spline_index = instance.reference_road_spline_vertex.value
+        road_spline_vertex = data.road_spline[spline_index]
+        res = {
+            'x': instance.position.x.value + road_spline_vertex.position.x.value,
+            'y': instance.position.y.value + road_spline_vertex.position.y.value,
+            'z': instance.position.z.value + road_spline_vertex.position.z.value,
+            'rotation_z': instance.rotation.value + road_spline_vertex.orientation.value,
+        }
+        if use_local_coordinates:
+            for axis in ['x', 'y', 'z']:
+                res[axis] -= getattr(data.road_spline[spline_index - (spline_index % 4)].position, axis).value
+        return {**res, **proxy_definitions[instance.proxy_object_index.value % len(proxy_definitions)]}
+
+    def _proxy_objects_json(self, data: ReadData[TriMap], is_opened_track, use_local_coordinates) -> List[List[Dict]]:
+        """
+         Returns proxy object instances, grouped by terrain chunk. If local coordinates are not used, returns single
+         group of all instances in the order of file
+         """
+        proxy_definitions = [self._proxy_object_json(x, is_opened_track) for x in data.proxy_objects]
+        instances_by_chunk = data.block.get_proxy_object_instances_by_chunk(data)
+        if not use_local_coordinates:
+            instances_by_chunk = [sorted(index for chunk in instances_by_chunk for index in chunk)]
+        return [[self._proxy_object_instance_json(data, data.proxy_object_instances[index], proxy_definitions,
+                                                  use_local_coordinates)
+                 for index in chunk]
+                for chunk in instances_by_chunk]
+
     def _save_mtl(self, terrain_data, path: str, name):
-        with open(os.path.join(path, 'terrain.mtl'), 'w') as f:
+        with open(self.register_artifact(os.path.join(path, 'terrain.mtl')), 'w') as f:
             texture_names = list(set(
                 sum([x['texture_names'] for x in terrain_data], [])
-                + [x['chunk'].fence_texture_name for x in terrain_data if x['chunk'].fence_texture_name]
+                + [x['fence_texture_name'] for x in terrain_data if x['fence_texture_name']]
             ))
             texture_names.sort()
             for texture_name in texture_names:
@@ -476,7 +470,195 @@ if $save_terrain_collisions:
         Ks 0.000000 0.000000 0.000000
         illum 1
         Ns 0.000000
-        map_Kd ../../ETRACKFM/{name[:3]}_001.FAM/background/{texture_name}.png""")
+        map_Kd {self._terrain_texture_path(name, texture_name)}""")
+
+    @staticmethod
+    def _terrain_texture_path(name, texture_name):
+        return f'../../ETRACKFM/{name[:3]}_001.FAM/background/{texture_name}.png'
+
+    def _save_obj(self, data: ReadData[TriMap], terrain_data, path: str):
+        float_precision = self.settings.geometry__obj_float_precision
+        if self.settings.maps__save_as_chunked:
+            for i, terrain_chunk in enumerate(terrain_data):
+                chunk_path = self.register_artifact(os.path.join(path, f'terrain_chunk_{i}.obj'))
+                with open(chunk_path, 'w') as f:
+                    write_obj(f, terrain_chunk['meshes'], mtllib='terrain.mtl', pivot_offset=(
+                        data.road_spline[i * 4].position.x.value,
+                        data.road_spline[i * 4].position.y.value,
+                        data.road_spline[i * 4].position.z.value,
+                    ), float_precision=float_precision)
+        else:
+            with open(self.register_artifact(os.path.join(path, 'terrain.obj')), 'w') as f:
+                write_obj(f, [sub_model for terrain_chunk in terrain_data for sub_model in terrain_chunk['meshes']],
+                          mtllib='terrain.mtl', float_precision=float_precision)
+
+    def _save_blender_meshes(self, data: ReadData[TriMap], terrain_data, path: str) -> List[str]:
+        # binary meshes for blender script, see save_blender_meshes. Returns file names
+        name = data.id.split('/')[-1]
+        textures = {texture_name: self._terrain_texture_path(name, texture_name)
+                    for terrain_chunk in terrain_data for texture_name in
+                    terrain_chunk['texture_names'] + [terrain_chunk['fence_texture_name']] if texture_name}
+        if not self.settings.maps__save_as_chunked:
+            save_blender_meshes(os.path.join(path, 'terrain.npz'),
+                                [sub_model for terrain_chunk in terrain_data for sub_model in terrain_chunk['meshes']],
+                                textures)
+            return ['terrain.npz']
+        for i, terrain_chunk in enumerate(terrain_data):
+            save_blender_meshes(os.path.join(path, f'terrain_chunk_{i}.npz'), terrain_chunk['meshes'], textures,
+                                pivot_offset=(data.road_spline[i * 4].position.x.value,
+                                              data.road_spline[i * 4].position.y.value,
+                                              data.road_spline[i * 4].position.z.value))
+        return [f'terrain_chunk_{i}.npz' for i in range(len(terrain_data))]
+
+    @staticmethod
+    def _dummy_meta(name, position, rotation=(0, 0, 0, 1), **properties) -> Dict:
+        return {
+            'name': name,
+            'position': dict(zip('xyz', position)),
+            'rotation': dict(zip('xyzw', rotation)),
+            **properties,
+        }
+
+    @staticmethod
+    def _mesh_rigid_body_meta(name, vertices, faces) -> Dict:
+        return {
+            'name': name,
+            'position': {'x': 0, 'y': 0, 'z': 0},
+            'rotation': {'x': 0, 'y': 0, 'z': 0, 'w': 1},
+            'shape': {
+                'shape': 'MESH',
+                'vertices': [dict(zip('xyz', v)) for v in vertices],
+                'faces': [list(f) for f in faces],
+            },
+            # blender defaults for passive rigid body
+            'body': {'dynamic': False, 'mass': 1, 'restitution': 0, 'friction': 0.5},
+        }
+
+    def _add_terrain_material(self, builder: GlbBuilder, track_name: str, texture_name: str, path: str) -> int:
+        # FAM background texture is embedded if FAM is already exported, otherwise it is referenced by the same
+        # relative path as in MTL file
+        texture_path = self._terrain_texture_path(track_name, texture_name)
+        png_path = os.path.join(path, texture_path)
+        return builder.add_material(texture_name, png_path if os.path.exists(png_path) else None,
+                                    image_uri=texture_path)
+
+    def _add_terrain_to_glb(self, builder: GlbBuilder, meta: Dict, terrain_chunk, track_name: str, path: str,
+                            pivot_offset=(0, 0, 0)):
+        for sub_model in terrain_chunk['meshes']:
+            material = self._add_terrain_material(builder, track_name, sub_model.texture_id, path)
+            mesh = sub_model.to_glb(builder, material, pivot_offset=pivot_offset)
+            builder.add_node(sub_model.name, mesh=mesh)
+            if self.settings.maps__save_terrain_collisions:
+                positions = [[v[i] - pivot_offset[i] for i in range(3)] for v in sub_model.vertices]
+                meta['rigidBodies'].append(self._mesh_rigid_body_meta(sub_model.name, positions,
+                                                                      sub_model.get_triangles()))
+
+    @staticmethod
+    def _wall_json(barrier: 'TriMapSerializer.BarrierPath', is_left) -> str:
+        if not barrier or len(barrier.points) < 2:
+            return 'null'
+        vertices, triangles = barrier.build_wall_boxes(is_left)
+        return json.dumps({'vertices': vertices.reshape(-1).tolist(), 'triangles': triangles.reshape(-1).tolist()})
+
+    def _add_proxies_to_glb(self, builder: GlbBuilder, meta: Dict, proxies: List[Dict]):
+        for index, proxy_obj in enumerate(proxies):
+            rotation = (0, 0, math.sin(proxy_obj['rotation_z'] / 2), math.cos(proxy_obj['rotation_z'] / 2))
+            properties = {'is_prop': True, **{k: v for k, v in proxy_obj.items()
+                                              if k not in ['x', 'y', 'z', 'rotation_z']}}
+            position = (proxy_obj['x'], proxy_obj['y'], proxy_obj['z'])
+            builder.add_node(f'proxy_{index}', translation=position, rotation=rotation, extras=properties)
+            meta['dummies'].append(self._dummy_meta(f'proxy_{index}', position, rotation, **properties))
+
+    def _save_glb(self, data: ReadData[TriMap], terrain_data, is_opened_track, road_path_settings, player_start,
+                  left_barrier: 'TriMapSerializer.BarrierPath', right_barrier: 'TriMapSerializer.BarrierPath',
+                  path: str):
+        # builds the same scene as blender scripts do and saves it as gg-web-engine glb + meta files
+        def save(builder, meta, name):
+            builder.save(self.register_artifact(os.path.join(path, f'{name}.glb')))
+            with open(self.register_artifact(os.path.join(path, f'{name}.meta')), 'w') as f:
+                f.write(json.dumps(meta))
+
+        track_name = data.id.split('/')[-1]
+        road_spline = data.road_spline[:len(data.terrain) * 4]
+        map_builder = GlbBuilder()
+        map_meta = {'curves': [], 'dummies': [], 'rigidBodies': []}
+        proxy_objects = self._proxy_objects_json(data, is_opened_track, self.settings.maps__save_as_chunked)
+        if self.settings.maps__save_as_chunked:
+            for i, terrain_chunk in enumerate(terrain_data):
+                builder = GlbBuilder()
+                meta = {'curves': [], 'dummies': [], 'rigidBodies': []}
+                self._add_terrain_to_glb(builder, meta, terrain_chunk, track_name, path, pivot_offset=(
+                    data.road_spline[i * 4].position.x.value,
+                    data.road_spline[i * 4].position.y.value,
+                    data.road_spline[i * 4].position.z.value,
+                ))
+                self._add_proxies_to_glb(builder, meta, proxy_objects[i])
+                save(builder, meta, f'terrain_chunk_{i}')
+        else:
+            for terrain_chunk in terrain_data:
+                self._add_terrain_to_glb(map_builder, map_meta, terrain_chunk, track_name, path)
+            self._add_proxies_to_glb(map_builder, map_meta, proxy_objects[0])
+        # road spline. glTF does not support curves, it is in meta file only, node has the same custom properties
+        coords = [(block.position.x.value, block.position.y.value, block.position.z.value) for block in road_spline]
+        map_builder.add_node('road_path', extras=road_path_settings)
+        map_meta['curves'].append({
+            'name': 'road_path',
+            'cyclic': not is_opened_track,
+            'points': [dict(zip('xyz', coord)) for coord in coords],
+            **road_path_settings,
+        })
+        chunks_count = int(len(coords) / 4)
+        for i in range(chunks_count):
+            properties = {'is_chunk': True, 'chunk': f'terrain_chunk_{i}'}
+            if i < chunks_count - 1:
+                properties['children'] = [f'chunk_{i + 1}']
+            elif not is_opened_track:
+                properties['children'] = ['chunk_0']
+            map_builder.add_node(f'chunk_{i}', translation=coords[i * 4], extras=properties)
+            map_meta['dummies'].append(self._dummy_meta(f'chunk_{i}', coords[i * 4], **properties))
+        player_start_position = (player_start['x'], player_start['y'], player_start['z'])
+        player_start_rotation = (math.sin(player_start['rotation_x'] / 2), 0, 0,
+                                 math.cos(player_start['rotation_x'] / 2))
+        map_builder.add_node('player_start', translation=player_start_position, rotation=player_start_rotation)
+        map_meta['dummies'].append(self._dummy_meta('player_start', player_start_position, player_start_rotation))
+        # invisible walls, one mesh per side
+        for barrier, is_left in [(left_barrier, True), (right_barrier, False)]:
+            if not barrier or len(barrier.points) < 2:
+                continue
+            name = f"wall_collision_{'left' if is_left else 'right'}"
+            vertices, triangles = barrier.build_wall_boxes(is_left)
+            map_builder.add_node(name, mesh=map_builder.add_mesh(name, vertices, triangles),
+                                 extras={'is_collision': True})
+            map_meta['rigidBodies'].append(self._mesh_rigid_body_meta(name, vertices.tolist(), triangles.tolist()))
+        save(map_builder, map_meta, 'map')
+
+    @staticmethod
+    def _z_up_copy(node: ReadData, rotation_field: str) -> ReadData:
+        # copy of road spline point or proxy instance with swapped Y and Z of position and inverted rotation. Other
+        # fields are shared with original node
+        position = node.value['position']
+        rotation = node.value[rotation_field]
+        value = DataWrapper(node.value)
+        value['position'] = ReadData(value=DataWrapper({**position.value,
+                                                        'y': position.value['z'],
+                                                        'z': position.value['y']}),
+                                     block=position.block, block_state=position.block_state)
+        value[rotation_field] = ReadData(value=-rotation.value, block=rotation.block, block_state=rotation.block_state)
+        return ReadData(value=value, block=node.block, block_state=node.block_state)
+
+    def _with_z_up_positions(self, data: ReadData[TriMap]) -> ReadData[TriMap]:
+        # shallow copy of map, where proxy instances and road spline points are replaced with Z-up copies
+        road_spline, proxy_instances = data.value['road_spline'], data.value['proxy_object_instances']
+        spline_length = len(data.terrain) * 4
+        value = DataWrapper(data.value)
+        value['road_spline'] = ReadData(value=[self._z_up_copy(x, 'orientation') if i < spline_length else x
+                                               for i, x in enumerate(road_spline.value)],
+                                        block=road_spline.block, block_state=road_spline.block_state)
+        value['proxy_object_instances'] = ReadData(value=[self._z_up_copy(x, 'rotation')
+                                                          for x in proxy_instances.value],
+                                                   block=proxy_instances.block,
+                                                   block_state=proxy_instances.block_state)
+        return ReadData(value=value, block=data.block, block_state=data.block_state)
 
     def serialize(self, data: ReadData[TriMap], path: str):
         super().serialize(data, path, is_dir=True)
@@ -491,31 +673,29 @@ if $save_terrain_collisions:
             res = dict()
             res['texture_names'] = [self._get_texture_name_from_id(is_opened_track, tid.value) for tid in
                                     terrain_entry.texture_ids]
-            road_path_index = len(terrain_data) * 4
-            res['chunk'] = self.TerrainChunk(data)
-            res['chunk'].read_matrix(DataWrapper.wrap(resource_to_json(terrain_entry.rows)),
-                                     DataWrapper.wrap(
-                                         resource_to_json(data.road_spline[road_path_index:road_path_index + 4])))
+            res['fence_texture_name'] = None
+            res['has_left_fence'] = res['has_right_fence'] = False
             if terrain_entry.fence.texture_id != 0 or terrain_entry.fence.has_left_fence or terrain_entry.fence.has_right_fence:
                 fence_texture_id = terrain_entry.fence.texture_id
                 if is_opened_track:
                     if data.id.endswith('AL1.TRI') and fence_texture_id == 16:
                         fence_texture_id = fence_texture_id * 3
-                    res['chunk'].fence_texture_name = self._get_texture_name_from_id(is_opened_track, fence_texture_id)
+                    res['fence_texture_name'] = self._get_texture_name_from_id(is_opened_track, fence_texture_id)
                 else:
-                    res['chunk'].fence_texture_name = ('0/GA00'
-                                                       if data.id.split('/')[-1] in ['TR3.TRI', 'TR4.TRI', 'TR5.TRI']
-                                                       else '0/ga00')
-                res['chunk'].has_left_fence = terrain_entry.fence.has_left_fence
-                res['chunk'].has_right_fence = terrain_entry.fence.has_right_fence
+                    res['fence_texture_name'] = ('0/GA00'
+                                                 if data.id.split('/')[-1] in ['TR3.TRI', 'TR4.TRI', 'TR5.TRI']
+                                                 else '0/ga00')
+                res['has_left_fence'] = terrain_entry.fence.has_left_fence
+                res['has_right_fence'] = terrain_entry.fence.has_right_fence
             terrain_data.append(res)
-        for i, terrain_data_entry in enumerate(terrain_data):
-            terrain_data_entry['chunk'].next_chunk = terrain_data[i + 1]['chunk'] if (
-                    i < len(terrain_data) - 1) else (None
-                                                     if is_opened_track
-                                                     else terrain_data[0]['chunk'])
-            terrain_data_entry['meshes'] = terrain_data_entry['chunk'].build_models(i,
-                                                                                    terrain_data_entry['texture_names'])
+        terrain_rows = np.array([[[[point.x.value, point.y.value, point.z.value] for point in row]
+                                  for row in terrain_entry.rows] for terrain_entry in data.terrain], dtype=np.float64)
+        road_spline = data.road_spline[:len(data.terrain) * 4]
+        spline_positions = np.array([[rp.position.x.value, rp.position.y.value, rp.position.z.value]
+                                     for rp in road_spline], dtype=np.float64).reshape(-1, 4, 3)
+        self.TerrainBuilder(data, is_opened_track).build(terrain_rows, spline_positions,
+                                                         [rp.spline_item_mode.value for rp in road_spline],
+                                                         terrain_data)
 
         if self.settings.maps__save_invisible_wall_collisions:
             left_barrier_points = self.BarrierPath(
@@ -538,16 +718,11 @@ if $save_terrain_collisions:
         # I use Z-up. Did not test exporter with Y-up, also prop rotations will not work, that's why it doesn't have
         # own settings option. Also correct rotation is (new_z='y', new_y='-z'), but looks like NFS loads map mirrored
         # So since we change y and z, we need to invert Y-rotation as well
-        # FIXME this code changes loaded data: problems when doing something after serialized it once (happens in GUI)
+        # Loaded data is not changed: it can be the file, opened in GUI. Rest of export reads swapped copies
         for i, terrain_chunk in enumerate(terrain_data):
             for sub_model in terrain_chunk['meshes']:
                 sub_model.change_axes(new_z='y', new_y='z')
-        for obj in data.proxy_object_instances:
-            (obj.position.z, obj.position.y) = (obj.position.y, obj.position.z)
-            obj.rotation.value = -obj.rotation.value
-        for spline_point in data.road_spline[:len(data.terrain) * 4]:
-            (spline_point.position.z, spline_point.position.y) = (spline_point.position.y, spline_point.position.z)
-            spline_point.orientation.value = -spline_point.orientation.value
+        data = self._with_z_up_positions(data)
         if self.settings.maps__save_invisible_wall_collisions:
             if right_barrier_points:
                 right_barrier_points.points = [[p[0], p[2], p[1]] for p in right_barrier_points.points]
@@ -555,28 +730,50 @@ if $save_terrain_collisions:
             if left_barrier_points:
                 left_barrier_points.points = [[p[0], p[2], p[1]] for p in left_barrier_points.points]
                 left_barrier_points.z_up = True
-        self._save_mtl(terrain_data, path, data.id.split('/')[-1])
-        blender_script = "bpy.ops.wm.read_factory_settings(use_empty=True)"
+        road_path_settings = {
+            'slope': [block.slope.value for block in data.road_spline[:len(data.terrain) * 4]],
+            'slant': [block.slant_a.value for block in data.road_spline[:len(data.terrain) * 4]],
+            'left_barrier_distance': [block.left_barrier_distance.value for block in data.road_spline[:len(data.terrain) * 4]],
+            'right_barrier_distance': [block.right_barrier_distance.value for block in data.road_spline[:len(data.terrain) * 4]],
+        }
+        if is_opened_track:
+            # a terminal road path point: when go backwards, race ends after this point
+            road_path_settings['start_point_index'] = 12
+            # a finish road path point
+            road_path_settings['finish_point_index'] = data.terrain_length.value * 4 - 179
+        # AL1, CL1, CY1, BS, VR - looks ok
+        # RS (TR1), AV (TR2), Trans (TR7) - x should be a bit bigger
+        # FINISH POSITION IS UNKNOWN: CY1 road spline vertex #1740
+        player_start = {
+            # 0.8 is an approximate average car half width
+            'x': max(data.road_spline[18].position.x.value - data.road_spline[18].left_barrier_distance.value + 0.8,
+                     min(data.road_spline[18].position.x.value + data.road_spline[
+                         18].right_barrier_distance.value - 0.8,
+                         2.5)),
+            'y': max(data.road_spline[18].position.y.value, 0),
+            'z': data.road_spline[18].position.z.value,
+            'rotation_x': data.road_spline[18].slope.value,
+        }
+        if self.settings.geometry__save_obj:
+            self._save_mtl(terrain_data, path, data.id.split('/')[-1])
+            self._save_obj(data, terrain_data, path)
+        if not self.settings.geometry__use_blender:
+            self._save_glb(data, terrain_data, is_opened_track, road_path_settings, player_start,
+                           left_barrier_points if self.settings.maps__save_invisible_wall_collisions else None,
+                           right_barrier_points if self.settings.maps__save_invisible_wall_collisions else None,
+                           path)
+            return
+        meshes_file_names = self._save_blender_meshes(data, terrain_data, path)
+        blender_script = "bpy.ops.wm.read_factory_settings(use_empty=True)\n" + get_blender_load_meshes_script()
+        proxy_objects = self._proxy_objects_json(data, is_opened_track, self.settings.maps__save_as_chunked)
         if self.settings.maps__save_as_chunked:
             for i, terrain_chunk in enumerate(terrain_data):
-                with open(os.path.join(path, f'terrain_chunk_{i}.obj'), 'w') as f:
-                    face_index_increment = 1
-                    for sub_model in terrain_chunk['meshes']:
-                        f.write(sub_model.to_obj(face_index_increment, mtllib='terrain.mtl', pivot_offset=(
-                            data.road_spline[i * 4].position.x.value,
-                            data.road_spline[i * 4].position.y.value,
-                            data.road_spline[i * 4].position.z.value,
-                        )))
-                        face_index_increment = face_index_increment + len(sub_model.vertices)
                 blender_script += '\n\n\n' + self.blender_chunk_script.substitute({
                     'new_file': True,
                     'save_invisible_wall_collisions': self.settings.maps__save_invisible_wall_collisions,
                     'save_terrain_collisions': self.settings.maps__save_terrain_collisions,
-                    'obj_name': f'terrain_chunk_{i}.obj',
-                    'proxy_objects_json': json.dumps(
-                        [self._proxy_object_instance_json(data, o, is_opened_track, True)
-                         for o in data.proxy_object_instances
-                         if (i + 1) * 4 > o.reference_road_spline_vertex.value >= i * 4]),
+                    'meshes_file_name': meshes_file_names[i],
+                    'proxy_objects_json': json.dumps(proxy_objects[i]),
                 })
                 if self.settings.geometry__save_blend:
                     blender_script += get_blender_save_script(
@@ -587,34 +784,13 @@ if $save_terrain_collisions:
                         file_name=os.path.join(os.getcwd(), path, f'terrain_chunk_{i}'),
                         export_materials='NONE')
         else:
-            with open(os.path.join(path, 'terrain.obj'), 'w') as f:
-                face_index_increment = 1
-                for i, terrain_chunk in enumerate(terrain_data):
-                    for sub_model in terrain_chunk['meshes']:
-                        f.write(sub_model.to_obj(face_index_increment, mtllib='terrain.mtl'))
-                        face_index_increment = face_index_increment + len(sub_model.vertices)
-
             blender_script += '\n\n\n' + self.blender_chunk_script.substitute({
                 'new_file': False,
                 'save_invisible_wall_collisions': self.settings.maps__save_invisible_wall_collisions,
                 'save_terrain_collisions': self.settings.maps__save_terrain_collisions,
-                'obj_name': 'terrain.obj',
-                'proxy_objects_json': json.dumps(
-                    [self._proxy_object_instance_json(data, o, is_opened_track, False)
-                     for o in data.proxy_object_instances
-                     if len(data.terrain) * 4 > o.reference_road_spline_vertex.value >= 0]),
+                'meshes_file_name': meshes_file_names[0],
+                'proxy_objects_json': json.dumps(proxy_objects[0]),
             })
-        road_path_settings = {
-            'slope': [block.slope.value for block in data.road_spline[:len(data.terrain) * 4]],
-            'slant': [block.slant_a.value for block in data.road_spline[:len(data.terrain) * 4]],
-            'left_barrier_distance': [block.left_barrier_distance.value for block in data.road_spline[:len(data.terrain) * 4]],
-            'right_barrier_distance': [block.right_barrier_distance.value for block in data.road_spline[:len(data.terrain) * 4]],
-        }
-        if is_opened_track:
-            # a terminal road path point: when go backwards, race ends after this point
-            road_path_settings['start_point_index'] = 12
-            # a finish road path point
-            road_path_settings['finish_point_index'] = data.terrain_length.value * 4 - 179
         blender_script += '\n\n\n\n' + self.blender_map_script.substitute({
             'new_file': self.settings.maps__save_as_chunked,
             'save_invisible_wall_collisions': self.settings.maps__save_invisible_wall_collisions,
@@ -623,46 +799,29 @@ if $save_terrain_collisions:
                 [f'({block.position.x.value}, {block.position.y.value}, {block.position.z.value})' for block in
                  data.road_spline[:len(data.terrain) * 4]]),
             'road_path_settings': json.dumps(road_path_settings),
-            # AL1, CL1, CY1, BS, VR - looks ok
-            # RS (TR1), AV (TR2), Trans (TR7) - x should be a bit bigger
-            # FINISH POSITION IS UNKNOWN: CY1 road spline vertex #1740
-            'player_start': json.dumps({
-                # 0.8 is an approximate average car half width
-                'x': max(data.road_spline[18].position.x.value - data.road_spline[18].left_barrier_distance.value + 0.8,
-                         min(data.road_spline[18].position.x.value + data.road_spline[
-                             18].right_barrier_distance.value - 0.8,
-                             2.5)),
-                'y': max(data.road_spline[18].position.y.value, 0),
-                'z': data.road_spline[18].position.z.value,
-                'rotation_x': data.road_spline[18].slope.value,
-            }),
+            'player_start': json.dumps(player_start),
             'is_opened_track': is_opened_track,
-            'left_barrier': json.dumps({
-                'points': left_barrier_points.points,
-                'middle_points': left_barrier_points.middle_points,
-                'lengths': left_barrier_points.lengths,
-                'orientations': left_barrier_points.orientations,
-            }) if self.settings.maps__save_invisible_wall_collisions else 'null',
-            'right_barrier': json.dumps({
-                'points': right_barrier_points.points,
-                'middle_points': right_barrier_points.middle_points,
-                'lengths': right_barrier_points.lengths,
-                'orientations': right_barrier_points.orientations,
-            }) if self.settings.maps__save_invisible_wall_collisions else 'null',
+            'left_wall': self._wall_json(left_barrier_points, is_left=True)
+            if self.settings.maps__save_invisible_wall_collisions else 'null',
+            'right_wall': self._wall_json(right_barrier_points, is_left=False)
+            if self.settings.maps__save_invisible_wall_collisions else 'null',
         })
         if self.settings.geometry__export_to_gg_web_engine:
             from serializers.misc.build_blender_scene import construct_blender_export_script
             blender_script += '\n' + construct_blender_export_script(
                 file_name=os.path.join(os.getcwd(), path, 'map'),
                 export_materials='NONE')
-        run_blender(path=path,
-                    script=blender_script,
-                    out_blend_name=os.path.join(os.getcwd(), path,
-                                                'map').replace('\\', '/') if self.settings.geometry__save_blend else None)
-        if not self.settings.geometry__save_obj:
-            if self.settings.maps__save_as_chunked:
-                for i in range(len(terrain_data)):
-                    os.unlink(os.path.join(os.getcwd(), path, f'terrain_chunk_{i}.obj'))
-            else:
-                os.unlink(os.path.join(os.getcwd(), path, 'terrain.obj'))
-            os.unlink(os.path.join(os.getcwd(), path, 'terrain.mtl'))
+        try:
+            run_blender(path=path,
+                        script=blender_script,
+                        out_blend_name=os.path.join(os.getcwd(), path, 'map').replace('\\', '/')
+                        if self.settings.geometry__save_blend else None)
+        finally:
+            for file_name in meshes_file_names:
+                os.unlink(os.path.join(path, file_name))
+        # blender is optional, so files are checked
+        output_names = (['map'] + [f'terrain_chunk_{i}' for i in range(len(terrain_data))]
+                        if self.settings.maps__save_as_chunked else ['map'])
+        for file_name in [f'{name}{extension}' for name in output_names for extension in ['.blend', '.glb', '.meta']]:
+            if os.path.exists(os.path.join(path, file_name)):
+                self.register_artifact(os.path.join(path, file_name))
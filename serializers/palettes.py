@@ -7,7 +7,7 @@ class PaletteSerializer(BaseFileSerializer):
 
     def serialize(self, data: ReadData[BasePalette], path: str):
         super().serialize(data, path)
-        with open(f'{path}.pal.txt', 'w') as f:
+        with open(self.register_artifact(f'{path}.pal.txt'), 'w') as f:
             f.write(f'{data.block.__class__.__name__}\n')
             f.write('Palette used in bitmap serialization. Contains mapping bitmap data bytes to RGBA colors.\n')
             for i, color in enumerate(data.colors):
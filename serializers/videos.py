@@ -1,6 +1,7 @@
 import subprocess
 
 from library.read_data import ReadData
+from library.utils.processes import external_tool_slot
 from resources.eac.videos import FfmpegSupportedVideo
 from serializers import BaseFileSerializer
 
@@ -9,12 +10,13 @@ class FfmpegSupportedVideoSerializer(BaseFileSerializer):
 
     def serialize(self, data: ReadData[FfmpegSupportedVideo], path: str):
         super().serialize(data, path)
-        subprocess.run([self.settings.ffmpeg_executable, "-y", "-nostats", '-loglevel', '0', "-i", data.value,
-                        # add video on black square so we will not have transparent pixels (displays wrong in chrome)
-                        '-filter_complex',
-                        'color=black,format=rgb24[c];[c][0]scale2ref[c][i];[c][i]overlay=format=auto:shortest=1,setsar=1',
-                        "-c:v", "libx264",
-                        "-c:a", "mp3",
-                        "-vprofile", "main",
-                        "-pix_fmt", "yuv420p",
-                        f'{path}.mp4'], check=True)
+        with external_tool_slot('ffmpeg'):
+            subprocess.run([self.settings.ffmpeg_executable, "-y", "-nostats", '-loglevel', '0', "-i", data.value,
+                            # add video on black square so we will not have transparent pixels (displays wrong in chrome)
+                            '-filter_complex',
+                            'color=black,format=rgb24[c];[c][0]scale2ref[c][i];[c][i]overlay=format=auto:shortest=1,setsar=1',
+                            "-c:v", "libx264",
+                            "-c:a", "mp3",
+                            "-vprofile", "main",
+                            "-pix_fmt", "yuv420p",
+                            self.register_artifact(f'{path}.mp4')], check=True)
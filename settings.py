@@ -6,6 +6,32 @@ ffmpeg_executable = 'ffmpeg'
 # amount of processes to be spawned.
 # 0 means "use the amount of CPU cores"
 multiprocess_processes_count = 0
+# max amount of simultaneously running blender and ffmpeg processes. Both tools are multithreaded, so running them in
+# every process overloads CPU and RAM. Other processes keep parsing files while waiting. 0 means no limit
+multiprocess_blender_processes_count = 2
+multiprocess_ffmpeg_processes_count = 4
+# start blender processes once and send all jobs to them instead of starting blender for every map or 3D model.
+# Amount of blender processes is multiprocess_blender_processes_count (or multiprocess_processes_count if it is 0)
+multiprocess_persistent_blender = True
+# persistent blender reports errors of generated scripts, file is listed in skipped.txt then. If False, errors are only
+# logged and export goes on, like with blender, started per resource, which does not report errors
+multiprocess_blender_script_errors_fail_export = True
+# files, required by many other files. They are decoded once in the main process and shared with all processes via
+# shared memory instead of being decompressed in every process. Matched against file path or file name.
+# Add '*.FAM' here if converting track textures in many processes
+multiprocess_shared_files = ['CENTRAL.QFS']
+# max time in seconds for exporting a single file. Process, which exceeds it, is killed together with blender/ffmpeg,
+# launched by it, and file is listed in skipped.txt. 0 means no limit
+multiprocess_task_timeout = 1800
+# process is replaced with the new one after exporting this amount of files, it frees memory, used by caches.
+# 0 means process lives until the end of conversion
+multiprocess_max_tasks_per_child = 50
+# limit of memory (estimated), used by loaded files cache in every process. Least recently used files are dropped
+# from cache when limit exceeded. 0 means no limit
+file_cache_max_size_mb = 1024
+# cached file is checked for modification on disk at most once per this amount of seconds (and always when GUI editor
+# opens it). 0 means it is checked on every access
+file_cache_mtime_check_interval = 2
 
 print_errors = False
 print_blender_log = False
@@ -51,17 +77,22 @@ audio__save_car_sfx_loops = False
 # If false builds entire map into single file
 maps__save_as_chunked = False
 # places boxes with collision, where invisible wall is located
-maps__save_invisible_wall_collisions = False  # this one will consume time...
+maps__save_invisible_wall_collisions = False
 maps__save_terrain_collisions = False
 # alongside with horz.png, save spherical.png, suitable to be used as sky spherical texture
 maps__save_spherical_skybox_texture = True
 
-# saves obj file for each 3D scene. obj-s are used under the hood, so if true it is even faster, we do not delete them
+# saves obj file for each 3D scene as an extra artifact. Blender does not need them: meshes are passed as binary arrays
 geometry__save_obj = False
+# amount of digits after decimal point in obj files. If None, numbers are saved with full precision
+geometry__obj_float_precision = None
 # saves blender scene for each 3D scene
 geometry__save_blend = True
 # export to gg-web-engine https://github.com/AndyGura/gg-web-engine
 geometry__export_to_gg_web_engine = False
+# if false, blender is not used at all: instead of blender scene, glb file (with gg-web-engine meta file) is built
+# directly, which is much faster and does not require blender to be installed
+geometry__use_blender = True
 # removes empty polygons, representing whels and their shadow. Places a dummy on the position where wheel axle
 # located and set wheel width, radius as custom properties of the dummy instead
 geometry__replace_car_wheel_with_dummies = True
@@ -0,0 +1,117 @@
+import multiprocessing
+import os
+import time
+import unittest
+from unittest.mock import patch
+
+from actions.convert_all import TaskTimeoutError, _TaskMonitor, _wait_for_results
+from library.utils.processes import ExternalToolSlots
+
+
+def _run_forever(slots):
+    # like pool worker: own process group, holds blender slot
+    os.setpgrp()
+    with slots.acquire('blender'):
+        time.sleep(60)
+
+
+class _Result:
+    def __init__(self, ready_at=None, value=None):
+        self.ready_at = ready_at
+        self.value = value
+
+    def ready(self):
+        return self.ready_at is not None and time.time() >= self.ready_at
+
+    def get(self):
+        return self.value
+
+
+class _BlenderWorkers:
+    def __init__(self):
+        self.restarted = []
+
+    def update(self):
+        pass
+
+    def restart(self, slot):
+        self.restarted.append(slot)
+
+
+class _ProgressBar:
+    def __init__(self):
+        self.count = 0
+
+    def update(self):
+        self.count += 1
+
+
+class TestWaitForResults(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = multiprocessing.Queue()
+        self.monitor = _TaskMonitor(self.queue)
+        self.slots = ExternalToolSlots({'blender': 1})
+        self.blender_workers = _BlenderWorkers()
+        self.pbar = _ProgressBar()
+
+    @patch('settings.multiprocess_task_timeout', 0.5)
+    def test_should_kill_timed_out_worker_and_release_its_slots(self):
+        worker = multiprocessing.Process(target=_run_forever, args=(self.slots,))
+        worker.start()
+        self.queue.put(('started', 0, worker.pid, time.time()))
+        results = _wait_for_results([_Result()], self.monitor, self.slots, self.blender_workers, self.pbar)
+        worker.join(5)
+        self.assertFalse(worker.is_alive())
+        self.assertIsInstance(results[0], TaskTimeoutError)
+        self.assertEqual(list(self.slots.owners['blender']), [0])
+        self.assertEqual(self.blender_workers.restarted, [0])
+        self.assertEqual(self.pbar.count, 1)
+
+    @patch('settings.multiprocess_task_timeout', 0.5)
+    def test_should_not_count_time_of_waiting_for_slot(self):
+        start_time = time.time()
+        self.queue.put(('started', 0, os.getpid(), start_time))
+        self.queue.put(('waiting', os.getpid(), start_time + 0.1))
+        results = _wait_for_results([_Result(start_time + 1, 'done')], self.monitor, self.slots,
+                                    self.blender_workers, self.pbar)
+        self.assertEqual(results, ['done'])
+
+    def test_should_subtract_waiting_from_elapsed_time(self):
+        self.queue.put(('started', 0, 1, 100))
+        self.queue.put(('waiting', 1, 110))
+        self.queue.put(('resumed', 1, 150))
+        self.monitor.read_events()
+        self.assertEqual(self.monitor.running[0].elapsed(160), 20)
+        self.queue.put(('waiting', 1, 170))
+        self.monitor.read_events()
+        self.assertEqual(self.monitor.running[0].elapsed(200), 30)
+
+    def test_should_track_only_the_last_task_of_worker(self):
+        self.queue.put(('started', 0, 1, 100))
+        self.queue.put(('started', 1, 1, 110))
+        self.queue.put(('waiting', 1, 120))
+        self.monitor.read_events()
+        self.assertIsNone(self.monitor.running[0].waiting_since)
+        self.assertEqual(self.monitor.running[1].waiting_since, 120)
+        self.assertEqual(list(self.monitor.running_by_pid), [1])
+
+    def test_should_forget_pids_of_finished_tasks(self):
+        self.queue.put(('started', 0, 1, time.time()))
+        self.queue.put(('started', 1, 2, time.time()))
+        self.monitor.read_events()
+        results = _wait_for_results([_Result(0, 'done'), _Result(0, 'done')], self.monitor, self.slots,
+                                    self.blender_workers, self.pbar)
+        self.assertEqual(results, ['done', 'done'])
+        self.assertEqual(self.monitor.running_by_pid, {})
+        # late event of finished task
+        self.queue.put(('started', 0, 1, time.time()))
+        self.monitor.read_events()
+        self.assertEqual(self.monitor.running_by_pid, {})
+
+    def test_should_keep_pid_of_next_task_of_worker(self):
+        self.queue.put(('started', 0, 1, 100))
+        self.queue.put(('started', 1, 1, 110))
+        self.monitor.read_events()
+        self.monitor.finish(0)
+        self.assertIs(self.monitor.running_by_pid[1], self.monitor.running[1])
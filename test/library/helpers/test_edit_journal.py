@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from library import require_file
+from library.helpers.edit_journal import EditJournal
+from library.loader import clear_file_cache
+from library.saver import write_file
+
+
+class TestEditJournal(unittest.TestCase):
+
+    def tearDown(self):
+        # tests change cached data
+        clear_file_cache('test/samples/VERTBST.FSH')
+        clear_file_cache('test/samples/AL1.TRI')
+
+    def test_should_undo_and_redo_applied_changes(self):
+        fsh = require_file('test/samples/VERTBST.FSH')
+        y = fsh.children[3].y.value
+        journal = EditJournal(fsh)
+        journal.apply([{'id': 'test/samples/VERTBST.FSH__children/larl/x', 'value': 10}])
+        journal.apply([{'id': 'test/samples/VERTBST.FSH__children/larl/x', 'value': 20},
+                       {'id': 'test/samples/VERTBST.FSH__children/3/y', 'value': 30}])
+        self.assertEqual(journal.get_state(), {'undo': 2, 'redo': 0})
+        journal.undo()
+        self.assertEqual((fsh.children[1].x.value, fsh.children[3].y.value), (10, y))
+        journal.undo()
+        self.assertEqual(fsh.children[1].x.value, 222)
+        self.assertIsNone(journal.undo())
+        journal.redo()
+        journal.redo()
+        self.assertEqual((fsh.children[1].x.value, fsh.children[3].y.value), (20, 30))
+        self.assertEqual(journal.get_state(), {'undo': 2, 'redo': 0})
+
+    def test_should_record_only_changed_values_of_action(self):
+        tri = require_file('test/samples/AL1.TRI')
+        original = tri.to_bytes()
+        journal = EditJournal(tri)
+        with journal.record(tri):
+            tri.block.action_scale_track(tri, 2)
+        scaled = tri.to_bytes()
+        # x, y and z of every road spline vertex, except zeros
+        self.assertLessEqual(len(journal.undo_entries[0]), len(tri.road_spline) * 3)
+        journal.undo()
+        self.assertEqual(tri.to_bytes(), original)
+        journal.redo()
+        self.assertEqual(tri.to_bytes(), scaled)
+
+    def test_should_undo_moved_nodes(self):
+        tri = require_file('test/samples/AL1.TRI')
+        original = tri.to_bytes()
+        journal = EditJournal(tri)
+        with journal.record(tri):
+            tri.block.action_reverse_track(tri)
+        journal.undo()
+        self.assertEqual(tri.to_bytes(), original)
+
+    def test_should_clear_history_if_structure_changed(self):
+        fsh = require_file('test/samples/VERTBST.FSH')
+        journal = EditJournal(fsh)
+        journal.apply([{'id': 'test/samples/VERTBST.FSH__children/larl/x', 'value': 10}])
+        with journal.record(fsh):
+            fsh.children.value = fsh.children.value[:-1]
+        self.assertEqual(journal.get_state(), {'undo': 0, 'redo': 0})
+
+
+class TestEditJournalWithSaving(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'AL1.TRI').replace('\\', '/')
+        shutil.copy('test/samples/AL1.TRI', self.path)
+        self.data = require_file(self.path)
+        self.journal = EditJournal(self.data)
+        self.x_id = self.data.id + '__road_spline/5/position/x'
+
+    def tearDown(self):
+        clear_file_cache(self.path)
+        self.directory.cleanup()
+
+    def _save(self, value=None):
+        if value is not None:
+            self.journal.apply([{'id': self.x_id, 'value': value}])
+        write_file(self.data, self.path)
+        # saved file is reloaded from disk on the next lookup
+        clear_file_cache(self.path)
+
+    def _read_saved_x(self):
+        return require_file(self.path).road_spline[5].position.x.value
+
+    def test_should_apply_changes_of_every_save_to_opened_data(self):
+        self._save(10.0)
+        self._save(20.0)
+        self.assertEqual(self.data.road_spline[5].position.x.value, 20.0)
+        self.assertEqual(self._read_saved_x(), 20.0)
+
+    def test_should_undo_after_save(self):
+        original = self.data.road_spline[5].position.x.value
+        self._save(10.0)
+        self.journal.undo()
+        self.assertEqual(self.data.road_spline[5].position.x.value, original)
+        self._save()
+        self.assertEqual(self._read_saved_x(), original)
+        self.journal.redo()
+        self._save()
+        self.assertEqual(self._read_saved_x(), 10.0)
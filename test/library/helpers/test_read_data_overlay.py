@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+
+from library import require_file
+from library.helpers.read_data_overlay import ReadDataOverlay
+from library.loader import load_file
+from library.read_data import ReadData
+from serializers import get_serializer
+
+
+class TestReadDataOverlay(unittest.TestCase):
+
+    def test_should_not_change_original_data(self):
+        fsh = require_file('test/samples/VERTBST.FSH')
+        overlay = ReadDataOverlay(fsh)
+        overlay.apply([{'id': 'test/samples/VERTBST.FSH__children/larl/x', 'value': 10},
+                       {'id': 'test/samples/VERTBST.FSH__children/3/y', 'value': 20}])
+        self.assertEqual(overlay.data.children[1].x.value, 10)
+        self.assertEqual(overlay.data.children[3].y.value, 20)
+        self.assertEqual(fsh.children[1].x.value, 222)
+        self.assertNotEqual(fsh.children[3].y.value, 20)
+        self.assertEqual(overlay.changes, {'test/samples/VERTBST.FSH__children/larl/x': 10,
+                                           'test/samples/VERTBST.FSH__children/donl/y': 20})
+
+    def test_should_share_untouched_nodes(self):
+        fsh = require_file('test/samples/VERTBST.FSH')
+        overlay = ReadDataOverlay(fsh)
+        overlay.set('children/larl/x', 10)
+        overlay.set('children/larl/y', 20)
+        self.assertIsNot(overlay.data.children[1], fsh.children[1])
+        self.assertIs(overlay.data.children[1].bitmap, fsh.children[1].bitmap)
+        self.assertIs(overlay.data.children[2], fsh.children[2])
+        self.assertEqual((overlay.data.children[1].x.value, overlay.data.children[1].y.value), (10, 20))
+
+    def test_should_fail_on_unknown_id(self):
+        overlay = ReadDataOverlay(require_file('test/samples/VERTBST.FSH'))
+        with self.assertRaises(KeyError):
+            overlay.set('children/none/x', 1)
+
+    def test_serializing_overlay_should_not_change_original_data(self):
+        tri = load_file('test/samples/AL1.TRI')
+
+        def snapshot():
+            return ([(x.position.x.value, x.position.y.value, x.position.z.value, x.rotation.value)
+                     for x in tri.proxy_object_instances],
+                    [(x.position.x.value, x.position.y.value, x.position.z.value, x.orientation.value)
+                     for x in tri.road_spline])
+
+        before = snapshot()
+        overlay = ReadDataOverlay(tri)
+        overlay.set('road_spline/0/slope', 1)
+        dirty_nodes = set(ReadData.dirty_nodes.keys())
+        serializer = get_serializer(overlay.data.block)
+        settings_backup = dict(serializer.settings)
+        try:
+            serializer.patch_settings({'geometry__use_blender': False})
+            with tempfile.TemporaryDirectory() as directory:
+                serializer.serialize(overlay.data, os.path.join(directory, 'AL1.TRI'))
+        finally:
+            serializer.settings.update(settings_backup)
+        self.assertEqual(snapshot(), before)
+        self.assertEqual(set(ReadData.dirty_nodes.keys()), dirty_nodes)
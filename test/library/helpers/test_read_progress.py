@@ -0,0 +1,45 @@
+import os
+import threading
+import unittest
+
+from library.helpers.exceptions import ReadCancelledException
+from library.helpers.read_progress import ReadProgress, report_read_progress
+from library.loader import load_file
+
+
+class TestReadProgress(unittest.TestCase):
+
+    def test_should_report_whole_file(self):
+        progress = ReadProgress()
+        with report_read_progress(progress):
+            load_file('test/samples/AL1.TRI')
+        self.assertEqual(progress.total, os.path.getsize('test/samples/AL1.TRI'))
+        self.assertEqual(progress.position, progress.total)
+
+    def test_should_report_uncompressed_data_of_compressed_file(self):
+        progress = ReadProgress()
+        with report_read_progress(progress):
+            data = load_file('test/samples/AL2.QFS')
+        self.assertGreater(progress.total, os.path.getsize('test/samples/AL2.QFS'))
+        # trailing padding is not read
+        self.assertGreater(progress.position, progress.total - 4)
+        self.assertLessEqual(progress.position, progress.total)
+        self.assertFalse(isinstance(data, Exception))
+
+    def test_should_stop_cancelled_reading(self):
+        progress = ReadProgress()
+        progress.cancel()
+        with report_read_progress(progress):
+            with self.assertRaises(ReadCancelledException):
+                load_file('test/samples/AL1.TRI')
+
+    def test_should_not_affect_other_threads(self):
+        progress = ReadProgress()
+        progress.cancel()
+        result = []
+        with report_read_progress(progress):
+            thread = threading.Thread(target=lambda: result.append(load_file('test/samples/VERTBST.FSH')))
+            thread.start()
+            thread.join()
+        self.assertEqual(len(result), 1)
+        self.assertEqual(progress.position, 0)
@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from library import require_file, require_parent, require_resource
+from library.loader import FileCache, clear_file_cache, files_cache, invalidate_resource_index
+
+
+class TestFileCache(unittest.TestCase):
+
+    def test_should_evict_least_recently_used(self):
+        cache = FileCache(max_size=1)
+        cache.put('a', [1], mtime=0)
+        cache.put('b', [1], mtime=0)
+        self.assertNotIn('a', cache)
+        self.assertIn('b', cache)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_should_not_evict_pinned(self):
+        cache = FileCache(max_size=1)
+        cache.pin('a')
+        cache.put('a', [1], mtime=0)
+        cache.put('b', [1], mtime=0)
+        self.assertIn('a', cache)
+        self.assertIn('b', cache)
+        cache.unpin('a')
+        self.assertNotIn('a', cache)
+
+    def test_should_count_hits_and_misses(self):
+        files_cache.clear()
+        hits, misses = files_cache.hits, files_cache.misses
+        first = require_file('test/samples/AL2.QFS')
+        second = require_file('test/samples/AL2.QFS')
+        self.assertIs(first, second)
+        self.assertEqual(files_cache.hits - hits, 1)
+        self.assertEqual(files_cache.misses - misses, 1)
+
+    def test_should_invalidate_modified_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'AL2.QFS').replace('\\', '/')
+            shutil.copy('test/samples/AL2.QFS', path)
+            first = require_file(path)
+            os.utime(path, (0, 0))
+            self.assertIsNone(files_cache.get(path, check_mtime=True))
+            second = require_file(path)
+            self.assertIsNot(first, second)
+        finally:
+            files_cache.invalidate(path)
+            shutil.rmtree(directory)
+
+    def test_should_check_mtime_once_per_interval(self):
+        cache = FileCache(mtime_check_interval=60)
+        cache.put('a', [1], mtime=0)
+        with patch.object(FileCache, '_mtime', return_value=1) as mtime:
+            self.assertEqual(cache.get('a'), [1])
+            self.assertEqual(mtime.call_count, 0)
+            cache.mtime_check_interval = 0
+            self.assertIsNone(cache.get('a'))
+            self.assertEqual(mtime.call_count, 1)
+        self.assertEqual(cache.stats()['invalidations'], 1)
+
+    def test_should_take_not_given_limits_from_settings(self):
+        import settings
+        cache = FileCache(max_size=1)
+        self.assertEqual(cache.max_size, 1)
+        self.assertEqual(cache.mtime_check_interval, settings.file_cache_mtime_check_interval)
+        self.assertEqual(files_cache.max_size, settings.file_cache_max_size_mb * 1024 * 1024)
+
+    def test_should_estimate_size_once_per_load(self):
+        files_cache.clear()
+        data = require_file('test/samples/AL2.QFS')
+        size = data.block_state['estimated_size']
+        self.assertGreater(size, 0)
+        try:
+            with patch('library.loader._estimate_decoded_size') as estimate:
+                files_cache.put('test/samples/AL2.QFS', data)
+                self.assertEqual(estimate.call_count, 0)
+            self.assertEqual(files_cache.stats()['estimated_size'], size)
+        finally:
+            clear_file_cache('test/samples/AL2.QFS')
+
+
+class TestRequireResource(unittest.TestCase):
+
+    def test_should_find_nested_resource(self):
+        fsh = require_file('test/samples/VERTBST.FSH')
+        bitmap = fsh.value['children'].value[0]
+        name = fsh.block_state['id'] + '__children/' + fsh.value['children'].block_state['custom_names'][0]
+        self.assertIs(require_resource(name + '/width')[0], bitmap.value['width'])
+        self.assertIs(require_resource(fsh.block_state['id'] + '__children_count')[0], fsh.value['children_count'])
+        self.assertIsNone(require_resource(fsh.block_state['id'] + '__not_a_field')[0])
+
+    def test_should_find_parent(self):
+        fsh = require_file('test/samples/VERTBST.FSH')
+        children = fsh.value['children']
+        name = fsh.block_state['id'] + '__children/' + children.block_state['custom_names'][1]
+        self.assertEqual(require_parent(name + '/width'), (children.value[1], 'width'))
+        self.assertEqual(require_parent(name), (children, 1))
+        self.assertEqual(require_parent(fsh.block_state['id'] + '__children/1'), (children, 1))
+        self.assertEqual(require_parent(fsh.block_state['id']), (None, None))
+
+    def test_should_find_moved_nodes_after_invalidation(self):
+        fsh = require_file('test/samples/VERTBST.FSH')
+        children = fsh.value['children']
+        first_id = fsh.block_state['id'] + '__children/0'
+        try:
+            self.assertIs(require_resource(first_id)[0], children.value[0])
+            children.value = children.value[::-1]
+            invalidate_resource_index(first_id)
+            self.assertIs(require_resource(first_id)[0], children.value[0])
+        finally:
+            clear_file_cache('test/samples/VERTBST.FSH')
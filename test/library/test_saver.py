@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from library import require_file
+from library.loader import clear_file_cache, load_file
+from library.read_data import ReadData
+from library.saver import write_file
+
+
+class TestDirtyNodes(unittest.TestCase):
+
+    def test_loaded_file_should_have_no_changes(self):
+        # SHPI fixes up names of items while reading
+        fsh = load_file('test/samples/VERTBST.FSH')
+        prefix = fsh.id + '__'
+        self.assertEqual([x.id for x in ReadData.dirty_nodes.values() if x.id.startswith(prefix)], [])
+        fsh.children[1].x.value = 10
+        self.assertEqual([x.id for x in ReadData.dirty_nodes.values() if x.id.startswith(prefix)],
+                         [fsh.children[1].value['x'].id])
+        ReadData.dirty_nodes.pop(id(fsh.children[1].value['x']))
+
+
+class TestWriteFile(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _copy_sample(self, name):
+        path = os.path.join(self.directory.name, name).replace('\\', '/')
+        shutil.copy(os.path.join('test/samples', name), path)
+        clear_file_cache(path)
+        return path
+
+    def test_should_patch_changed_values_in_place(self):
+        path = self._copy_sample('AL1.TRI')
+        data = require_file(path)
+        data.road_spline[10].position.x.value += 100
+        data.road_spline[20].slope.value = -data.road_spline[20].slope.value
+        expected = data.to_bytes()
+        self.assertTrue(write_file(data, path))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), expected)
+        # the second save is incremental as well
+        data.road_spline[10].position.x.value -= 100
+        data.road_spline[20].slope.value = -data.road_spline[20].slope.value
+        self.assertTrue(write_file(data, path))
+        with open(path, 'rb') as f, open('test/samples/AL1.TRI', 'rb') as original:
+            self.assertEqual(f.read(), original.read())
+
+    def test_should_rewrite_file_if_size_changed(self):
+        path = self._copy_sample('VERTBST.FSH')
+        data = require_file(path)
+        image = data.children[-1]
+        image.height.value += 1
+        image.bitmap.value = list(image.bitmap.value) + [0] * image.width.value
+        expected = data.to_bytes()
+        self.assertFalse(write_file(data, path))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), expected)
+        # read ranges are outdated after rewrite
+        image.x.value = 0
+        self.assertFalse(write_file(data, path))
+
+    def test_should_rewrite_file_if_changed_on_disk(self):
+        path = self._copy_sample('AL1.TRI')
+        data = require_file(path)
+        data.road_spline[10].position.x.value += 100
+        os.utime(path, (0, 0))
+        self.assertFalse(write_file(data, path))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), data.to_bytes())
@@ -0,0 +1,79 @@
+import multiprocessing
+import os
+import signal
+import unittest
+from multiprocessing import shared_memory
+
+from library.loader import load_file
+from library.shared_cache import SharedResourceBroker, get_shared_payload, init_shared_cache
+from serializers import DataTransferSerializer
+
+PATH = 'test/samples/AL2.QFS'
+
+
+def _attach_and_hang(manifest, attached):
+    init_shared_cache(manifest)
+    get_shared_payload(PATH)
+    attached.set()
+    signal.pause()
+
+
+def _segment_exists(name):
+    try:
+        shared_memory.SharedMemory(name=name).close()
+        return True
+    except FileNotFoundError:
+        return False
+
+
+class TestSharedResourceBroker(unittest.TestCase):
+
+    def tearDown(self):
+        init_shared_cache({})
+
+    def test_should_read_published_file_from_shared_memory(self):
+        expected = load_file(PATH)
+        with SharedResourceBroker() as broker:
+            broker.publish(PATH)
+            init_shared_cache(broker.manifest)
+            block_class, payload = get_shared_payload(PATH)
+            self.assertEqual(block_class.__name__, 'Qfs2Block')
+            self.assertEqual(len(payload), broker.manifest[PATH]['payload_size'])
+            data = load_file(PATH)
+            self.assertEqual([x.id for x in data.children], [x.id for x in expected.children])
+            self.assertEqual(DataTransferSerializer().serialize(data)['data'],
+                             DataTransferSerializer().serialize(expected)['data'])
+            init_shared_cache({})
+        self.assertIsNone(get_shared_payload(PATH))
+
+    def test_should_unlink_segments_on_close(self):
+        with SharedResourceBroker() as broker:
+            broker.publish(PATH)
+            name = broker.manifest[PATH]['segment']
+            self.assertTrue(_segment_exists(name))
+        self.assertFalse(_segment_exists(name))
+        self.assertEqual(broker.manifest, {})
+
+    def test_should_unlink_segments_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with SharedResourceBroker() as broker:
+                broker.publish(PATH)
+                name = broker.manifest[PATH]['segment']
+                raise RuntimeError('conversion failed')
+        self.assertFalse(_segment_exists(name))
+
+    def test_should_keep_segments_when_worker_crashes(self):
+        with SharedResourceBroker() as broker:
+            broker.publish(PATH)
+            name = broker.manifest[PATH]['segment']
+            attached = multiprocessing.Event()
+            worker = multiprocessing.Process(target=_attach_and_hang, args=(broker.manifest, attached))
+            worker.start()
+            self.assertTrue(attached.wait(10))
+            os.kill(worker.pid, signal.SIGKILL)
+            worker.join()
+            # other workers can still read it
+            init_shared_cache(broker.manifest)
+            self.assertEqual(len(get_shared_payload(PATH)[1]), broker.manifest[PATH]['payload_size'])
+            init_shared_cache({})
+        self.assertFalse(_segment_exists(name))
@@ -0,0 +1,81 @@
+import json
+import socket
+import struct
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from library.utils.blender_scripts import run_blender
+from library.utils.blender_worker import BlenderJobError, run_blender_job
+
+
+def _serve_once(response=None):
+    # fake blender worker: accepts one job, answers with response or closes connection if response is None
+    server = socket.create_server(('127.0.0.1', 0))
+
+    def serve():
+        connection, _ = server.accept()
+        with connection:
+            size = struct.unpack('>I', connection.recv(4))[0]
+            while size > 0:
+                size -= len(connection.recv(size))
+            if response is not None:
+                data = json.dumps(response).encode('utf8')
+                connection.sendall(struct.pack('>I', len(data)) + data)
+        server.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return server.getsockname()[1]
+
+
+class TestRunBlenderJob(unittest.TestCase):
+
+    def test_should_raise_connection_error_if_worker_closed_connection(self):
+        with self.assertRaises(ConnectionError):
+            run_blender_job(_serve_once(), '.', 'pass')
+
+    def test_should_raise_job_error_if_script_failed(self):
+        with self.assertRaises(BlenderJobError):
+            run_blender_job(_serve_once({'success': False, 'error': 'Traceback'}), '.', 'pass')
+        run_blender_job(_serve_once({'success': True}), '.', 'pass')
+
+
+@patch('library.utils.blender_scripts.time.sleep')
+@patch('library.utils.blender_scripts.subprocess.run')
+@patch('library.utils.blender_scripts.get_blender_worker_port', return_value=1234)
+class TestRunBlender(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_should_retry_worker_after_connection_error(self, get_port, run, sleep):
+        with patch('library.utils.blender_scripts.run_blender_job',
+                   side_effect=[ConnectionResetError(), None]) as run_job, self.assertLogs(level='WARNING'):
+            run_blender(self.directory.name, 'pass')
+        self.assertEqual(run_job.call_count, 2)
+        run.assert_not_called()
+
+    def test_should_run_separate_blender_if_worker_is_not_available(self, get_port, run, sleep):
+        with patch('library.utils.blender_scripts.run_blender_job',
+                   side_effect=ConnectionRefusedError()) as run_job, self.assertLogs(level='WARNING'):
+            run_blender(self.directory.name, 'pass')
+        self.assertEqual(run_job.call_count, 2)
+        run.assert_called_once()
+
+    def test_should_not_use_worker_without_port(self, get_port, run, sleep):
+        get_port.return_value = None
+        with patch('library.utils.blender_scripts.run_blender_job') as run_job:
+            run_blender(self.directory.name, 'pass')
+        run_job.assert_not_called()
+        run.assert_called_once()
+
+    def test_should_raise_script_errors(self, get_port, run, sleep):
+        with patch('library.utils.blender_scripts.run_blender_job', side_effect=BlenderJobError('Traceback')):
+            with self.assertRaises(BlenderJobError):
+                run_blender(self.directory.name, 'pass')
+            with patch('settings.multiprocess_blender_script_errors_fail_export', False), \
+                    self.assertLogs(level='WARNING'):
+                run_blender(self.directory.name, 'pass')
+        run.assert_not_called()
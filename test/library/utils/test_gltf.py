@@ -0,0 +1,88 @@
+import json
+import os
+import struct
+import tempfile
+import unittest
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from library.utils.gltf import GlbBuilder
+
+_COMPONENT_SIZES = {5125: 4, 5126: 4}
+_TYPE_SIZES = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4}
+
+
+def _parse_glb(data: bytes):
+    magic, version, length = struct.unpack('<III', data[:12])
+    chunks = []
+    offset = 12
+    while offset < len(data):
+        chunk_length, chunk_type = struct.unpack('<II', data[offset:offset + 8])
+        chunks.append((chunk_type, offset + 8, data[offset + 8:offset + 8 + chunk_length]))
+        offset += 8 + chunk_length
+    return magic, version, length, chunks
+
+
+class TestGlbBuilder(unittest.TestCase):
+
+    def _build(self, png_path=None) -> bytes:
+        builder = GlbBuilder()
+        material = builder.add_material('texture', png_path)
+        self.assertEqual(builder.add_material('texture'), material)
+        mesh = builder.add_mesh('triangle', [[0, 0, 0], [1, 0, 0], [0, 1, 0]], [[0, 1, 2]],
+                                uvs=[[0, 0], [1, 0], [0, 1]], material=material)
+        builder.add_node('triangle', mesh=mesh, translation=(1, 2, 3), extras={'is_prop': True})
+        builder.add_node('dummy')
+        return builder.to_bytes()
+
+    def test_should_write_valid_glb(self):
+        with tempfile.TemporaryDirectory() as directory:
+            png_path = os.path.join(directory, 'texture.png')
+            image = BytesIO()
+            Image.new('RGBA', (3, 1)).save(image, format='PNG')
+            with open(png_path, 'wb') as f:
+                f.write(image.getvalue())
+            data = self._build(png_path)
+        magic, version, length, chunks = _parse_glb(data)
+        self.assertEqual((magic, version, length), (0x46546C67, 2, len(data)))
+        self.assertEqual([x[0] for x in chunks], [0x4E4F534A, 0x004E4942])
+        for _, offset, chunk in chunks:
+            self.assertEqual(offset % 4, 0)
+            self.assertEqual(len(chunk) % 4, 0)
+        gltf = json.loads(chunks[0][2])
+        binary = chunks[1][2]
+        self.assertEqual(gltf['buffers'], [{'byteLength': len(binary)}])
+        for view in gltf['bufferViews']:
+            self.assertEqual(view['byteOffset'] % 4, 0)
+            self.assertLessEqual(view['byteOffset'] + view['byteLength'], len(binary))
+        for accessor in gltf['accessors']:
+            view = gltf['bufferViews'][accessor['bufferView']]
+            self.assertEqual(accessor['count'] * _COMPONENT_SIZES[accessor['componentType']]
+                             * _TYPE_SIZES[accessor['type']], view['byteLength'])
+        primitive = gltf['meshes'][0]['primitives'][0]
+        positions = gltf['accessors'][primitive['attributes']['POSITION']]
+        view = gltf['bufferViews'][positions['bufferView']]
+        self.assertEqual(np.frombuffer(binary, dtype='<f4', count=9, offset=view['byteOffset']).tolist(),
+                         [0, 0, 0, 1, 0, 0, 0, 1, 0])
+        self.assertEqual((positions['min'], positions['max']), ([0, 0, 0], [1, 1, 0]))
+        indices = gltf['accessors'][primitive['indices']]
+        view = gltf['bufferViews'][indices['bufferView']]
+        self.assertEqual(np.frombuffer(binary, dtype='<u4', count=3, offset=view['byteOffset']).tolist(), [0, 1, 2])
+        image_view = gltf['bufferViews'][gltf['images'][0]['bufferView']]
+        self.assertEqual(binary[image_view['byteOffset']:image_view['byteOffset'] + image_view['byteLength']],
+                         image.getvalue())
+        self.assertEqual(gltf['nodes'][0]['extras'], {'is_prop': True})
+        self.assertEqual(gltf['scenes'][0]['nodes'], [0, 1])
+
+    def test_should_skip_empty_binary_chunk(self):
+        builder = GlbBuilder()
+        builder.add_node('dummy')
+        data = builder.to_bytes()
+        magic, version, length, chunks = _parse_glb(data)
+        self.assertEqual(length, len(data))
+        self.assertEqual(len(chunks), 1)
+        gltf = json.loads(chunks[0][2])
+        self.assertNotIn('buffers', gltf)
+        self.assertNotIn('meshes', gltf)
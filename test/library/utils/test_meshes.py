@@ -0,0 +1,113 @@
+import io
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from library.utils.meshes import SubMesh, save_blender_meshes, write_obj
+
+
+def _make_mesh(name, texture_id=None):
+    mesh = SubMesh()
+    mesh.name = name
+    mesh.texture_id = texture_id
+    mesh.vertices = [[0.5, -0.0, 1.25], [1.5, 0.1, 2.0], [2.0, 0.0, 3.0], [0.0, 0.2, 1.0]]
+    mesh.vertex_uvs = [[0, 1], [1, 0.75], [1, 0], [0.25, 0]]
+    mesh.polygons = [[0, 1, 2], [0, 2, 3]]
+    return mesh
+
+
+class TestWriteObj(unittest.TestCase):
+
+    def test_should_be_the_same_as_separate_meshes(self):
+        meshes = [_make_mesh('a', 'tex'), SubMesh(), _make_mesh('b')]
+        meshes[2].polygons = [[0, 1, 2, 3], [3, 2, 1]]
+        f = io.StringIO()
+        self.assertEqual(write_obj(f, meshes, mtllib='terrain.mtl', pivot_offset=(0.5, 0, 0)), 8)
+        expected = ''.join([meshes[0].to_obj(1, mtllib='terrain.mtl', pivot_offset=(0.5, 0, 0)),
+                            meshes[1].to_obj(5, mtllib='terrain.mtl', pivot_offset=(0.5, 0, 0)),
+                            meshes[2].to_obj(5, mtllib='terrain.mtl', pivot_offset=(0.5, 0, 0))])
+        self.assertEqual(f.getvalue(), expected)
+
+    def test_should_write_mesh_by_mesh(self):
+        f = io.StringIO()
+        meshes = [_make_mesh('a'), _make_mesh('b')]
+        get_scaled_uvs = meshes[1].get_scaled_uvs
+
+        def check_written(*args):
+            # the first mesh is in the file before the second one is formatted completely
+            self.assertIn('\nf 1/1 2/2 3/3\nf 1/1 3/3 4/4', f.getvalue())
+            return get_scaled_uvs(*args)
+
+        meshes[1].get_scaled_uvs = check_written
+        self.assertEqual(write_obj(f, meshes), 8)
+        self.assertTrue(f.getvalue().endswith('\nf 5/5 6/6 7/7\nf 5/5 7/7 8/8'))
+
+    def test_should_write_full_precision(self):
+        obj = _make_mesh('a', 'tex').to_obj(1)
+        self.assertEqual(obj, '\n\no a\nv 0.5 -0.0 1.25\nv 1.5 0.1 2.0\nv 2.0 0.0 3.0\nv 0.0 0.2 1.0'
+                              '\nvt 0 0\nvt 1 0.25\nvt 1 1\nvt 0.25 1'
+                              '\nusemtl tex\nf 1/1 2/2 3/3\nf 1/1 3/3 4/4')
+
+    def test_should_round_to_given_precision(self):
+        obj = _make_mesh('a').to_obj(3, float_precision=2)
+        self.assertEqual(obj, '\n\no a\nv 0.50 -0.00 1.25\nv 1.50 0.10 2.00\nv 2.00 0.00 3.00\nv 0.00 0.20 1.00'
+                              '\nvt 0.00 0.00\nvt 1.00 0.25\nvt 1.00 1.00\nvt 0.25 1.00'
+                              '\nf 3/3 4/4 5/5\nf 3/3 5/5 6/6')
+
+
+class TestMeshCleanup(unittest.TestCase):
+
+    def test_should_remove_orphaned_vertices(self):
+        mesh = _make_mesh('a')
+        mesh.polygons = [[1, 2, 3]]
+        mesh.scaled_uvs = {0, 2}
+        mesh.remove_orphaned_vertices()
+        self.assertEqual(mesh.vertices, [[1.5, 0.1, 2.0], [2.0, 0.0, 3.0], [0.0, 0.2, 1.0]])
+        self.assertEqual(mesh.vertex_uvs, [[1, 0.75], [1, 0], [0.25, 0]])
+        self.assertEqual(mesh.polygons, [[0, 1, 2]])
+        self.assertEqual(mesh.scaled_uvs, {1})
+
+    def test_should_weld_vertices_with_the_same_uvs(self):
+        mesh = _make_mesh('a')
+        mesh.vertices += [[1.5, 0.1, 2.0], [2.0, 0.0, 3.0]]
+        mesh.vertex_uvs += [[1, 0.75], [0, 0]]
+        mesh.polygons = [[0, 4, 2], [0, 5, 3]]
+        mesh.weld_vertices()
+        self.assertEqual(len(mesh.vertices), 5)
+        self.assertEqual(mesh.polygons, [[0, 1, 2], [0, 4, 3]])
+        mesh.weld_vertices(respect_uvs=False)
+        self.assertEqual(len(mesh.vertices), 4)
+        self.assertEqual(mesh.polygons, [[0, 1, 2], [0, 2, 3]])
+
+    def test_should_remove_degenerate_polygons(self):
+        mesh = _make_mesh('a')
+        mesh.vertices.append([1.25, 0.0, 2.125])
+        mesh.polygons = [[0, 1, 2], [0, 0, 3], [0, 4, 2], [0, 1, 2, 1], [0, 1, 2, 3]]
+        mesh.remove_degenerate_polygons()
+        self.assertEqual(mesh.polygons, [[0, 1, 2], [0, 1, 2, 3]])
+
+
+class TestSaveBlenderMeshes(unittest.TestCase):
+
+    def test_should_save_terrain_chunk_as_triangles(self):
+        # terrain chunk: 3 rows of vertices, polygons are pairs of triangles, like in TRI map serializer
+        rows_count = 3
+        mesh = SubMesh()
+        mesh.name = 'terrain_chunk_0'
+        mesh.texture_id = 'TA00'
+        mesh.vertices = [[float(x), 0.0, float(z)] for z in range(3) for x in range(rows_count)]
+        mesh.vertex_uvs = [[x / 2, z / 2] for z in range(3) for x in range(rows_count)]
+        mesh.polygons = [[i, rows_count + i, 1 + i, rows_count + i, rows_count + 1 + i, 1 + i]
+                         for row in range(2) for i in range(row * rows_count, row * rows_count + rows_count - 1)]
+        with tempfile.TemporaryDirectory() as path:
+            file_name = os.path.join(path, 'terrain_chunk_0.npz')
+            save_blender_meshes(file_name, [mesh], {'TA00': 'assets/TA00.png'})
+            with np.load(file_name) as data:
+                loops, polygon_sizes, counts = data['loops'], data['polygon_sizes'], data['counts']
+        self.assertEqual(polygon_sizes.tolist(), [3] * 8)
+        self.assertEqual(counts.tolist(), [[9, 24, 8]])
+        triangles = loops.reshape(-1, 3).tolist()
+        self.assertTrue(all(len(set(triangle)) == 3 for triangle in triangles))
+        self.assertEqual(triangles[:2], [[0, 3, 1], [3, 4, 1]])
@@ -0,0 +1,19 @@
+import unittest
+
+from library.utils.polylines import simplify_polyline
+
+
+class TestSimplifyPolyline(unittest.TestCase):
+
+    def test_should_remove_points_on_straight_line(self):
+        points = [[0, 0], [1, 0.01], [2, 0], [3, 0.02], [4, 0]]
+        self.assertEqual(simplify_polyline(points, 0.3), [[0, 0], [4, 0]])
+
+    def test_should_keep_corners(self):
+        points = [[0, 0], [5, 0], [10, 0], [10, 5], [10, 10]]
+        self.assertEqual(simplify_polyline(points, 0.3), [[0, 0], [10, 0], [10, 10]])
+
+    def test_should_use_given_axes(self):
+        points = [[0, 5, 0], [1, -5, 0.01], [2, 5, 0]]
+        self.assertEqual(simplify_polyline(points, 0.3, axes=(0, 2)), [[0, 5, 0], [2, 5, 0]])
+        self.assertEqual(simplify_polyline(points, 0.3, axes=(0, 1)), points)
@@ -0,0 +1,72 @@
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import unittest
+
+from library.utils.processes import ExternalToolSlots
+
+
+def _hold_slot(slots, acquired):
+    with slots.acquire('blender'):
+        acquired.set()
+        time.sleep(60)
+
+
+def _acquire_in_thread(slots, tool):
+    # returns token, taken within a few seconds, or None if acquiring hangs
+    tokens = []
+
+    def acquire():
+        with slots.acquire(tool) as token:
+            tokens.append(token)
+
+    thread = threading.Thread(target=acquire, daemon=True)
+    thread.start()
+    thread.join(5)
+    return tokens[0] if tokens else None
+
+
+class TestExternalToolSlots(unittest.TestCase):
+
+    def test_should_not_limit_unknown_tool(self):
+        slots = ExternalToolSlots({'blender': 1, 'ffmpeg': 0})
+        with slots.acquire('ffmpeg') as token:
+            self.assertIsNone(token)
+
+    def test_should_record_owner(self):
+        slots = ExternalToolSlots({'blender': 2})
+        with slots.acquire('blender') as first, slots.acquire('blender') as second:
+            self.assertEqual({first, second}, {0, 1})
+            self.assertEqual(list(slots.owners['blender']), [os.getpid(), os.getpid()])
+        self.assertEqual(list(slots.owners['blender']), [0, 0])
+
+    def test_should_release_slots_of_killed_process(self):
+        slots = ExternalToolSlots({'blender': 1})
+        acquired = multiprocessing.Event()
+        holder = multiprocessing.Process(target=_hold_slot, args=(slots, acquired))
+        holder.start()
+        self.assertTrue(acquired.wait(5))
+        os.kill(holder.pid, signal.SIGKILL)
+        holder.join()
+        self.assertEqual(slots.release_owned_by(holder.pid), [('blender', 0)])
+        self.assertEqual(_acquire_in_thread(slots, 'blender'), 0)
+
+    def test_should_work_after_killing_waiting_process(self):
+        slots = ExternalToolSlots({'blender': 1})
+        acquired = multiprocessing.Event()
+        holder = multiprocessing.Process(target=_hold_slot, args=(slots, acquired))
+        holder.start()
+        self.assertTrue(acquired.wait(5))
+        waiter = multiprocessing.Process(target=_hold_slot, args=(slots, multiprocessing.Event()))
+        waiter.start()
+        # let it wait for the slot for a while
+        time.sleep(0.3)
+        os.kill(waiter.pid, signal.SIGKILL)
+        waiter.join()
+        self.assertEqual(slots.release_owned_by(waiter.pid), [])
+        os.kill(holder.pid, signal.SIGKILL)
+        holder.join()
+        slots.release_owned_by(holder.pid)
+        self.assertEqual(_acquire_in_thread(slots, 'blender'), 0)
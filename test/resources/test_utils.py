@@ -0,0 +1,30 @@
+import unittest
+
+from library import require_file
+from library.loader import get_resource_memo, invalidate_resource_index
+from library.read_data import ReadData
+from resources.eac.archives import ShpiBlock
+from resources.eac.bitmaps import Bitmap8Bit
+from resources.utils import _get_palette_from_shpi, _get_palette_from_wwww, determine_palette_for_8_bit_bitmap
+
+
+class TestPaletteResolution(unittest.TestCase):
+
+    def test_should_find_nearest_palette_in_wwww(self):
+        cfm = require_file('test/samples/LDIABL.CFM')
+        children = cfm.children
+        for max_index in range(len(children) + 1):
+            # the nearest SHPI with palette before max_index
+            expected = next((_get_palette_from_shpi(children[i]) for i in range(max_index - 1, -1, -1)
+                             if isinstance(children[i].block, ShpiBlock) and _get_palette_from_shpi(children[i])),
+                            None)
+            self.assertIs(_get_palette_from_wwww(cfm, max_index=max_index), expected)
+
+    def test_should_resolve_palette_once(self):
+        fsh = require_file('test/samples/GTITLE.FSH')
+        bitmap = next(x for x in fsh.children if isinstance(x, ReadData) and isinstance(x.block, Bitmap8Bit))
+        palette = determine_palette_for_8_bit_bitmap(bitmap)
+        self.assertEqual(get_resource_memo(fsh.id)[('shpi_palette', fsh.id)], (fsh, _get_palette_from_shpi(fsh)))
+        self.assertIs(determine_palette_for_8_bit_bitmap(bitmap), palette)
+        invalidate_resource_index(fsh.id)
+        self.assertNotIn(('shpi_palette', fsh.id), get_resource_memo(fsh.id))
@@ -0,0 +1,34 @@
+import os
+import tempfile
+import unittest
+from io import BytesIO
+
+from PIL import Image
+
+from library import require_file
+from serializers import get_serializer
+
+
+class TestBitmapSerializer(unittest.TestCase):
+
+    def test_preview_should_be_the_same_as_exported_file(self):
+        fsh = require_file('test/samples/VERTBST.FSH')
+        bitmap = next(x for x in fsh.children if 'Bitmap' in x.block.__class__.__name__)
+        serializer = get_serializer(bitmap.block)
+        with tempfile.TemporaryDirectory() as directory:
+            manifest = serializer.serialize_with_manifest(bitmap, os.path.join(directory, 'image'))
+            self.assertEqual(manifest, [os.path.join(directory, 'image.png')])
+            with Image.open(manifest[0]) as exported:
+                exported_pixels = exported.tobytes()
+        with Image.open(BytesIO(serializer.render_png(bitmap))) as preview:
+            self.assertEqual(preview.format, 'PNG')
+            self.assertEqual(preview.tobytes(), exported_pixels)
+
+    def test_manifest_should_include_nested_resources(self):
+        fsh = require_file('test/samples/VERTBST.FSH')
+        serializer = get_serializer(fsh.block)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'archive')
+            manifest = serializer.serialize_with_manifest(fsh, path)
+            produced = sorted(os.path.join(root, x) for root, _, files in os.walk(directory) for x in files)
+            self.assertEqual(sorted(manifest), produced)
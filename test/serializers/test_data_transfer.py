@@ -0,0 +1,85 @@
+import base64
+import gc
+import unittest
+import weakref
+
+import numpy as np
+
+from library import require_file
+from library.loader import load_file
+from library.helpers.data_wrapper import DataWrapper
+from library.read_data import ReadData
+from serializers import DataTransferSerializer
+
+
+class TestDataTransferSerializer(unittest.TestCase):
+
+    def test_should_send_every_block_once(self):
+        fsh = require_file('test/samples/VERTBST.FSH')
+        payload = DataTransferSerializer().serialize(fsh)
+        root_schema = payload['schemas'][payload['data']['schema']]
+        self.assertEqual(root_schema['block_class_mro'].split('__')[0], fsh.block.__class__.__name__)
+        self.assertIn('editor_validators', root_schema)
+        blocks = {}
+
+        def walk(data, node):
+            if not isinstance(data, ReadData):
+                # simplified blocks
+                return
+            self.assertEqual(node['block_id'], data.block_state['id'])
+            self.assertIs(blocks.setdefault(node['schema'], data.block), data.block)
+            if isinstance(data.value, DataWrapper):
+                for key, value in data.value.items():
+                    walk(value, node['value'][key])
+            elif isinstance(data.value, list):
+                for value, sub_node in zip(data.value, node['value']):
+                    walk(value, sub_node)
+
+        walk(fsh, payload['data'])
+        self.assertEqual(len({id(x) for x in blocks.values()}), len(blocks))
+
+    def test_should_reference_nested_blocks(self):
+        fsh = require_file('test/samples/VERTBST.FSH')
+        payload = DataTransferSerializer().serialize(fsh)
+        children_schema = payload['schemas'][payload['data']['value']['children']['schema']]
+        self.assertIn(children_schema['child']['schema_ref'], payload['schemas'])
+
+    def test_should_send_stubs_deeper_than_depth(self):
+        fsh = require_file('test/samples/VERTBST.FSH')
+        payload = DataTransferSerializer().serialize(fsh, depth=1)
+        children = payload['data']['value']['children']
+        self.assertTrue(children['stub'])
+        self.assertEqual(children['size'], len(fsh.value['children'].value))
+        self.assertNotIn('value', children)
+        self.assertEqual(payload['data']['value']['children_count']['value'], fsh.value['children_count'].value)
+
+    def test_should_serialize_page_of_children(self):
+        fsh = require_file('test/samples/VERTBST.FSH')
+        payload = DataTransferSerializer().serialize_children(fsh.value['children'], 1, 2, depth=0)
+        self.assertEqual([x['block_id'] for x in payload['data']],
+                         [x.block_state['id'] for x in fsh.value['children'].value[1:3]])
+        self.assertTrue(all(x['stub'] for x in payload['data']))
+
+    def test_should_serialize_separate_nodes(self):
+        fsh = require_file('test/samples/VERTBST.FSH')
+        nodes = [fsh.value['children_count'], fsh.value['children'].value[1].value['x']]
+        payload = DataTransferSerializer().serialize_nodes(nodes)
+        self.assertEqual([x['block_id'] for x in payload['data']], [x.id for x in nodes])
+        self.assertEqual([x['value'] for x in payload['data']], [x.value for x in nodes])
+
+    def test_should_send_numbers_as_typed_array(self):
+        fsh = require_file('test/samples/VERTBST.FSH')
+        bitmap = next(x for x in fsh.value['children'].value if isinstance(x.value.get('bitmap', None), ReadData))
+        payload = DataTransferSerializer().serialize(bitmap)
+        pixels = payload['data']['value']['bitmap']['value']
+        array = np.frombuffer(base64.b64decode(pixels['data']), dtype=pixels['typed_array'])
+        self.assertEqual(array.tolist(), list(bitmap.value['bitmap'].value))
+
+    def test_should_not_keep_blocks_of_dropped_files(self):
+        fsh = load_file('test/samples/VERTBST.FSH')
+        DataTransferSerializer().serialize(fsh)
+        block = weakref.ref(fsh.block)
+        self.assertIn(fsh.block, DataTransferSerializer._validators_cache)
+        del fsh
+        gc.collect()
+        self.assertIsNone(block())
@@ -0,0 +1,61 @@
+import json
+import os
+import struct
+import tempfile
+import unittest
+from io import BytesIO
+
+from PIL import Image
+
+from library.loader import load_file
+from serializers import get_serializer
+
+
+def _read_glb_json(path):
+    with open(path, 'rb') as f:
+        f.seek(12)
+        length, _ = struct.unpack('<II', f.read(8))
+        return json.loads(f.read(length))
+
+
+class TestTriMapSerializer(unittest.TestCase):
+
+    def _export(self, directory, existing_textures=()):
+        # serializer changes read data, so file is loaded bypassing cache
+        data = load_file('test/samples/AL1.TRI')
+        serializer = get_serializer(data.block)
+        settings_backup = dict(serializer.settings)
+        background_path = os.path.join(directory, 'ETRACKFM', 'AL1_001.FAM', 'background')
+        for texture_name in existing_textures:
+            os.makedirs(os.path.dirname(os.path.join(background_path, texture_name)), exist_ok=True)
+            image = BytesIO()
+            Image.new('RGBA', (2, 2)).save(image, format='PNG')
+            with open(os.path.join(background_path, f'{texture_name}.png'), 'wb') as f:
+                f.write(image.getvalue())
+        try:
+            serializer.patch_settings({'geometry__use_blender': False, 'maps__save_as_chunked': False})
+            serializer.serialize(data, os.path.join(directory, 'MISC', 'AL1.TRI'))
+        finally:
+            serializer.settings.update(settings_backup)
+        return _read_glb_json(os.path.join(directory, 'MISC', 'AL1.TRI', 'map.glb'))
+
+    def test_should_reference_fam_textures_in_glb(self):
+        with tempfile.TemporaryDirectory() as directory:
+            gltf = self._export(directory)
+        self.assertTrue(gltf['materials'])
+        self.assertEqual(len(gltf['images']), len(gltf['materials']))
+        for material in gltf['materials']:
+            texture = gltf['textures'][material['pbrMetallicRoughness']['baseColorTexture']['index']]
+            image = gltf['images'][texture['source']]
+            self.assertEqual(image['uri'], f"../../ETRACKFM/AL1_001.FAM/background/{material['name']}.png")
+
+    def test_should_embed_exported_fam_textures_in_glb(self):
+        with tempfile.TemporaryDirectory() as directory:
+            texture_names = [x['name'] for x in self._export(directory)['materials']]
+        with tempfile.TemporaryDirectory() as directory:
+            gltf = self._export(directory, existing_textures=texture_names[:1])
+        images = {x['name']: x for x in gltf['images']}
+        self.assertEqual(images[texture_names[0]]['mimeType'], 'image/png')
+        self.assertIn('bufferView', images[texture_names[0]])
+        self.assertNotIn('uri', images[texture_names[0]])
+        self.assertTrue(all('uri' in images[x] for x in texture_names[1:]))